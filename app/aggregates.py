@@ -0,0 +1,81 @@
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import case, func, select
+from sqlalchemy.orm import Session
+
+from .models import Product, User
+
+# ======================================================
+# 📊 Agregaciones en SQL para /stats
+# ======================================================
+# Cada función resuelve sus conteos y sumas con COUNT/SUM/GROUP BY en la base
+# de datos, sin cargar usuarios ni productos en Python.
+
+inventory_value = func.coalesce(func.sum(Product.price * Product.quantity), 0)
+
+
+def products_by_owner(
+    session: Session, owner_ids: List[int], per_owner: Optional[int] = None
+) -> Dict[int, List[Dict[str, Any]]]:
+    """Productos de varios dueños en una sola consulta (evita el N+1 de user.products)"""
+    grouped: Dict[int, List[Dict[str, Any]]] = {owner_id: [] for owner_id in owner_ids}
+    if not owner_ids:
+        return grouped
+
+    columns = [
+        Product.owner_id,
+        Product.id,
+        Product.name,
+        Product.price,
+        Product.quantity,
+        (Product.price * Product.quantity).label("total_value"),
+    ]
+    if per_owner is None:
+        stmt = select(*columns).where(Product.owner_id.in_(owner_ids)).order_by(Product.owner_id, Product.id)
+    else:
+        # ROW_NUMBER() limita cada dueño a sus primeros N productos sin traer el resto
+        position = func.row_number().over(partition_by=Product.owner_id, order_by=Product.id).label("position")
+        ranked = select(*columns, position).where(Product.owner_id.in_(owner_ids)).subquery()
+        stmt = (
+            select(*[ranked.c[c.key] for c in columns])
+            .where(ranked.c.position <= per_owner)
+            .order_by(ranked.c.owner_id, ranked.c.id)
+        )
+
+    for row in session.execute(stmt).mappings():
+        product = dict(row)
+        grouped[product.pop("owner_id")].append(product)
+    return grouped
+
+
+def user_counts(session: Session) -> Dict[str, int]:
+    """Usuarios totales y por rol en una sola consulta"""
+    row = session.execute(
+        select(
+            func.count(User.id),
+            func.coalesce(func.sum(case((User.role == "admin", 1), else_=0)), 0),
+            func.coalesce(func.sum(case((User.role == "client", 1), else_=0)), 0),
+        )
+    ).one()
+    return {"total": row[0], "admins": row[1], "clients": row[2]}
+
+
+def product_totals(session: Session) -> Dict[str, Any]:
+    """Conteo de productos, con dueño y valor de inventario en una sola consulta"""
+    row = session.execute(select(func.count(Product.id), func.count(Product.owner_id), inventory_value)).one()
+    return {
+        "total": row[0],
+        "with_owner": row[1],
+        "without_owner": row[0] - row[1],
+        "total_inventory_value": row[2],
+    }
+
+
+def top_product(session: Session, column) -> Optional[Dict[str, Any]]:
+    """Producto con el mayor valor en `column` (empates: el de menor id)"""
+    row = session.execute(
+        select(Product.id, Product.name, column).order_by(column.desc(), Product.id).limit(1)
+    ).first()
+    if row is None:
+        return None
+    return {"id": row[0], "name": row[1], column.key: row[2]}
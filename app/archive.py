@@ -0,0 +1,181 @@
+"""
+Archivo del historial de auditoría.
+
+Las filas de AuditLog más antiguas que la retención se mueven a archivos NDJSON
+comprimidos con gzip, uno por mes (`audit-AAAA-MM.ndjson.gz`), y se borran de la
+tabla. Cada corrida agrega un miembro gzip al final del archivo del mes, así que
+nunca se reescribe lo ya archivado. Los archivos siguen siendo consultables con
+los mismos filtros y cursor que /audit/history (ver /audit/archive).
+
+Uso por consola:
+    python -m app.archive run --days 90
+    python -m app.archive list
+"""
+import argparse
+import gzip
+import json
+import os
+import sys
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy import delete, select
+from sqlalchemy.orm import Session
+
+from . import config
+from .models import AuditLog
+from .pagination import iter_ndjson
+
+ARCHIVE_BATCH = 5000
+PREFIX, SUFFIX = "audit-", ".ndjson.gz"
+
+AUDIT_COLUMNS = [
+    AuditLog.id,
+    AuditLog.action,
+    AuditLog.target_id,
+    AuditLog.target_name,
+    AuditLog.performed_by,
+    AuditLog.performed_at,
+    AuditLog.details,
+]
+
+
+# ======================================================
+# 📦 Mover filas antiguas a los archivos mensuales
+# ======================================================
+def archive(session: Session, before: datetime, directory: str = config.AUDIT_ARCHIVE_DIR) -> Dict[str, Any]:
+    """Archiva (y borra de la tabla) las filas con performed_at < before, de a lotes"""
+    os.makedirs(directory, exist_ok=True)
+    archived, touched = 0, set()
+    while True:
+        rows = session.execute(
+            select(*AUDIT_COLUMNS)
+            .where(AuditLog.performed_at < before)
+            .order_by(AuditLog.id)
+            .limit(ARCHIVE_BATCH)
+        ).mappings().all()
+        if not rows:
+            break
+
+        by_month: Dict[str, List[Any]] = {}
+        for row in rows:
+            by_month.setdefault(f"{row['performed_at']:%Y-%m}", []).append(row)
+        # Primero se escribe (y sincroniza) el archivo y después se borra: si algo falla
+        # en el medio, la fila queda duplicada en el archivo, nunca perdida
+        for month, items in by_month.items():
+            _append(os.path.join(directory, f"{PREFIX}{month}{SUFFIX}"), items)
+            touched.add(month)
+
+        session.execute(
+            delete(AuditLog).where(AuditLog.performed_at < before, AuditLog.id <= rows[-1]["id"])
+        )
+        session.commit()
+        archived += len(rows)
+
+    return {"archived": archived, "before": before, "partitions": sorted(touched)}
+
+
+def _append(path: str, rows: List[Any]):
+    with open(path, "ab") as raw:
+        with gzip.GzipFile(fileobj=raw, mode="wb") as out:
+            for line in iter_ndjson(rows):
+                out.write(line.encode())
+        raw.flush()
+        os.fsync(raw.fileno())
+
+
+# ======================================================
+# 🔎 Consultas sobre el archivo
+# ======================================================
+def partitions(directory: str = config.AUDIT_ARCHIVE_DIR) -> List[Tuple[str, str]]:
+    """(mes 'AAAA-MM', ruta) de cada archivo, del más reciente al más antiguo"""
+    if not os.path.isdir(directory):
+        return []
+    found = [
+        (name[len(PREFIX):-len(SUFFIX)], os.path.join(directory, name))
+        for name in os.listdir(directory)
+        if name.startswith(PREFIX) and name.endswith(SUFFIX)
+    ]
+    return sorted(found, reverse=True)
+
+
+def _month_bounds(month: str) -> Tuple[datetime, datetime]:
+    start = datetime.strptime(month, "%Y-%m")
+    end = (start + timedelta(days=32)).replace(day=1)
+    return start, end
+
+
+def _read(path: str) -> Iterator[Dict[str, Any]]:
+    with gzip.open(path, "rt", encoding="utf-8") as source:
+        for line in source:
+            row = json.loads(line)
+            row["performed_at"] = datetime.fromisoformat(row["performed_at"])
+            yield row
+
+
+def _matches(row: Dict[str, Any], filters: Dict[str, Any]) -> bool:
+    if filters.get("action") is not None and row["action"] != filters["action"]:
+        return False
+    if filters.get("performed_by") is not None and row["performed_by"] != filters["performed_by"]:
+        return False
+    if filters.get("target_id") is not None and row["target_id"] != filters["target_id"]:
+        return False
+    if filters.get("since") is not None and row["performed_at"] < filters["since"]:
+        return False
+    if filters.get("until") is not None and row["performed_at"] >= filters["until"]:
+        return False
+    return True
+
+
+def iter_archive(
+    filters: Dict[str, Any],
+    after: Optional[Tuple[datetime, int]] = None,
+    directory: str = config.AUDIT_ARCHIVE_DIR,
+) -> Iterator[Dict[str, Any]]:
+    """
+    Filas archivadas que cumplen los filtros, de la más reciente a la más antigua
+    (performed_at desc, id desc) y posteriores al cursor `after`. Sólo se abren los
+    meses que pueden contener resultados; cada mes se ordena en memoria.
+    """
+    since, until = filters.get("since"), filters.get("until")
+    for month, path in partitions(directory):
+        start, end = _month_bounds(month)
+        if since is not None and end <= since:
+            break  # los meses siguientes son todavía más antiguos
+        if (until is not None and start >= until) or (after is not None and start > after[0]):
+            continue
+
+        rows = {row["id"]: row for row in _read(path) if _matches(row, filters)}  # sin duplicados
+        ordered = sorted(rows.values(), key=lambda row: (row["performed_at"], row["id"]), reverse=True)
+        for row in ordered:
+            if after is None or (row["performed_at"], row["id"]) < after:
+                yield row
+
+
+# ======================================================
+# 🖥️ Consola
+# ======================================================
+def main(argv: List[str]) -> int:
+    from .database import engine, init_db
+
+    parser = argparse.ArgumentParser(prog="python -m app.archive", description="Archivo del historial")
+    sub = parser.add_subparsers(dest="command", required=True)
+    runner = sub.add_parser("run", help="archiva las filas más antiguas que la retención")
+    runner.add_argument("--days", type=int, default=config.AUDIT_RETENTION_DAYS)
+    sub.add_parser("list", help="muestra los archivos mensuales")
+    args = parser.parse_args(argv)
+
+    if args.command == "list":
+        for month, path in partitions():
+            print(f"{month}  {os.path.getsize(path):>10} bytes  {path}")
+        return 0
+
+    init_db()
+    with Session(engine) as session:
+        report = archive(session, datetime.utcnow() - timedelta(days=args.days))
+    print(f"Archivadas: {report['archived']} filas en {', '.join(report['partitions']) or 'ningún mes'}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
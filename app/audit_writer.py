@@ -0,0 +1,268 @@
+"""
+Escritura del historial de auditoría (AuditLog) con durabilidad configurable.
+
+Los handlers llaman a `audit_writer.record(session, ...)` junto a su cambio. El
+evento queda retenido en la sesión y sólo se escribe si esa transacción hace commit
+(con rollback se descarta). Según AUDIT_MODE:
+
+- transaction: la fila se agrega a la misma transacción del cambio (atómico).
+- sync: se inserta en una transacción propia inmediatamente después del commit.
+- buffered: se encola en memoria; un hilo de fondo inserta por lotes (AUDIT_BATCH_SIZE
+  filas o cada AUDIT_FLUSH_INTERVAL segundos) y al apagar la app vacía la cola.
+  Un corte abrupto del proceso puede perder los eventos aún no escritos.
+
+El texto de `details` se arma a partir de plantillas por acción en el momento de
+escribir (en modo buffered, fuera de la petición).
+"""
+import logging
+import queue
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import event, insert
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from . import config
+from .models import AuditLog
+
+logger = logging.getLogger(__name__)
+
+MODES = {"transaction", "sync", "buffered"}
+PENDING_KEY = "audit_events"
+
+# Plantillas de `details`; los campos faltantes se muestran como "?"
+DETAIL_TEMPLATES = {
+    "CREATE_PRODUCT": "Producto '{target_name}' (Precio: ${price}, Cantidad: {quantity}) creado por {performed_by}",
+    "UPDATE_PRODUCT": "Producto '{target_name}' actualizado por {performed_by}: {changes}",
+    "DELETE_PRODUCT": "Producto '{target_name}' (Precio: ${price}, Cantidad: {quantity}) eliminado por {performed_by}",
+    "PURCHASE": "{quantity} x '{target_name}' (Precio: ${price}) comprado por {performed_by}; quedan {remaining}",
+    "IMPORT_PRODUCTS": "{inserted} productos importados por {performed_by} ({error_count} filas con error)",
+    "CREATE_USER": "Usuario '{target_name}' (Rol: {role}) registrado",
+    "UPDATE_USER": "Usuario '{target_name}' (Rol: {role}) actualizado por {performed_by}",
+    "DELETE_USER": "Usuario '{target_name}' (Rol: {role}) eliminado por {performed_by}",
+}
+
+
+class _Fields(dict):
+    def __missing__(self, key):
+        return "?"
+
+
+def format_details(event: Dict[str, Any]) -> Optional[str]:
+    template = DETAIL_TEMPLATES.get(event["action"])
+    if template is None:
+        return None
+    return template.format_map(_Fields(event["fields"], **{k: v for k, v in event.items() if k != "fields"}))
+
+
+def _row(event: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "action": event["action"],
+        "target_id": event["target_id"],
+        "target_name": event["target_name"],
+        "performed_by": event["performed_by"],
+        "performed_at": event["performed_at"],
+        "details": format_details(event),
+    }
+
+
+class AuditWriter:
+    def __init__(self, mode: str, batch_size: int, flush_interval: float, max_queue: int):
+        if mode not in MODES:
+            raise ValueError(f"AUDIT_MODE desconocido: {mode!r} (opciones: {', '.join(sorted(MODES))})")
+        self.mode = mode
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue: "queue.Queue[Tuple[Engine, Dict[str, Any]]]" = queue.Queue(maxsize=max_queue)
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        # Métricas
+        self.enqueued = 0
+        self.written = 0
+        self.batches = 0
+        self.errors = 0
+        self.overflow_writes = 0
+        self.last_flush_ms = 0.0
+        self.max_flush_ms = 0.0
+        self._total_flush_ms = 0.0
+
+    # ======================================================
+    # ✍️ Registrar eventos desde los handlers
+    # ======================================================
+    def record(
+        self,
+        session: Session,
+        action: str,
+        target_id: int,
+        target_name: str,
+        performed_by: str,
+        **fields: Any,
+    ):
+        """Registra un evento; se escribe sólo si la transacción de `session` hace commit"""
+        event = {
+            "action": action,
+            "target_id": target_id,
+            "target_name": target_name,
+            "performed_by": performed_by,
+            "performed_at": datetime.utcnow(),
+            "fields": fields,
+        }
+        if self.mode == "transaction":
+            session.add(AuditLog(**_row(event)))
+            return
+        session.info.setdefault(PENDING_KEY, []).append(event)
+
+    def record_many(
+        self,
+        session: Session,
+        action: str,
+        performed_by: str,
+        targets: Iterable[Tuple[int, str, Dict[str, Any]]],
+    ):
+        """Como record para muchos (target_id, target_name, fields); en modo
+        transaction es un único INSERT con varias filas en lugar de un objeto ORM por evento"""
+        performed_at = datetime.utcnow()
+        events = [
+            {
+                "action": action,
+                "target_id": target_id,
+                "target_name": target_name,
+                "performed_by": performed_by,
+                "performed_at": performed_at,
+                "fields": fields,
+            }
+            for target_id, target_name, fields in targets
+        ]
+        if not events:
+            return
+        if self.mode == "transaction":
+            session.execute(insert(AuditLog), [_row(event) for event in events])
+            return
+        session.info.setdefault(PENDING_KEY, []).extend(events)
+
+    def _after_commit(self, session: Session):
+        events = session.info.pop(PENDING_KEY, None)
+        if not events:
+            return
+        bind = _sync_bind(session)
+        if self.mode == "sync":
+            self._write(bind, [_row(event) for event in events])
+            return
+        self._ensure_thread()
+        for event in events:
+            try:
+                self._queue.put_nowait((bind, event))
+                self.enqueued += 1
+            except queue.Full:
+                # Cola llena: se escribe en el momento en lugar de perder el evento
+                self.overflow_writes += 1
+                self._write(bind, [_row(event)])
+
+    def _after_rollback(self, session: Session):
+        session.info.pop(PENDING_KEY, None)
+
+    # ======================================================
+    # 🧵 Hilo de fondo (modo buffered)
+    # ======================================================
+    def _ensure_thread(self):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._stopping.clear()
+                    self._thread = threading.Thread(target=self._run, name="audit-writer", daemon=True)
+                    self._thread.start()
+
+    def _run(self):
+        while True:
+            batch = self._take_batch()
+            if batch:
+                self._flush(batch)
+            elif self._stopping.is_set():
+                return
+
+    def _take_batch(self) -> List[Tuple[Engine, Dict[str, Any]]]:
+        """Espera el primer evento (hasta flush_interval) y junta hasta batch_size"""
+        try:
+            batch = [self._queue.get(timeout=self.flush_interval)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _flush(self, batch: List[Tuple[Engine, Dict[str, Any]]]):
+        by_bind: Dict[Engine, List[Dict[str, Any]]] = {}
+        for bind, event in batch:
+            by_bind.setdefault(bind, []).append(_row(event))
+        for bind, rows in by_bind.items():
+            self._write(bind, rows)
+
+    def _write(self, bind: Engine, rows: List[Dict[str, Any]]):
+        started = time.perf_counter()
+        try:
+            with bind.begin() as conn:
+                conn.execute(insert(AuditLog), rows)
+        except Exception:
+            self.errors += 1
+            logger.exception("No se pudieron escribir %d eventos de auditoría", len(rows))
+            return
+        elapsed = (time.perf_counter() - started) * 1000
+        self.written += len(rows)
+        self.batches += 1
+        self.last_flush_ms = elapsed
+        self.max_flush_ms = max(self.max_flush_ms, elapsed)
+        self._total_flush_ms += elapsed
+
+    def flush(self, timeout: Optional[float] = None):
+        """Vacía la cola y detiene el hilo (se vuelve a crear con el próximo evento)"""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is None:
+            return
+        self._stopping.set()
+        thread.join(timeout)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "mode": self.mode,
+            "queue_depth": self._queue.qsize(),
+            "enqueued": self.enqueued,
+            "written": self.written,
+            "batches": self.batches,
+            "errors": self.errors,
+            "overflow_writes": self.overflow_writes,
+            "last_flush_ms": round(self.last_flush_ms, 3),
+            "avg_flush_ms": round(self._total_flush_ms / self.batches, 3) if self.batches else 0.0,
+            "max_flush_ms": round(self.max_flush_ms, 3),
+        }
+
+
+def _sync_bind(session: Session) -> Engine:
+    """Engine síncrono donde escribir: el de la sesión, o el global si la sesión es async"""
+    bind = session.get_bind()
+    if getattr(bind, "engine", bind).dialect.is_async:
+        from .database import engine
+
+        return engine
+    return getattr(bind, "engine", bind)
+
+
+audit_writer = AuditWriter(
+    config.AUDIT_MODE,
+    config.AUDIT_BATCH_SIZE,
+    config.AUDIT_FLUSH_INTERVAL,
+    config.AUDIT_MAX_QUEUE,
+)
+
+# Aplica a todas las sesiones (también a la sesión síncrona interna de AsyncSession)
+event.listen(Session, "after_commit", audit_writer._after_commit)
+event.listen(Session, "after_rollback", audit_writer._after_rollback)
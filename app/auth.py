@@ -1,11 +1,133 @@
-from passlib.context import CryptContext
+import asyncio
+import threading
+import time
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Optional, Tuple
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+from fastapi import HTTPException
+
+from . import config, metrics
+
+# El costo (rounds) es configurable; los hashes con otro costo se rehacen en el login.
+# passlib/bcrypt se importan al primer uso: no suman al arranque del proceso
+_pwd_context = None
+_pwd_context_lock = threading.Lock()
+
+def get_pwd_context():
+    global _pwd_context
+    if _pwd_context is None:
+        with _pwd_context_lock:
+            if _pwd_context is None:
+                from passlib.context import CryptContext
+
+                _pwd_context = CryptContext(
+                    schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=config.BCRYPT_ROUNDS
+                )
+    return _pwd_context
+
+def __getattr__(name: str):
+    # `from app.auth import pwd_context` sigue funcionando (crea el contexto al pedirlo)
+    if name == "pwd_context":
+        return get_pwd_context()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 def hash_password(password: str):
     """Genera un hash seguro para guardar en base de datos"""
-    return pwd_context.hash(password)
+    return hashing_pool.run(_hash, password)
 
 def verify_password(plain_password: str, hashed_password: str):
     """Verifica si la contraseña ingresada coincide con el hash"""
-    return pwd_context.verify(plain_password, hashed_password)
+    return hashing_pool.run(_verify, plain_password, hashed_password)
+
+async def hash_password_async(password: str) -> str:
+    """Como hash_password, pero sin ocupar un hilo del servidor mientras se calcula"""
+    return await hashing_pool.run_async(_hash, password)
+
+async def verify_and_update_async(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """Verifica y, si el costo configurado cambió, devuelve también el nuevo hash"""
+    return await hashing_pool.run_async(_verify_and_update, plain_password, hashed_password)
+
+
+# ======================================================
+# ⚙️ Pool dedicado para bcrypt con límite de pendientes
+# ======================================================
+# bcrypt consume ~100-300 ms de CPU por llamada. Un pool propio y acotado evita que
+# una ráfaga de logins acapare los hilos del servidor: al llenarse responde 503.
+
+def _hash(password: str) -> str:
+    return get_pwd_context().hash(password)
+
+def _verify(plain_password: str, hashed_password: str) -> bool:
+    return get_pwd_context().verify(plain_password, hashed_password)
+
+def _verify_and_update(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    return get_pwd_context().verify_and_update(plain_password, hashed_password)
+
+
+class HashingPool:
+    def __init__(self, kind: str, workers: int, max_pending: int, retry_after: int):
+        self.kind = kind
+        self.workers = workers
+        self.max_pending = max_pending
+        self.retry_after = retry_after
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._executor: Optional[Executor] = None
+        self._lock = threading.Lock()
+        self.rejected = 0
+
+    def _get_executor(self) -> Executor:
+        # Se crea al primer uso para no lanzar procesos al importar el módulo
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    if self.kind == "process":
+                        self._executor = ProcessPoolExecutor(max_workers=self.workers)
+                    else:
+                        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="bcrypt")
+        return self._executor
+
+    def submit(self, fn, *args) -> Future:
+        if not self._slots.acquire(blocking=False):
+            self.rejected += 1
+            metrics.bcrypt_rejected.inc()
+            raise HTTPException(
+                status_code=503,
+                detail="Servidor ocupado procesando contraseñas, intenta de nuevo",
+                headers={"Retry-After": str(self.retry_after)}
+            )
+        try:
+            future = self._get_executor().submit(fn, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def run(self, fn, *args):
+        started = time.perf_counter()
+        future = self.submit(fn, *args)
+        try:
+            return future.result()
+        finally:
+            metrics.observe_bcrypt(fn.__name__.lstrip("_"), time.perf_counter() - started)
+
+    async def run_async(self, fn, *args):
+        started = time.perf_counter()
+        future = self.submit(fn, *args)
+        try:
+            return await asyncio.wrap_future(future)
+        finally:
+            metrics.observe_bcrypt(fn.__name__.lstrip("_"), time.perf_counter() - started)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+
+hashing_pool = HashingPool(
+    config.HASH_EXECUTOR,
+    config.HASH_WORKERS,
+    config.HASH_MAX_PENDING,
+    config.HASH_RETRY_AFTER_SECONDS,
+)
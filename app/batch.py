@@ -0,0 +1,100 @@
+"""
+Operaciones masivas de admin: UPDATE/DELETE por conjuntos en transacciones por bloques.
+
+La selección es una lista de ids o un filtro. Los ids se recorren de a
+BATCH_CHUNK_SIZE (con filtro, por keyset sobre el id, sin OFFSET) y cada bloque es
+una transacción: se leen las filas del bloque que siguen cumpliendo el filtro (para
+contadores e historial), se ejecuta una única sentencia `... WHERE id IN (...)`, se
+registra el historial en un solo INSERT y se hace commit. Cada bloque es atómico: si
+uno falla, los anteriores ya quedaron guardados.
+
+El resultado lleva un estado por id ("updated", "deleted", "not_found" o el motivo
+por el que se omitió) y los totales. Con dry_run no se escribe nada: con lista de
+ids se informa qué pasaría con cada uno; con filtro, sólo cuántas filas coinciden.
+"""
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence
+
+from fastapi import HTTPException
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from . import config
+
+# skip(fila) -> motivo para no tocarla, o None
+SkipRule = Callable[[Any], Optional[str]]
+
+
+def check_selection(ids: Optional[List[int]], where: Sequence[Any]):
+    if (ids is None) == (not where):
+        raise HTTPException(
+            status_code=400,
+            detail="Indicar `ids` o un `filter` con al menos un criterio (no ambos)",
+        )
+
+
+def _chunks(
+    session: Session, id_column, ids: Optional[List[int]], where: Sequence[Any], chunk_size: int
+) -> Iterator[List[int]]:
+    if ids is not None:
+        unique = list(dict.fromkeys(ids))
+        for start in range(0, len(unique), chunk_size):
+            yield unique[start:start + chunk_size]
+        return
+    last = 0
+    while True:
+        chunk = list(session.execute(
+            select(id_column).where(*where, id_column > last).order_by(id_column).limit(chunk_size)
+        ).scalars())
+        if not chunk:
+            return
+        yield chunk
+        last = chunk[-1]
+
+
+def run(
+    session: Session,
+    *,
+    columns: Sequence[Any],
+    ids: Optional[List[int]],
+    where: Sequence[Any],
+    status: str,
+    apply: Callable[[Session, List[Any]], None],
+    dry_run: bool = False,
+    skip: Optional[SkipRule] = None,
+    committed: Optional[Callable[[List[Any]], None]] = None,
+    chunk_size: Optional[int] = None,
+) -> Dict[str, Any]:
+    """Ejecuta `apply(session, filas)` por bloque, hace commit de cada uno y después
+    llama a `committed(filas)`.
+
+    `columns` son las columnas a leer (la primera es el id); `status` es el estado
+    de las filas afectadas ("updated" o "deleted")."""
+    check_selection(ids, where)
+    id_column = columns[0]
+    if dry_run and ids is None:
+        matched = session.execute(select(func.count()).select_from(id_column.table).where(*where)).scalar()
+        return {"dry_run": True, "counts": {status: matched}, "chunks": 0, "results": None}
+
+    counts: Dict[str, int] = {}
+    results: List[Dict[str, Any]] = []
+    chunks = 0
+    for chunk in _chunks(session, id_column, ids, where, chunk_size or config.BATCH_CHUNK_SIZE):
+        found = {
+            row[0]: row
+            for row in session.execute(select(*columns).where(id_column.in_(chunk), *where))
+        }
+        targets = []
+        for target_id in chunk:
+            row = found.get(target_id)
+            outcome = "not_found" if row is None else (skip(row) if skip else None) or status
+            if outcome == status:
+                targets.append(row)
+            counts[outcome] = counts.get(outcome, 0) + 1
+            results.append({"id": target_id, "status": outcome})
+        if targets and not dry_run:
+            apply(session, targets)
+            session.commit()
+            if committed is not None:
+                committed(targets)
+        chunks += 1
+    return {"dry_run": dry_run, "counts": counts, "chunks": chunks, "results": results}
@@ -0,0 +1,275 @@
+"""
+Importación y exportación masiva de productos (CSV / NDJSON).
+
+Las filas se leen de forma incremental, se validan contra ProductImport (mismos
+campos que Product) y se insertan con executemany en transacciones de CHUNK_SIZE
+filas; los errores se reportan por número de línea sin detener la importación.
+
+Uso por consola:
+    python -m app.bulk import productos.csv --owner admin
+    python -m app.bulk export productos.ndjson
+"""
+import argparse
+import codecs
+import csv
+import io
+import json
+import sys
+import time
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import anyio
+from pydantic import ValidationError
+from sqlalchemy import func, insert, select
+from sqlalchemy.orm import Session
+
+from . import counters
+from .models import Product, ProductImport, User
+from .pagination import aiter_ndjson, iter_ndjson
+
+CHUNK_SIZE = 5000
+MAX_REPORTED_ERRORS = 1000
+EXPORT_BLOCK_LINES = 500
+FORMATS = ("csv", "ndjson")
+
+_VALIDATOR = ProductImport.__pydantic_validator__
+
+# Columnas de la exportación (mismo orden que el modelo Product)
+EXPORT_COLUMNS = ["id", "name", "description", "price", "quantity", "image_path", "created_at", "owner_id"]
+
+
+# ======================================================
+# 📥 Lectura incremental
+# ======================================================
+def parse_rows(lines: Iterable[str], fmt: str) -> Iterator[Tuple[int, Any]]:
+    """Devuelve (número de línea, dict o excepción) por cada fila de datos"""
+    if fmt == "csv":
+        reader = csv.DictReader(lines)
+        for row in reader:
+            # Celdas vacías = campo ausente (usa el valor por defecto del modelo)
+            yield reader.line_num, {key: value for key, value in row.items() if key and value != ""}
+    elif fmt == "ndjson":
+        for number, line in enumerate(lines, start=1):
+            if not line.strip():
+                continue
+            try:
+                yield number, json.loads(line)
+            except ValueError as exc:
+                yield number, exc
+    else:
+        raise ValueError(f"Formato no soportado: {fmt!r}")
+
+
+def body_lines(stream: AsyncIterator[bytes]) -> Iterator[str]:
+    """
+    Convierte el cuerpo async de la petición en líneas de texto, de a un bloque por vez.
+    Debe consumirse desde un hilo de trabajo de anyio (run_in_threadpool).
+    """
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    pending = ""
+    while True:
+        try:
+            chunk = anyio.from_thread.run(stream.__anext__)
+        except StopAsyncIteration:
+            break
+        lines = (pending + decoder.decode(chunk)).splitlines(keepends=True)
+        pending = lines.pop() if lines and not lines[-1].endswith(("\n", "\r")) else ""
+        yield from lines
+    tail = pending + decoder.decode(b"", final=True)
+    if tail:
+        yield tail
+
+
+# ======================================================
+# 💾 Inserción por lotes
+# ======================================================
+def import_products(session: Session, lines: Iterable[str], fmt: str, owner_id: Optional[int]) -> Dict[str, Any]:
+    """Valida e inserta filas en transacciones de CHUNK_SIZE; devuelve el reporte"""
+    started = time.perf_counter()
+    inserted, error_count, errors = 0, 0, []
+    chunk: List[Dict[str, Any]] = []
+
+    for line, data in parse_rows(lines, fmt):
+        result = _validate(data)
+        if isinstance(result, dict):
+            result["owner_id"] = owner_id
+            chunk.append(result)
+            if len(chunk) >= CHUNK_SIZE:
+                inserted += insert_chunk(session, chunk)
+                chunk = []
+            continue
+
+        error_count += 1
+        if len(errors) < MAX_REPORTED_ERRORS:
+            errors.append({"line": line, "error": result})
+
+    if chunk:
+        inserted += insert_chunk(session, chunk)
+
+    elapsed = time.perf_counter() - started
+    return {
+        "inserted": inserted,
+        "error_count": error_count,
+        "errors": errors,
+        "elapsed_seconds": round(elapsed, 3),
+        "rows_per_second": round(inserted / elapsed) if elapsed else inserted,
+    }
+
+
+def insert_chunk(session: Session, rows: List[Dict[str, Any]]) -> int:
+    """Un INSERT con executemany + contadores, en una sola transacción"""
+    now = datetime.utcnow()
+    for row in rows:
+        row["created_at"] = now
+    session.execute(insert(Product.__table__), rows)
+    # max(id) se lee DESPUÉS del INSERT: la transacción ya tiene el lock de escritura,
+    # nadie más inserta hasta el commit y los ids del lote son los últimos len(rows).
+    # Leído antes, incluiría filas que otro proceso confirme entre la lectura y el
+    # INSERT (y su historial quedaría duplicado)
+    last_id = session.execute(select(func.max(Product.id))).scalar()
+    counters.products_bulk_created(session, rows, last_id - len(rows))
+    session.commit()
+    return len(rows)
+
+
+def _validate(data) -> Any:
+    """Devuelve el dict listo para insertar, o el texto del error"""
+    if isinstance(data, Exception):
+        return f"JSON inválido: {data}"
+    if not isinstance(data, dict):
+        return "Cada fila debe ser un objeto"
+    try:
+        # Validador de pydantic directo: evita la envoltura de SQLModel (~3x más rápido)
+        return dict(_VALIDATOR.validate_python(data).__dict__)
+    except ValidationError as exc:
+        return "; ".join(
+            f"{'.'.join(str(part) for part in item['loc'])}: {item['msg']}" for item in exc.errors()
+        )
+
+
+# ======================================================
+# 📤 Exportación en streaming
+# ======================================================
+def export_query():
+    columns = [getattr(Product, name) for name in EXPORT_COLUMNS]
+    return select(*columns).order_by(Product.id)
+
+
+def export_lines(rows: Iterable[Dict[str, Any]], fmt: str) -> Iterator[str]:
+    """Líneas agrupadas en bloques de EXPORT_BLOCK_LINES (un chunk HTTP por fila es lento)"""
+    lines = iter_ndjson(rows) if fmt == "ndjson" else iter_csv(rows)
+    block: List[str] = []
+    for line in lines:
+        block.append(line)
+        if len(block) >= EXPORT_BLOCK_LINES:
+            yield "".join(block)
+            block = []
+    if block:
+        yield "".join(block)
+
+
+async def aexport_lines(rows: AsyncIterator[Dict[str, Any]], fmt: str) -> AsyncIterator[str]:
+    """Versión asíncrona de export_lines (resultados de AsyncSession.stream)"""
+    if fmt == "ndjson":
+        lines = aiter_ndjson(rows)
+    else:
+        lines = _aiter_csv(rows)
+    block: List[str] = []
+    async for line in lines:
+        block.append(line)
+        if len(block) >= EXPORT_BLOCK_LINES:
+            yield "".join(block)
+            block = []
+    if block:
+        yield "".join(block)
+
+
+async def _aiter_csv(rows: AsyncIterator[Dict[str, Any]]) -> AsyncIterator[str]:
+    header, encode = csv_encoder()
+    yield header
+    async for row in rows:
+        yield encode(row)
+
+
+def iter_csv(rows: Iterable[Dict[str, Any]]) -> Iterator[str]:
+    """Serializa filas como CSV con encabezado, una línea por fila"""
+    header, encode = csv_encoder()
+    yield header
+    for row in rows:
+        yield encode(row)
+
+
+def csv_encoder():
+    """Devuelve (línea de encabezado, función que codifica una fila como línea CSV)"""
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_COLUMNS, lineterminator="\n")
+
+    def take() -> str:
+        value = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        return value
+
+    def encode(row) -> str:
+        writer.writerow(row)
+        return take()
+
+    writer.writeheader()
+    return take(), encode
+
+
+# ======================================================
+# 🖥️ Consola
+# ======================================================
+def _guess_format(path: str, fmt: Optional[str]) -> str:
+    if fmt:
+        return fmt
+    return "ndjson" if path.endswith((".ndjson", ".jsonl")) else "csv"
+
+
+def main(argv: List[str]) -> int:
+    from .database import engine, init_db
+
+    parser = argparse.ArgumentParser(prog="python -m app.bulk", description="Importa o exporta productos")
+    sub = parser.add_subparsers(dest="command", required=True)
+    importer = sub.add_parser("import", help="importa un archivo CSV o NDJSON")
+    importer.add_argument("path")
+    importer.add_argument("--format", choices=FORMATS)
+    importer.add_argument("--owner", help="username del dueño de los productos importados")
+    exporter = sub.add_parser("export", help="exporta el catálogo a CSV o NDJSON")
+    exporter.add_argument("path")
+    exporter.add_argument("--format", choices=FORMATS)
+    args = parser.parse_args(argv)
+
+    init_db()
+    fmt = _guess_format(args.path, args.format)
+    with Session(engine) as session:
+        if args.command == "export":
+            rows = session.execute(export_query().execution_options(yield_per=CHUNK_SIZE)).mappings()
+            with open(args.path, "w", encoding="utf-8", newline="") as out:
+                out.writelines(export_lines(rows, fmt))
+            print(f"Exportado a {args.path}")
+            return 0
+
+        owner_id = None
+        if args.owner:
+            owner_id = session.execute(select(User.id).where(User.username == args.owner)).scalar()
+            if owner_id is None:
+                print(f"No existe el usuario {args.owner!r}")
+                return 2
+
+        with open(args.path, encoding="utf-8-sig", newline="") as source:
+            report = import_products(session, source, fmt, owner_id)
+
+    print(
+        f"Insertados: {report['inserted']} | errores: {report['error_count']} | "
+        f"{report['elapsed_seconds']} s ({report['rows_per_second']} filas/s)"
+    )
+    for error in report["errors"][:20]:
+        print(f"  línea {error['line']}: {error['error']}")
+    return 1 if report["error_count"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,195 @@
+"""
+Invalidación de cachés en memoria entre procesos (varios workers sobre la misma base).
+
+Cada worker tiene su propia caché de respuestas (backend memory) y de usuarios
+autenticados. Con INVALIDATION_BUS=db, las etiquetas que una transacción invalida
+(`response_cache.invalidate_on_commit`) se insertan en la tabla invalidationevent
+dentro de esa misma transacción: el evento existe si y sólo si el cambio se guardó.
+
+Un hilo por proceso sondea cada BUS_POLL_INTERVAL_MS con una conexión propia. En
+SQLite primero lee `PRAGMA data_version`, que sólo cambia cuando otra conexión hizo
+commit: si nadie escribió, el sondeo no consulta la tabla. Los eventos de otros
+procesos se aplican como el commit original se aplicó en el suyo (se sube la versión
+de las etiquetas y, para "user:<id>", se descarta el usuario de la caché de
+sesiones). Una transacción con más de BUS_MAX_TAGS etiquetas publica "*" (vaciar
+todo). La ventana de desactualización entre workers es de un intervalo de sondeo.
+
+Los ids se leen en orden creciente; en SQLite los commits son serializados, así que
+no quedan huecos por transacciones que terminen fuera de orden.
+"""
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, Optional
+
+from sqlalchemy import delete, event, func, insert, select
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.orm import Session
+
+from . import config, sessions
+from .models import InvalidationEvent
+from .response_cache import PENDING_KEY, response_cache
+
+logger = logging.getLogger(__name__)
+
+MODES = {"off", "db"}
+WILDCARD = "*"
+
+
+class InvalidationBus:
+    def __init__(self, mode: str, interval_ms: float, max_tags: int, retention_seconds: int):
+        if mode not in MODES:
+            raise ValueError(f"INVALIDATION_BUS desconocido: {mode!r} (opciones: {', '.join(sorted(MODES))})")
+        self.mode = mode
+        self.interval = interval_ms / 1000
+        self.max_tags = max_tags
+        self.retention = retention_seconds
+        self.origin = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.last_id = 0
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = threading.Event()
+        self._last_prune = 0.0
+        # Métricas
+        self.published = 0
+        self.received = 0
+        self.polls = 0
+        self.queries = 0
+        self.errors = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.mode != "off"
+
+    # ======================================================
+    # 📤 Publicar (en la transacción del cambio)
+    # ======================================================
+    def _before_commit(self, session: Session):
+        if not self.enabled:
+            return
+        tags = session.info.get(PENDING_KEY)
+        if not tags:
+            return
+        if len(tags) > self.max_tags:
+            tags = {WILDCARD}
+        now = datetime.utcnow()
+        session.execute(
+            insert(InvalidationEvent),
+            [{"origin": self.origin, "tag": tag, "created_at": now} for tag in tags],
+        )
+        self.published += len(tags)
+
+    # ======================================================
+    # 📥 Recibir (hilo de sondeo)
+    # ======================================================
+    def start(self, bind: Engine):
+        if not self.enabled or self._thread is not None:
+            return
+        # Lo anterior al arranque no importa: las cachés de este proceso están vacías
+        with bind.connect() as conn:
+            self.last_id = conn.execute(select(func.max(InvalidationEvent.id))).scalar() or 0
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, args=(bind,), name="invalidation-bus", daemon=True)
+        self._thread.start()
+
+    def _run(self, bind: Engine):
+        conn: Optional[Connection] = None
+        data_version = None
+        while not self._stopping.wait(self.interval):
+            try:
+                # Conexión fija: data_version se compara siempre en la misma conexión
+                if conn is None:
+                    conn = bind.connect()
+                    data_version = None
+                self.polls += 1
+                if bind.dialect.name == "sqlite":
+                    version = conn.exec_driver_sql("PRAGMA data_version").scalar()
+                    conn.rollback()
+                    if version == data_version:
+                        continue
+                    data_version = version
+                self.poll(conn)
+                self._prune(bind)
+            except Exception:
+                self.errors += 1
+                logger.exception("Falló el sondeo del bus de invalidación")
+                if conn is not None:
+                    conn.invalidate()
+                    conn = None
+        if conn is not None:
+            conn.close()
+
+    def poll(self, conn: Connection) -> int:
+        """Aplica los eventos de otros procesos posteriores al último visto"""
+        self.queries += 1
+        rows = conn.execute(
+            select(InvalidationEvent.id, InvalidationEvent.origin, InvalidationEvent.tag)
+            .where(InvalidationEvent.id > self.last_id)
+            .order_by(InvalidationEvent.id)
+        ).all()
+        conn.rollback()
+        if not rows:
+            return 0
+        self.last_id = rows[-1].id
+        tags = {row.tag for row in rows if row.origin != self.origin}
+        if tags:
+            apply(tags)
+            self.received += len(tags)
+        return len(tags)
+
+    def _prune(self, bind: Engine):
+        now = time.monotonic()
+        if now - self._last_prune < max(self.retention / 10, self.interval):
+            return
+        self._last_prune = now
+        cutoff = datetime.utcnow() - timedelta(seconds=self.retention)
+        with bind.begin() as conn:
+            conn.execute(delete(InvalidationEvent).where(InvalidationEvent.created_at < cutoff))
+
+    def stop(self, timeout: Optional[float] = None):
+        thread, self._thread = self._thread, None
+        if thread is None:
+            return
+        self._stopping.set()
+        thread.join(timeout)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "mode": self.mode,
+            "origin": self.origin,
+            "running": self._thread is not None,
+            "poll_interval_ms": self.interval * 1000,
+            "last_id": self.last_id,
+            "published": self.published,
+            "received": self.received,
+            "polls": self.polls,
+            "queries": self.queries,
+            "errors": self.errors,
+        }
+
+
+def apply(tags: Iterable[str]):
+    """Invalida en este proceso lo que otro invalidó en el suyo"""
+    tags = set(tags)
+    response_cache.apply_remote(tags)
+    if WILDCARD in tags:
+        sessions.user_cache.clear()
+        return
+    for tag in tags:
+        kind, _, value = tag.partition(":")
+        if kind == "user" and value.isdigit():
+            sessions.invalidate_user(int(value))
+
+
+invalidation_bus = InvalidationBus(
+    config.INVALIDATION_BUS,
+    config.BUS_POLL_INTERVAL_MS,
+    config.BUS_MAX_TAGS,
+    config.BUS_RETENTION_SECONDS,
+)
+
+# Aplica a todas las sesiones (también a la sesión síncrona interna de AsyncSession)
+event.listen(Session, "before_commit", invalidation_bus._before_commit)
@@ -0,0 +1,182 @@
+"""Configuración de la aplicación, leída de variables de entorno (o de un archivo .env)."""
+import os
+import secrets
+import tempfile
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# ======================================================
+# 🗄️ Base de datos
+# ======================================================
+DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./tienda.db")
+# Opcional: por defecto se deriva de DATABASE_URL (sqlite -> aiosqlite, postgresql -> asyncpg)
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL")
+# "sync": endpoints con Session en el threadpool; "async": endpoints con AsyncSession
+DB_MODE = os.getenv("DB_MODE", "sync")
+# "dev": echo de SQL y valores por defecto de SQLite; "production": WAL, pragmas y pool dimensionado
+DB_PROFILE = os.getenv("DB_PROFILE", "dev")
+
+# Al arrancar: "version" compara la huella del esquema guardada en la base y sólo crea
+# o migra si cambió; "full" ejecuta create_all y revisa índices en cada arranque
+SCHEMA_CHECK = os.getenv("SCHEMA_CHECK", "version")
+
+# Ajustes del perfil production
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "20"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+SQLITE_CACHE_SIZE_KB = int(os.getenv("SQLITE_CACHE_SIZE_KB", "65536"))
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+
+# ======================================================
+# 🔐 Sesiones
+# ======================================================
+# Sin SECRET_KEY se genera una clave aleatoria: las sesiones no sobreviven a un reinicio
+SECRET_KEY = os.getenv("SECRET_KEY") or secrets.token_urlsafe(32)
+SESSION_ALGORITHM = "HS256"
+SESSION_COOKIE = "session"
+SESSION_TTL_SECONDS = int(os.getenv("SESSION_TTL_SECONDS", "86400"))
+
+# Caché en memoria de usuarios autenticados
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "1024"))
+USER_CACHE_TTL_SECONDS = float(os.getenv("USER_CACHE_TTL_SECONDS", "60"))
+
+# ======================================================
+# 🚦 Límite de intentos de login
+# ======================================================
+# Intentos fallidos tolerados por IP y por usuario dentro de la ventana; al llegar al
+# máximo se responde 429 sin consultar la base ni calcular bcrypt (0 = sin límite)
+LOGIN_MAX_FAILURES_PER_IP = int(os.getenv("LOGIN_MAX_FAILURES_PER_IP", "20"))
+LOGIN_MAX_FAILURES_PER_USER = int(os.getenv("LOGIN_MAX_FAILURES_PER_USER", "5"))
+LOGIN_FAILURE_WINDOW_SECONDS = int(os.getenv("LOGIN_FAILURE_WINDOW_SECONDS", "300"))
+# IPs + usuarios recordados como máximo (los que fallaron hace más tiempo se descartan)
+LOGIN_LIMITER_MAX_KEYS = int(os.getenv("LOGIN_LIMITER_MAX_KEYS", "100000"))
+
+# ======================================================
+# 🔑 Hash de contraseñas (bcrypt)
+# ======================================================
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+HASH_EXECUTOR = os.getenv("HASH_EXECUTOR", "thread")  # "thread" o "process" (escala en varios núcleos)
+HASH_WORKERS = int(os.getenv("HASH_WORKERS", str(os.cpu_count() or 2)))
+# Máximo de hashes en curso + en cola; por encima se responde 503 con Retry-After
+HASH_MAX_PENDING = int(os.getenv("HASH_MAX_PENDING", str(HASH_WORKERS * 4)))
+HASH_RETRY_AFTER_SECONDS = int(os.getenv("HASH_RETRY_AFTER_SECONDS", "1"))
+
+# ======================================================
+# 📝 Historial (auditoría)
+# ======================================================
+# Las filas más antiguas que AUDIT_RETENTION_DAYS se mueven a archivos NDJSON
+# comprimidos, uno por mes, dentro de AUDIT_ARCHIVE_DIR
+AUDIT_ARCHIVE_DIR = os.getenv("AUDIT_ARCHIVE_DIR", "./audit_archive")
+AUDIT_RETENTION_DAYS = int(os.getenv("AUDIT_RETENTION_DAYS", "90"))
+
+# Escritura del historial: "transaction" (en la misma transacción del cambio),
+# "sync" (transacción propia tras el commit) o "buffered" (cola + lotes en segundo plano)
+AUDIT_MODE = os.getenv("AUDIT_MODE", "transaction")
+AUDIT_BATCH_SIZE = int(os.getenv("AUDIT_BATCH_SIZE", "500"))
+AUDIT_FLUSH_INTERVAL = float(os.getenv("AUDIT_FLUSH_INTERVAL", "0.5"))
+# Con la cola llena el evento se escribe en el momento (nunca se descarta)
+AUDIT_MAX_QUEUE = int(os.getenv("AUDIT_MAX_QUEUE", "10000"))
+
+# ======================================================
+# ⚡ Caché de respuestas (endpoints de lectura frecuente)
+# ======================================================
+# "memory" (LRU por proceso), "redis" (compartida, requiere el paquete redis) u "off"
+RESPONSE_CACHE_BACKEND = os.getenv("RESPONSE_CACHE_BACKEND", "memory")
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "2048"))
+RESPONSE_CACHE_TTL_SECONDS = float(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "300"))
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+
+# ======================================================
+# 🧾 Serialización de respuestas
+# ======================================================
+# "model": validación y serialización con response_model (por defecto);
+# "fast": los listados seleccionan columnas y se codifican directo a bytes (orjson si está)
+RESPONSE_SERIALIZER = os.getenv("RESPONSE_SERIALIZER", "model")
+
+# ======================================================
+# 📈 Métricas (GET /metrics en formato Prometheus)
+# ======================================================
+# Peticiones más lentas que este umbral se registran con sus sentencias SQL (0 = no)
+SLOW_REQUEST_MS = float(os.getenv("SLOW_REQUEST_MS", "0"))
+# Si se define, /metrics exige "Authorization: Bearer <METRICS_TOKEN>"
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+
+# ======================================================
+# 🛒 Compras y reservas de stock
+# ======================================================
+# Vigencia de una reserva; vencida, su cantidad vuelve al stock
+STOCK_RESERVATION_TTL_SECONDS = int(os.getenv("STOCK_RESERVATION_TTL_SECONDS", "900"))
+# Cada cuánto el hilo de fondo libera las reservas vencidas (0 = no se inicia)
+STOCK_SWEEP_INTERVAL_SECONDS = float(os.getenv("STOCK_SWEEP_INTERVAL_SECONDS", "30"))
+
+# ======================================================
+# 🖼️ Imágenes de productos
+# ======================================================
+# Originales (por hash de contenido) y miniaturas viven bajo IMAGE_DIR
+IMAGE_DIR = os.getenv("IMAGE_DIR", "./media")
+IMAGE_MAX_BYTES = int(os.getenv("IMAGE_MAX_BYTES", str(10 * 1024 * 1024)))
+# Lado máximo en px de cada miniatura (separados por coma); requieren Pillow
+IMAGE_THUMBNAIL_SIZES = tuple(
+    int(size) for size in os.getenv("IMAGE_THUMBNAIL_SIZES", "128,512").split(",") if size.strip()
+)
+IMAGE_THUMBNAIL_WORKERS = int(os.getenv("IMAGE_THUMBNAIL_WORKERS", "2"))
+# Cache-Control de originales y miniaturas (la URL cambia si cambia el contenido)
+IMAGE_CACHE_MAX_AGE = int(os.getenv("IMAGE_CACHE_MAX_AGE", str(365 * 86400)))
+
+# ======================================================
+# 🧰 Operaciones por lotes (admin)
+# ======================================================
+# Filas por transacción en las actualizaciones y borrados masivos
+BATCH_CHUNK_SIZE = int(os.getenv("BATCH_CHUNK_SIZE", "500"))
+# Máximo de ids explícitos por petición (con filtro no hay límite)
+BATCH_MAX_IDS = int(os.getenv("BATCH_MAX_IDS", "10000"))
+
+# ======================================================
+# 🧵 Varios workers (python -m app.server)
+# ======================================================
+WORKERS = int(os.getenv("WORKERS", "1"))
+# Lock de archivo para que un solo proceso a la vez cree/migre el esquema al arrancar
+INIT_LOCK_FILE = os.getenv("INIT_LOCK_FILE", os.path.join(tempfile.gettempdir(), "tienda-init.lock"))
+# Invalidación de cachés en memoria entre procesos: "db" (tabla de eventos + sondeo)
+# u "off"; por defecto "db" cuando hay más de un worker
+INVALIDATION_BUS = os.getenv("INVALIDATION_BUS", "db" if WORKERS > 1 else "off")
+BUS_POLL_INTERVAL_MS = float(os.getenv("BUS_POLL_INTERVAL_MS", "200"))
+# Una transacción con más etiquetas publica un único evento "vaciar todo"
+BUS_MAX_TAGS = int(os.getenv("BUS_MAX_TAGS", "256"))
+BUS_RETENTION_SECONDS = int(os.getenv("BUS_RETENTION_SECONDS", "600"))
+
+# ======================================================
+# 📉 Historial de precios y stock (app.history)
+# ======================================================
+# Registrar cada cambio de precio/cantidad de un producto (tabla productevent)
+HISTORY_ENABLED = os.getenv("HISTORY_ENABLED", "1") == "1"
+# Cada cuánto el hilo de fondo consolida los eventos en buckets por hora y por día
+# (0 = no se inicia; se puede correr con `python -m app.history rollup`)
+HISTORY_ROLLUP_INTERVAL_SECONDS = float(os.getenv("HISTORY_ROLLUP_INTERVAL_SECONDS", "60"))
+# Eventos consolidados por transacción
+HISTORY_ROLLUP_BATCH = int(os.getenv("HISTORY_ROLLUP_BATCH", "10000"))
+# Los eventos ya consolidados y los buckets por hora se borran pasados estos días
+# (los buckets diarios se conservan)
+HISTORY_EVENT_RETENTION_DAYS = int(os.getenv("HISTORY_EVENT_RETENTION_DAYS", "30"))
+HISTORY_HOURLY_RETENTION_DAYS = int(os.getenv("HISTORY_HOURLY_RETENTION_DAYS", "90"))
+# Máximo de buckets por consulta a /stats/timeseries
+TIMESERIES_MAX_POINTS = int(os.getenv("TIMESERIES_MAX_POINTS", "2000"))
+
+# ======================================================
+# 🧩 Plantillas HTML
+# ======================================================
+# Bytecode compilado de Jinja2 en disco: un proceso nuevo no recompila las plantillas.
+# Sin definir: directorio temporal por usuario de Jinja2; "off": sin caché en disco
+TEMPLATE_CACHE_DIR = os.getenv("TEMPLATE_CACHE_DIR")
+# Revisar en cada uso si el archivo de la plantilla cambió (cómodo al desarrollar)
+TEMPLATE_AUTO_RELOAD = os.getenv("TEMPLATE_AUTO_RELOAD", "1" if DB_PROFILE == "dev" else "0") == "1"
+
+# ======================================================
+# 🚀 Arranque
+# ======================================================
+# "1": passlib/bcrypt y Jinja2 se importan al primer uso (arranque más rápido);
+# "0": se cargan y se pre-renderizan las páginas durante el arranque
+LAZY_IMPORTS = os.getenv("LAZY_IMPORTS", "1") == "1"
@@ -0,0 +1,498 @@
+"""
+Contadores materializados de inventario.
+
+Los handlers de productos y usuarios llaman a estas funciones dentro de su propia
+transacción (antes del commit), así los contadores nunca quedan a medias. Los
+cambios de productos también se anotan en el historial de precios y stock
+(app.history), incluso cuando la fila de contadores se recalcula.
+
+Reconstruir o verificar desde cero:
+    python -m app.counters verify
+    python -m app.counters rebuild
+"""
+import sys
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import delete, func, or_, select, update
+from sqlalchemy.orm import Session
+
+from . import aggregates, history
+from .models import InventoryStats, OwnerStats, Product, User
+
+STATS_ID = 1
+# Tolerancia para sumas de punto flotante acumuladas incrementalmente
+VALUE_TOLERANCE = 1e-6
+
+ROLE_COLUMNS = {"admin": InventoryStats.admin_users, "client": InventoryStats.client_users}
+
+
+# ======================================================
+# 🛍️ Cambios de productos
+# ======================================================
+def product_created(session: Session, product: Product):
+    session.flush()  # Necesitamos el id para el producto más caro / con más stock
+    history.product_created(session, product)
+    if _ensure_row(session):
+        return
+    _add_product(session, product.owner_id, product.price, product.quantity, 1)
+    _offer_top(session, product)
+
+
+def product_updated(session: Session, before: Dict[str, Any], product: Product):
+    """`before` es la foto de (owner_id, price, quantity) previa al cambio"""
+    session.flush()
+    history.product_updated(session, before, product)
+    if _ensure_row(session):
+        return
+    _add_product(session, before["owner_id"], before["price"], before["quantity"], -1)
+    _add_product(session, product.owner_id, product.price, product.quantity, 1)
+
+    stats = _stats_row(session)
+    if product.id in (stats.most_expensive_id, stats.most_stocked_id):
+        # El líder pudo bajar: se busca el nuevo máximo (consulta ordenada, LIMIT 1)
+        _refresh_top(session)
+    else:
+        _offer_top(session, product)
+
+
+def product_deleted(session: Session, product: Product):
+    session.flush()
+    history.product_deleted(session, product)
+    if _ensure_row(session):
+        return
+    _add_product(session, product.owner_id, product.price, product.quantity, -1)
+
+    stats = _stats_row(session)
+    if product.id in (stats.most_expensive_id, stats.most_stocked_id):
+        _refresh_top(session)
+
+
+def products_bulk_created(session: Session, rows: List[Dict[str, Any]], after_id: int):
+    """Versión por lotes de product_created (filas ya insertadas con id > after_id)"""
+    if not rows:
+        return
+    history.products_bulk_created(session, after_id)
+    if _ensure_row(session):
+        return
+
+    per_owner: Dict[Optional[int], List[float]] = {}
+    for row in rows:
+        totals = per_owner.setdefault(row["owner_id"], [0, 0.0])
+        totals[0] += 1
+        totals[1] += row["price"] * row["quantity"]
+    for owner_id, (count, value) in per_owner.items():
+        _add_products(session, owner_id, count, value)
+
+    # Sólo los líderes del lote pueden desplazar a los actuales: se buscan en el
+    # rango de ids nuevos (rango por rowid, sin recorrer toda la tabla)
+    for column in (Product.price, Product.quantity):
+        best = session.execute(
+            select(Product.id, Product.name, Product.price, Product.quantity)
+            .where(Product.id > after_id)
+            .order_by(column.desc(), Product.id)
+            .limit(1)
+        ).first()
+        if best is not None:
+            _offer_top(session, best)
+
+
+def products_bulk_changed(session: Session, before: List[Any], after: List[Any]):
+    """Versión por lotes de product_updated/product_deleted, llamada después del
+    UPDATE/DELETE: filas con owner_id, price y quantity antes y después (after vacío
+    si se borraron)"""
+    if not before:
+        return
+    history.products_bulk_changed(session, before, after)
+    if _ensure_row(session):
+        return
+    per_owner: Dict[Optional[int], List[float]] = {}
+    for rows, sign in ((before, -1), (after, 1)):
+        for row in rows:
+            totals = per_owner.setdefault(row.owner_id, [0, 0.0])
+            totals[0] += sign
+            totals[1] += sign * row.price * row.quantity
+    for owner_id, (count, value) in per_owner.items():
+        if count or value:
+            _add_products(session, owner_id, count, value)
+    # Un bloque puede mover a cualquier líder: una búsqueda (LIMIT 1) por bloque
+    _refresh_top(session)
+
+
+def stock_changed(session: Session, product, delta: int):
+    """Compra/reserva (delta < 0) o devolución (delta > 0) ya aplicada con un UPDATE
+    atómico; `product` trae id, name, price, quantity (nueva) y owner_id"""
+    history.stock_changed(session, product, delta)
+    if _ensure_row(session):
+        return
+    _add_products(session, product.owner_id, 0, product.price * delta)
+    if delta > 0:
+        _offer_top(session, product)
+        return
+    # Se lee el líder de la base (no del identity map): en un checkout otro
+    # renglón de la misma transacción pudo haberlo cambiado
+    leader = session.execute(
+        select(InventoryStats.most_stocked_id).where(InventoryStats.id == STATS_ID)
+    ).scalar()
+    if leader == product.id:
+        _refresh_top(session)
+
+
+def product_snapshot(product: Product) -> Dict[str, Any]:
+    return {"owner_id": product.owner_id, "price": product.price, "quantity": product.quantity}
+
+
+# ======================================================
+# 👤 Cambios de usuarios
+# ======================================================
+def user_created(session: Session, user: User):
+    if _ensure_row(session):
+        return
+    _add_user(session, user.role, 1)
+
+
+def user_role_changed(session: Session, old_role: str, new_role: str):
+    if old_role != new_role and not _ensure_row(session):
+        _add_user(session, old_role, -1, count_total=False)
+        _add_user(session, new_role, 1, count_total=False)
+
+
+def user_deleted(session: Session, user: User):
+    if _ensure_row(session):
+        return
+    _add_user(session, user.role, -1)
+
+
+def products_released(session: Session, owner_ids: List[int], rows: List[Any]):
+    """Productos que quedaron sin dueño al borrar los usuarios `owner_ids` (UPDATE
+    owner_id = NULL ya aplicado; `rows` trae id, price, quantity y el owner_id
+    anterior): pasan a "sin dueño" y se borran las filas por dueño de esos usuarios.
+    El total de productos, el valor y los líderes no cambian"""
+    history.products_released(session, rows)
+    if _ensure_row(session):
+        return
+    session.execute(delete(OwnerStats).where(OwnerStats.owner_id.in_(owner_ids)))
+    if rows:
+        session.execute(
+            update(InventoryStats)
+            .where(InventoryStats.id == STATS_ID)
+            .values(
+                products_with_owner=InventoryStats.products_with_owner - len(rows),
+                updated_at=datetime.utcnow(),
+            )
+        )
+
+
+def users_bulk_changed(session: Session, before_roles: List[str], after_roles: Optional[List[str]] = None):
+    """Versión por lotes de user_role_changed (after_roles) o user_deleted (None),
+    llamada después del UPDATE/DELETE"""
+    if not before_roles or _ensure_row(session):
+        return
+    deltas: Dict[str, int] = {}
+    for role in before_roles:
+        deltas[role] = deltas.get(role, 0) - 1
+    for role in after_roles or ():
+        deltas[role] = deltas.get(role, 0) + 1
+    for role, delta in deltas.items():
+        if delta:
+            _add_user(session, role, delta, count_total=after_roles is None)
+
+
+# ======================================================
+# 📊 Lecturas O(1)
+# ======================================================
+def general_stats(session: Session) -> Dict[str, Any]:
+    """Misma respuesta que /stats/general, leída de la fila materializada"""
+    stats = _stats_row(session)
+    return {
+        "users": {
+            "total": stats.total_users,
+            "admins": stats.admin_users,
+            "clients": stats.client_users
+        },
+        "products": {
+            "total": stats.total_products,
+            "with_owner": stats.products_with_owner,
+            "without_owner": stats.total_products - stats.products_with_owner,
+            "total_inventory_value": stats.total_inventory_value,
+            "most_expensive_product": {
+                "id": stats.most_expensive_id,
+                "name": stats.most_expensive_name,
+                "price": stats.most_expensive_price
+            } if stats.most_expensive_id is not None else None,
+            "most_stocked_product": {
+                "id": stats.most_stocked_id,
+                "name": stats.most_stocked_name,
+                "quantity": stats.most_stocked_quantity
+            } if stats.most_stocked_id is not None else None
+        }
+    }
+
+
+def user_product_summaries(session: Session, limit: Optional[int] = None, offset: int = 0) -> List[Dict[str, Any]]:
+    """Conteo y valor de inventario por usuario, ordenado por cantidad de productos
+    (leídos de los contadores por dueño)"""
+    product_count = func.coalesce(OwnerStats.product_count, 0).label("product_count")
+    stmt = (
+        select(
+            User.id.label("user_id"),
+            User.username,
+            User.role,
+            product_count,
+            func.coalesce(OwnerStats.inventory_value, 0).label("total_inventory_value"),
+        )
+        .outerjoin(OwnerStats, OwnerStats.owner_id == User.id)
+        .order_by(product_count.desc(), User.id)
+        .offset(offset)
+    )
+    if limit is not None:
+        stmt = stmt.limit(limit)
+    return [dict(row) for row in session.execute(stmt).mappings()]
+
+
+def owned_totals(session: Session) -> Dict[str, Any]:
+    """Productos y valor de dueños existentes (recorre usuarios, no productos)"""
+    row = session.execute(
+        select(
+            func.coalesce(func.sum(OwnerStats.product_count), 0),
+            func.coalesce(func.sum(OwnerStats.inventory_value), 0),
+        ).join(User, User.id == OwnerStats.owner_id)
+    ).one()
+    return {"total_products": row[0], "total_inventory_value": row[1]}
+
+
+# ======================================================
+# 🔧 Reconstrucción y verificación
+# ======================================================
+def rebuild(session: Session):
+    """Recalcula todos los contadores desde las tablas base (no hace commit)"""
+    session.execute(delete(OwnerStats))
+    session.execute(delete(InventoryStats))
+
+    per_owner = session.execute(
+        select(
+            Product.owner_id,
+            func.count(Product.id),
+            aggregates.inventory_value,
+        ).where(Product.owner_id.is_not(None)).group_by(Product.owner_id)
+    ).all()
+    session.add_all(
+        OwnerStats(owner_id=owner_id, product_count=count, inventory_value=value)
+        for owner_id, count, value in per_owner
+    )
+
+    users = aggregates.user_counts(session)
+    products = aggregates.product_totals(session)
+    session.add(InventoryStats(
+        id=STATS_ID,
+        total_users=users["total"],
+        admin_users=users["admins"],
+        client_users=users["clients"],
+        total_products=products["total"],
+        products_with_owner=products["with_owner"],
+        total_inventory_value=products["total_inventory_value"],
+    ))
+    session.flush()
+    _refresh_top(session)
+
+
+def verify(session: Session) -> List[str]:
+    """Compara los contadores con un recálculo completo y describe cada diferencia"""
+    drift = []
+    stored = general_stats(session)
+    expected = {
+        "users": aggregates.user_counts(session),
+        "products": {
+            **aggregates.product_totals(session),
+            "most_expensive_product": aggregates.top_product(session, Product.price),
+            "most_stocked_product": aggregates.top_product(session, Product.quantity),
+        },
+    }
+    for section, values in expected.items():
+        for key, value in values.items():
+            if not _same(stored[section][key], value):
+                drift.append(f"{section}.{key}: guardado={stored[section][key]!r} real={value!r}")
+
+    actual_owners = {
+        owner_id: (count, value)
+        for owner_id, count, value in session.execute(
+            select(Product.owner_id, func.count(Product.id), aggregates.inventory_value)
+            .where(Product.owner_id.is_not(None))
+            .group_by(Product.owner_id)
+        )
+    }
+    stored_owners = {
+        row.owner_id: (row.product_count, row.inventory_value)
+        for row in session.execute(select(OwnerStats)).scalars()
+    }
+    for owner_id in sorted(set(actual_owners) | set(stored_owners)):
+        stored_count, stored_value = stored_owners.get(owner_id, (0, 0))
+        count, value = actual_owners.get(owner_id, (0, 0))
+        if stored_count != count or not _same(stored_value, value):
+            drift.append(
+                f"owner {owner_id}: guardado=({stored_count}, {stored_value!r}) real=({count}, {value!r})"
+            )
+    return drift
+
+
+def ensure_initialized(session: Session):
+    """Construye los contadores la primera vez (bases existentes sin la tabla)"""
+    if session.get(InventoryStats, STATS_ID) is None:
+        rebuild(session)
+        session.commit()
+
+
+# ======================================================
+# Helpers internos
+# ======================================================
+def _stats_row(session: Session) -> InventoryStats:
+    stats = session.get(InventoryStats, STATS_ID)
+    if stats is None:
+        rebuild(session)
+        stats = session.get(InventoryStats, STATS_ID)
+    return stats
+
+
+def _ensure_row(session: Session) -> bool:
+    """Crea la fila si falta; True indica que el recálculo ya incluye el cambio en curso"""
+    if session.get(InventoryStats, STATS_ID) is not None:
+        return False
+    rebuild(session)
+    return True
+
+
+def _add_product(session: Session, owner_id: Optional[int], price: float, quantity: int, sign: int):
+    _add_products(session, owner_id, sign, sign * price * quantity)
+
+
+def _add_products(session: Session, owner_id: Optional[int], count: int, value: float):
+    session.execute(
+        update(InventoryStats)
+        .where(InventoryStats.id == STATS_ID)
+        .values(
+            total_products=InventoryStats.total_products + count,
+            products_with_owner=InventoryStats.products_with_owner + (count if owner_id is not None else 0),
+            total_inventory_value=InventoryStats.total_inventory_value + value,
+            updated_at=datetime.utcnow(),
+        )
+    )
+    if owner_id is None:
+        return
+
+    result = session.execute(
+        update(OwnerStats)
+        .where(OwnerStats.owner_id == owner_id)
+        .values(
+            product_count=OwnerStats.product_count + count,
+            inventory_value=OwnerStats.inventory_value + value,
+        )
+    )
+    if result.rowcount == 0:
+        session.add(OwnerStats(owner_id=owner_id, product_count=count, inventory_value=value))
+        session.flush()
+
+
+def _add_user(session: Session, role: str, sign: int, count_total: bool = True):
+    values = {"updated_at": datetime.utcnow()}
+    if count_total:
+        values["total_users"] = InventoryStats.total_users + sign
+    if role in ROLE_COLUMNS:
+        column = ROLE_COLUMNS[role]
+        values[column.key] = column + sign
+    session.execute(
+        update(InventoryStats)
+        .where(InventoryStats.id == STATS_ID)
+        .values(**values)
+    )
+
+
+def _offer_top(session: Session, product: Product):
+    """Reemplaza al líder sólo si el producto lo supera (comparación atómica en SQL)"""
+    session.execute(
+        update(InventoryStats)
+        .where(
+            InventoryStats.id == STATS_ID,
+            or_(
+                InventoryStats.most_expensive_price.is_(None),
+                InventoryStats.most_expensive_price < product.price,
+                (InventoryStats.most_expensive_price == product.price)
+                & (InventoryStats.most_expensive_id > product.id),
+            ),
+        )
+        .values(
+            most_expensive_id=product.id,
+            most_expensive_name=product.name,
+            most_expensive_price=product.price,
+        )
+    )
+    session.execute(
+        update(InventoryStats)
+        .where(
+            InventoryStats.id == STATS_ID,
+            or_(
+                InventoryStats.most_stocked_quantity.is_(None),
+                InventoryStats.most_stocked_quantity < product.quantity,
+                (InventoryStats.most_stocked_quantity == product.quantity)
+                & (InventoryStats.most_stocked_id > product.id),
+            ),
+        )
+        .values(
+            most_stocked_id=product.id,
+            most_stocked_name=product.name,
+            most_stocked_quantity=product.quantity,
+        )
+    )
+
+
+def _refresh_top(session: Session):
+    """Vuelve a buscar los líderes de precio y stock"""
+    expensive = aggregates.top_product(session, Product.price) or {}
+    stocked = aggregates.top_product(session, Product.quantity) or {}
+    session.execute(
+        update(InventoryStats)
+        .where(InventoryStats.id == STATS_ID)
+        .values(
+            most_expensive_id=expensive.get("id"),
+            most_expensive_name=expensive.get("name"),
+            most_expensive_price=expensive.get("price"),
+            most_stocked_id=stocked.get("id"),
+            most_stocked_name=stocked.get("name"),
+            most_stocked_quantity=stocked.get("quantity"),
+        )
+    )
+
+
+def _same(stored, actual) -> bool:
+    if isinstance(stored, float) or isinstance(actual, float):
+        return abs((stored or 0) - (actual or 0)) <= VALUE_TOLERANCE * max(1.0, abs(actual or 0))
+    return stored == actual
+
+
+def main(argv: List[str]) -> int:
+    from .database import engine, init_db
+
+    command = argv[0] if argv else "verify"
+    if command not in ("verify", "rebuild"):
+        print("Uso: python -m app.counters [verify|rebuild]")
+        return 2
+
+    init_db()
+    with Session(engine) as session:
+        if command == "rebuild":
+            rebuild(session)
+            session.commit()
+            print("Contadores reconstruidos.")
+            return 0
+
+        drift = verify(session)
+        if not drift:
+            print("Contadores consistentes.")
+            return 0
+        print(f"Se encontraron {len(drift)} diferencias:")
+        for line in drift:
+            print(f"  - {line}")
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
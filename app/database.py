@@ -1,16 +1,215 @@
+import contextlib
+import hashlib
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from sqlalchemy import event, select
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.exc import OperationalError, ProgrammingError
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlmodel import SQLModel, create_engine, Session
+from . import config, counters, metrics, search
+from .models import SchemaVersion
+
+try:
+    import fcntl
+except ImportError:  # Windows: sin flock
+    fcntl = None
+
+# URL de la base de datos (DATABASE_URL; por defecto el archivo SQLite local)
+DATABASE_URL = config.DATABASE_URL
+
+# ======================================================
+# 🏭 Fábrica de engines por perfil (DB_PROFILE)
+# ======================================================
+# dev: echo de cada sentencia SQL, configuración por defecto.
+# production: sin echo, WAL (los lectores no esperan a los escritores),
+# synchronous=NORMAL, caché y mmap grandes, busy_timeout y pool con pre-ping.
+PROFILES = {"dev", "production"}
+
+def sqlite_pragmas(profile: str) -> Dict[str, object]:
+    if profile != "production":
+        return {}
+    return {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "busy_timeout": config.SQLITE_BUSY_TIMEOUT_MS,
+        "cache_size": -config.SQLITE_CACHE_SIZE_KB,  # negativo = KiB
+        "mmap_size": config.SQLITE_MMAP_SIZE,
+        "temp_store": "MEMORY",
+    }
+
+def engine_options(url: str, profile: str, echo: Optional[bool] = None) -> dict:
+    if profile not in PROFILES:
+        raise ValueError(f"DB_PROFILE desconocido: {profile!r} (opciones: {', '.join(sorted(PROFILES))})")
+
+    options = {"echo": (profile == "dev") if echo is None else echo}
+    parsed = make_url(url)
+    in_memory = parsed.get_backend_name() == "sqlite" and parsed.database in (None, "", ":memory:")
+    if profile == "production" and not in_memory:
+        options.update(
+            pool_size=config.DB_POOL_SIZE,
+            max_overflow=config.DB_MAX_OVERFLOW,
+            pool_timeout=config.DB_POOL_TIMEOUT,
+            pool_pre_ping=True,
+        )
+    return options
 
-# Nombre del archivo de base de datos SQLite
-DATABASE_URL = "sqlite:///./tienda.db"
+def install_pragmas(sync_engine: Engine, url: str, profile: str):
+    """Aplica los PRAGMA en cada conexión nueva (evento connect del pool)"""
+    pragmas = sqlite_pragmas(profile)
+    if not pragmas or make_url(url).get_backend_name() != "sqlite":
+        return
+
+    @event.listens_for(sync_engine, "connect")
+    def _set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
+
+def make_engine(url: str = DATABASE_URL, profile: str = config.DB_PROFILE, echo: Optional[bool] = None) -> Engine:
+    new_engine = create_engine(url, **engine_options(url, profile, echo))
+    install_pragmas(new_engine, url, profile)
+    return new_engine
 
 # Motor de base de datos (engine)
-engine = create_engine(DATABASE_URL, echo=True)
+engine = make_engine()
+metrics.instrument_engine(engine, "sync")
 
-# Crear todas las tablas
+# Crear todas las tablas (y el índice de búsqueda FTS5 con sus triggers)
 def init_db():
     SQLModel.metadata.create_all(engine)
+    ensure_indexes(engine)
+    search.ensure_index(engine)
+
+# ======================================================
+# 🔒 Inicialización única entre procesos (varios workers)
+# ======================================================
+@contextlib.contextmanager
+def init_lock(path: str = config.INIT_LOCK_FILE):
+    """Lock exclusivo de archivo (flock): un proceso a la vez crea el esquema; los
+    demás esperan y después sólo verifican que ya existe. Sin fcntl no bloquea"""
+    if fcntl is None:
+        yield
+        return
+    with open(path, "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+def prepare_database() -> bool:
+    """Esquema, índices y contadores materializados; True si hubo que crearlos o migrarlos.
+
+    Con SCHEMA_CHECK=version, si la huella guardada coincide con la de los modelos
+    sólo se lee esa fila: sin lock, sin create_all y sin revisar cada índice"""
+    if config.SCHEMA_CHECK not in SCHEMA_CHECKS:
+        raise ValueError(
+            f"SCHEMA_CHECK desconocido: {config.SCHEMA_CHECK!r} (opciones: {', '.join(sorted(SCHEMA_CHECKS))})"
+        )
+    if config.SCHEMA_CHECK == "version" and schema_is_current(engine):
+        return False
+    with init_lock():
+        # Otro proceso pudo terminar la inicialización mientras se esperaba el lock
+        if config.SCHEMA_CHECK == "version" and schema_is_current(engine):
+            return False
+        init_db()
+        with Session(engine) as session:
+            counters.ensure_initialized(session)
+            session.merge(SchemaVersion(id=1, fingerprint=SCHEMA_FINGERPRINT, applied_at=datetime.utcnow()))
+            session.commit()
+    return True
+
+# ======================================================
+# 🏷️ Versión del esquema
+# ======================================================
+SCHEMA_CHECKS = {"version", "full"}
+
+def schema_fingerprint() -> str:
+    """Huella del esquema de los modelos (tablas, columnas, índices y el índice de
+    búsqueda): cambia sola al modificar un modelo, sin numerar versiones a mano"""
+    parts = []
+    for table in SQLModel.metadata.sorted_tables:
+        parts.append(table.name)
+        parts.extend(f"{c.name}:{c.type!r}:{c.nullable}:{c.primary_key}" for c in table.columns)
+        parts.extend(sorted(
+            f"{i.name}:{','.join(c.name for c in i.columns)}:{i.unique}" for i in table.indexes
+        ))
+    parts.extend(search.FTS_DDL)
+    return hashlib.sha256("\n".join(parts).encode()).hexdigest()[:16]
+
+SCHEMA_FINGERPRINT = schema_fingerprint()
+
+def schema_is_current(bind: Engine) -> bool:
+    try:
+        with bind.connect() as conn:
+            stored = conn.execute(select(SchemaVersion.fingerprint).where(SchemaVersion.id == 1)).scalar()
+    except (OperationalError, ProgrammingError):
+        return False  # base nueva o anterior a la tabla de versión
+    return stored == SCHEMA_FINGERPRINT
+
+# ======================================================
+# 🧭 Migración de índices para bases existentes
+# ======================================================
+# create_all sólo crea índices junto con tablas nuevas: en un tienda.db anterior
+# las tablas ya existen, así que cada índice del modelo se crea aquí si falta.
+def ensure_indexes(bind: Engine) -> List[str]:
+    created = []
+    with bind.begin() as conn:
+        for table in SQLModel.metadata.sorted_tables:
+            for index in table.indexes:
+                if not bind.dialect.has_index(conn, table.name, index.name):
+                    index.create(conn)
+                    created.append(index.name)
+        # Estadísticas para el planificador sobre los índices recién creados
+        if created and bind.dialect.name == "sqlite":
+            conn.exec_driver_sql("ANALYZE")
+    return created
 
 # Obtener sesión para interactuar con la base de datos
 def get_session():
     with Session(engine) as session:
         yield session
+
+# ======================================================
+# ⚡ Modo asíncrono (DB_MODE=async)
+# ======================================================
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+    "postgresql+psycopg2": "postgresql+asyncpg",
+}
+
+def async_url(url: str) -> str:
+    """Traduce la URL síncrona al driver asíncrono equivalente"""
+    scheme, sep, rest = url.partition("://")
+    return ASYNC_DRIVERS.get(scheme, scheme) + sep + rest
+
+ASYNC_DATABASE_URL = config.ASYNC_DATABASE_URL or async_url(DATABASE_URL)
+
+# Se crea al primer uso: el modo síncrono no necesita aiosqlite/asyncpg instalados
+_async_engine = None
+_async_session_factory = None
+
+def get_async_engine():
+    global _async_engine, _async_session_factory
+    if _async_engine is None:
+        _async_engine = create_async_engine(
+            ASYNC_DATABASE_URL, **engine_options(ASYNC_DATABASE_URL, config.DB_PROFILE, engine.echo)
+        )
+        install_pragmas(_async_engine.sync_engine, ASYNC_DATABASE_URL, config.DB_PROFILE)
+        metrics.instrument_engine(_async_engine.sync_engine, "async")
+        # Sin expirar al hacer commit: en async no se puede cargar un atributo de forma implícita
+        _async_session_factory = async_sessionmaker(_async_engine, expire_on_commit=False)
+    return _async_engine
+
+async def get_async_session():
+    get_async_engine()
+    async with _async_session_factory() as session:
+        yield session
+
+async def dispose_async_engine():
+    if _async_engine is not None:
+        await _async_engine.dispose()
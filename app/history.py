@@ -0,0 +1,598 @@
+"""
+Historial de precios y stock de productos, con series consolidadas por hora y por día.
+
+Registro: app.counters llama a estas funciones en cada cambio de producto (alta,
+edición, borrado, importación, lotes, compras, reservas, devoluciones y productos
+que quedan sin dueño al borrar un usuario), así ningún camino de escritura queda
+afuera. Las filas se retienen en la sesión y se insertan
+con un único INSERT de varias filas antes del commit (before_commit): el evento
+existe si y sólo si el cambio se guardó, y a la petición le cuesta una sentencia
+más en una transacción que ya estaba abierta. La importación masiva los genera con
+INSERT ... SELECT sobre el rango de ids nuevos. Una edición que no toca dueño,
+precio ni cantidad no genera evento.
+
+Consolidación: un hilo de fondo (cada HISTORY_ROLLUP_INTERVAL_SECONDS) suma los
+eventos con id > RollupState.last_event_id a los buckets por hora y por día de cada
+producto (mín/máx/promedio/cierre de precio, mín/máx/cierre de stock) y del valor de
+inventario por dueño y total (owner_id=0). El valor de partida sale de los
+contadores materializados menos los eventos todavía no consolidados, en una sola
+consulta. La marca avanza con un compare-and-set: con varios workers, sólo uno
+consolida cada tramo y los demás lo descartan.
+
+Consulta: `series` lee una fila por bucket del rango (clave primaria serie +
+granularity + bucket) sin recorrer eventos; un bucket sin cambios repite el cierre
+del anterior. Los datos llegan hasta la última consolidación (`rolled_up_to`).
+
+    python -m app.history rollup    # consolidar ahora todo lo pendiente
+    python -m app.history prune     # borrar eventos y buckets por hora vencidos
+"""
+import logging
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import bindparam, delete, event, func, insert, literal, select, update
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from . import config
+from .models import InventoryRollup, InventoryStats, OwnerStats, Product, ProductEvent, ProductRollup, RollupState
+
+logger = logging.getLogger(__name__)
+
+PENDING_KEY = "product_events"
+STATE_ID = 1
+# Serie del inventario completo en InventoryRollup
+TOTAL_OWNER = 0
+STEPS = {"hour": timedelta(hours=1), "day": timedelta(days=1)}
+PRODUCT_METRICS = {"price", "stock"}
+METRICS = PRODUCT_METRICS | {"value"}
+# Ids por sentencia IN al leer buckets existentes
+KEY_CHUNK = 500
+PRUNE_EVERY_SECONDS = 3600
+
+
+# ======================================================
+# 📝 Registro (en la transacción del cambio)
+# ======================================================
+def _event(product_id: int, owner_id: Optional[int], price: float, quantity: int, value_delta: float, at: datetime):
+    return {
+        "product_id": product_id,
+        "owner_id": owner_id,
+        "price": price,
+        "quantity": quantity,
+        "value_delta": value_delta,
+        "at": at,
+    }
+
+
+def _changed(before, after) -> List[Dict[str, Any]]:
+    """Eventos de un producto que pasó de `before` a `after` (owner_id, price, quantity)"""
+    at = datetime.utcnow()
+    old_value = before["price"] * before["quantity"]
+    new_value = after["price"] * after["quantity"]
+    if before["owner_id"] == after["owner_id"]:
+        if before["price"] == after["price"] and before["quantity"] == after["quantity"]:
+            return []
+        return [_event(after["id"], after["owner_id"], after["price"], after["quantity"], new_value - old_value, at)]
+    # Cambio de dueño: sale del inventario de uno y entra al del otro
+    return [
+        _event(after["id"], before["owner_id"], before["price"], before["quantity"], -old_value, at),
+        _event(after["id"], after["owner_id"], after["price"], after["quantity"], new_value, at),
+    ]
+
+
+def _pending(session: Session, events: List[Dict[str, Any]]):
+    if config.HISTORY_ENABLED and events:
+        session.info.setdefault(PENDING_KEY, []).extend(events)
+
+
+def product_created(session: Session, product: Product):
+    _pending(session, [_event(
+        product.id, product.owner_id, product.price, product.quantity, product.price * product.quantity, datetime.utcnow()
+    )])
+
+
+def product_updated(session: Session, before: Dict[str, Any], product: Product):
+    after = {"id": product.id, "owner_id": product.owner_id, "price": product.price, "quantity": product.quantity}
+    _pending(session, _changed(before, after))
+
+
+def product_deleted(session: Session, product: Product):
+    _pending(session, [_event(
+        product.id, product.owner_id, product.price, 0, -product.price * product.quantity, datetime.utcnow()
+    )])
+
+
+def products_bulk_created(session: Session, after_id: int):
+    """Eventos de las filas recién importadas (id > after_id), sin volver a leerlas"""
+    if not config.HISTORY_ENABLED:
+        return
+    columns = ["product_id", "owner_id", "price", "quantity", "value_delta", "at"]
+    session.execute(
+        insert(ProductEvent).from_select(
+            columns,
+            select(
+                Product.id,
+                Product.owner_id,
+                Product.price,
+                Product.quantity,
+                Product.price * Product.quantity,
+                literal(datetime.utcnow(), ProductEvent.__table__.c.at.type),
+            ).where(Product.id > after_id),
+        )
+    )
+
+
+def products_bulk_changed(session: Session, before: List[Any], after: List[Any]):
+    """Filas con id, owner_id, price y quantity antes y después (after vacío si se borraron)"""
+    if not after:
+        at = datetime.utcnow()
+        _pending(session, [
+            _event(row.id, row.owner_id, row.price, 0, -row.price * row.quantity, at) for row in before
+        ])
+        return
+    events = []
+    for old, new in zip(before, after):
+        events.extend(_changed(
+            {"owner_id": old.owner_id, "price": old.price, "quantity": old.quantity},
+            {"id": new.id, "owner_id": new.owner_id, "price": new.price, "quantity": new.quantity},
+        ))
+    _pending(session, events)
+
+
+def products_released(session: Session, rows: List[Any]):
+    """Filas con id, price, quantity y el owner_id anterior de productos que quedaron
+    sin dueño: salen del inventario de ese dueño"""
+    events = []
+    for row in rows:
+        events.extend(_changed(
+            {"owner_id": row.owner_id, "price": row.price, "quantity": row.quantity},
+            {"id": row.id, "owner_id": None, "price": row.price, "quantity": row.quantity},
+        ))
+    _pending(session, events)
+
+
+def stock_changed(session: Session, product, delta: int):
+    _pending(session, [_event(
+        product.id, product.owner_id, product.price, product.quantity, product.price * delta, datetime.utcnow()
+    )])
+
+
+def _before_commit(session: Session):
+    events = session.info.pop(PENDING_KEY, None)
+    if events:
+        session.execute(insert(ProductEvent), events)
+
+
+def _after_rollback(session: Session):
+    session.info.pop(PENDING_KEY, None)
+
+
+event.listen(Session, "before_commit", _before_commit)
+event.listen(Session, "after_rollback", _after_rollback)
+
+
+# ======================================================
+# 🧮 Consolidación en buckets
+# ======================================================
+def bucket_start(at: datetime, granularity: str) -> datetime:
+    if granularity == "hour":
+        return at.replace(minute=0, second=0, microsecond=0)
+    return at.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def _claim(session: Session, last_id: int, new_last_id: int, new_last_at: datetime) -> bool:
+    """Avanza la marca sólo si nadie la movió desde que se leyó (compare-and-set). Es
+    la primera escritura de la transacción: en SQLite toma el lock de escritura, así
+    que las lecturas siguientes ven un estado que nadie más modifica"""
+    values = {"last_event_id": new_last_id, "last_event_at": new_last_at, "updated_at": datetime.utcnow()}
+    result = session.execute(
+        update(RollupState)
+        .where(RollupState.id == STATE_ID, RollupState.last_event_id == last_id)
+        .values(**values)
+    )
+    if result.rowcount:
+        return True
+    if last_id or session.get(RollupState, STATE_ID) is not None:
+        return False
+    session.add(RollupState(id=STATE_ID, **values))
+    session.flush()
+    return True
+
+
+def _value_levels(
+    session: Session, last_id: int, owners: Optional[List[int]] = None
+) -> Tuple[Dict[Optional[int], float], float]:
+    """Valor de inventario por dueño y total justo antes del evento last_id + 1: el de
+    los contadores menos lo que suman los eventos aún no consolidados (una consulta).
+    Recorre todos los pendientes: se calcula una vez por corrida, no por tramo"""
+    pending = select(ProductEvent.owner_id, func.sum(ProductEvent.value_delta).label("pending")).where(
+        ProductEvent.id > last_id
+    )
+    if owners is not None:
+        pending = pending.where(ProductEvent.owner_id.in_(owners))
+    pending = pending.group_by(ProductEvent.owner_id).subquery()
+    total_now = select(InventoryStats.total_inventory_value).where(InventoryStats.id == 1).scalar_subquery()
+    total_pending = select(func.sum(ProductEvent.value_delta)).where(ProductEvent.id > last_id).scalar_subquery()
+    rows = session.execute(
+        select(
+            pending.c.owner_id,
+            func.coalesce(OwnerStats.inventory_value, 0) - pending.c.pending,
+            func.coalesce(total_now, 0) - func.coalesce(total_pending, 0),
+        )
+        .select_from(pending)
+        .outerjoin(OwnerStats, OwnerStats.owner_id == pending.c.owner_id)
+    ).all()
+    levels = {owner_id: level for owner_id, level, _ in rows}
+    return levels, rows[0][2] if rows else 0.0
+
+
+def _merge_product(buckets: Dict[tuple, Dict[str, Any]], key: tuple, row):
+    current = buckets.get(key)
+    if current is None:
+        buckets[key] = {
+            "min_price": row.price,
+            "max_price": row.price,
+            "price_sum": row.price,
+            "close_price": row.price,
+            "min_quantity": row.quantity,
+            "max_quantity": row.quantity,
+            "close_quantity": row.quantity,
+            "changes": 1,
+        }
+        return
+    current["min_price"] = min(current["min_price"], row.price)
+    current["max_price"] = max(current["max_price"], row.price)
+    current["price_sum"] += row.price
+    current["close_price"] = row.price
+    current["min_quantity"] = min(current["min_quantity"], row.quantity)
+    current["max_quantity"] = max(current["max_quantity"], row.quantity)
+    current["close_quantity"] = row.quantity
+    current["changes"] += 1
+
+
+def _merge_value(buckets: Dict[tuple, Dict[str, Any]], key: tuple, before: float, after: float):
+    # El nivel previo al cambio también estuvo vigente dentro del bucket
+    current = buckets.get(key)
+    if current is None:
+        buckets[key] = {"min_value": min(before, after), "max_value": max(before, after), "close_value": after, "changes": 1}
+        return
+    current["min_value"] = min(current["min_value"], before, after)
+    current["max_value"] = max(current["max_value"], before, after)
+    current["close_value"] = after
+    current["changes"] += 1
+
+
+def _combine_product(stored, new: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "min_price": min(stored.min_price, new["min_price"]),
+        "max_price": max(stored.max_price, new["max_price"]),
+        "price_sum": stored.price_sum + new["price_sum"],
+        "close_price": new["close_price"],
+        "min_quantity": min(stored.min_quantity, new["min_quantity"]),
+        "max_quantity": max(stored.max_quantity, new["max_quantity"]),
+        "close_quantity": new["close_quantity"],
+        "changes": stored.changes + new["changes"],
+    }
+
+
+def _combine_value(stored, new: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "min_value": min(stored.min_value, new["min_value"]),
+        "max_value": max(stored.max_value, new["max_value"]),
+        "close_value": new["close_value"],
+        "changes": stored.changes + new["changes"],
+    }
+
+
+def _save(session: Session, model, key_name: str, buckets: Dict[tuple, Dict[str, Any]], combine) -> int:
+    """Suma los buckets del tramo a los guardados: un INSERT por lotes para los nuevos
+    y un UPDATE por clave primaria para los que ya existían"""
+    if not buckets:
+        return 0
+    key_column = getattr(model, key_name)
+    keys = sorted({key[0] for key in buckets})
+    periods = {key[2] for key in buckets}
+    stored = {}
+    for start in range(0, len(keys), KEY_CHUNK):
+        rows = session.execute(
+            select(model.__table__).where(key_column.in_(keys[start:start + KEY_CHUNK]), model.bucket.in_(periods))
+        ).all()
+        for row in rows:
+            stored[(getattr(row, key_name), row.granularity, row.bucket)] = row
+
+    new_rows, updated_rows = [], []
+    for key, values in buckets.items():
+        previous = stored.get(key)
+        if previous is None:
+            new_rows.append({key_name: key[0], "granularity": key[1], "bucket": key[2], **values})
+        else:
+            updated_rows.append({"key": key[0], "key_granularity": key[1], "key_bucket": key[2], **combine(previous, values)})
+    # Sentencias de Core (executemany): el INSERT/UPDATE masivo del ORM cuesta más que
+    # la consolidación misma
+    table = model.__table__
+    if new_rows:
+        session.execute(table.insert(), new_rows)
+    if updated_rows:
+        session.execute(
+            table.update().where(
+                table.c[key_name] == bindparam("key"),
+                table.c.granularity == bindparam("key_granularity"),
+                table.c.bucket == bindparam("key_bucket"),
+            ),
+            updated_rows,
+        )
+    return len(buckets)
+
+
+def roll_up(
+    session: Session, batch: int = config.HISTORY_ROLLUP_BATCH, carry: Optional[Dict[str, Any]] = None
+) -> int:
+    """Consolida hasta `batch` eventos pendientes y hace commit; devuelve cuántos.
+    `carry` (un dict, vacío la primera vez) pasa los niveles de valor de un tramo al
+    siguiente: al ponerse al día con muchos eventos no se recalculan en cada tramo"""
+    last_id = session.execute(select(RollupState.last_event_id).where(RollupState.id == STATE_ID)).scalar() or 0
+    events = session.execute(
+        select(
+            ProductEvent.id,
+            ProductEvent.product_id,
+            ProductEvent.owner_id,
+            ProductEvent.price,
+            ProductEvent.quantity,
+            ProductEvent.value_delta,
+            ProductEvent.at,
+        )
+        .where(ProductEvent.id > last_id)
+        .order_by(ProductEvent.id)
+        .limit(batch)
+    ).all()
+    # Los eventos ya escritos no cambian: se termina la lectura para que la
+    # transacción siguiente empiece con la escritura de la marca
+    session.rollback()
+    if not events:
+        return 0
+    if not _claim(session, last_id, events[-1].id, events[-1].at):
+        session.rollback()  # otro worker consolidó este tramo
+        return 0
+
+    if carry and carry["last_event_id"] == last_id:
+        levels, total = carry["levels"], carry["total"]
+        # Dueños sin eventos pendientes cuando se calcularon los niveles
+        missing = sorted({row.owner_id for row in events if row.owner_id is not None} - levels.keys())
+        if missing:
+            levels.update(_value_levels(session, last_id, missing)[0])
+    else:
+        levels, total = _value_levels(session, last_id)
+    products: Dict[tuple, Dict[str, Any]] = {}
+    values: Dict[tuple, Dict[str, Any]] = {}
+    for row in events:
+        changed = [(TOTAL_OWNER, total, total + row.value_delta)]
+        total += row.value_delta
+        if row.owner_id is not None:
+            level = levels.get(row.owner_id, 0.0)
+            changed.append((row.owner_id, level, level + row.value_delta))
+            levels[row.owner_id] = level + row.value_delta
+        for granularity in STEPS:
+            bucket = bucket_start(row.at, granularity)
+            _merge_product(products, (row.product_id, granularity, bucket), row)
+            for owner_id, before, after in changed:
+                _merge_value(values, (owner_id, granularity, bucket), before, after)
+
+    _save(session, ProductRollup, "product_id", products, _combine_product)
+    _save(session, InventoryRollup, "owner_id", values, _combine_value)
+    session.commit()
+    if carry is not None:
+        carry.update(last_event_id=events[-1].id, levels=levels, total=total)
+    return len(events)
+
+
+def prune(session: Session, now: Optional[datetime] = None) -> Tuple[int, int]:
+    """Borra eventos ya consolidados y buckets por hora más viejos que su retención"""
+    now = now or datetime.utcnow()
+    last_id = session.execute(select(RollupState.last_event_id).where(RollupState.id == STATE_ID)).scalar() or 0
+    events = session.execute(
+        delete(ProductEvent).where(
+            ProductEvent.id <= last_id,
+            ProductEvent.at < now - timedelta(days=config.HISTORY_EVENT_RETENTION_DAYS),
+        )
+    ).rowcount
+    hourly_cutoff = now - timedelta(days=config.HISTORY_HOURLY_RETENTION_DAYS)
+    buckets = 0
+    for model in (ProductRollup, InventoryRollup):
+        buckets += session.execute(
+            delete(model).where(model.granularity == "hour", model.bucket < hourly_cutoff)
+        ).rowcount
+    session.commit()
+    return events, buckets
+
+
+def rolled_up_to(session: Session) -> Optional[datetime]:
+    """Momento del último evento consolidado (las series no ven lo posterior)"""
+    return session.execute(select(RollupState.last_event_at).where(RollupState.id == STATE_ID)).scalar()
+
+
+def pending_events(session: Session) -> Dict[str, Any]:
+    state = session.get(RollupState, STATE_ID)
+    last_id = state.last_event_id if state else 0
+    return {
+        "last_event_id": last_id,
+        "rolled_up_to": state.last_event_at if state else None,
+        "pending_events": session.execute(
+            select(func.count()).select_from(ProductEvent).where(ProductEvent.id > last_id)
+        ).scalar(),
+    }
+
+
+# ======================================================
+# 🧵 Hilo de consolidación
+# ======================================================
+class RollupWorker:
+    def __init__(self, interval: float, batch: int):
+        self.interval = interval
+        self.batch = batch
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = threading.Event()
+        self._last_prune = 0.0
+        # Métricas
+        self.runs = 0
+        self.events = 0
+        self.pruned_events = 0
+        self.pruned_buckets = 0
+        self.errors = 0
+        self.last_run_ms = 0.0
+
+    def start(self, bind: Engine):
+        if self.interval <= 0 or self._thread is not None:
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, args=(bind,), name="history-rollup", daemon=True)
+        self._thread.start()
+
+    def _run(self, bind: Engine):
+        while not self._stopping.wait(self.interval):
+            self.run_once(bind)
+
+    def run_once(self, bind: Engine) -> int:
+        """Consolida todo lo pendiente (en tramos de `batch`) y poda una vez por hora"""
+        started = time.perf_counter()
+        total = 0
+        try:
+            with Session(bind) as session:
+                carry: Dict[str, Any] = {}
+                while not self._stopping.is_set():
+                    done = roll_up(session, self.batch, carry)
+                    total += done
+                    if done < self.batch:
+                        break
+                if time.monotonic() - self._last_prune >= PRUNE_EVERY_SECONDS:
+                    self._last_prune = time.monotonic()
+                    events, buckets = prune(session)
+                    self.pruned_events += events
+                    self.pruned_buckets += buckets
+        except Exception:
+            self.errors += 1
+            logger.exception("No se pudo consolidar el historial de productos")
+            return total
+        self.runs += 1
+        self.events += total
+        self.last_run_ms = (time.perf_counter() - started) * 1000
+        if total:
+            logger.info("%d eventos de productos consolidados en %.1f ms", total, self.last_run_ms)
+        return total
+
+    def stop(self, timeout: Optional[float] = None):
+        thread, self._thread = self._thread, None
+        if thread is None:
+            return
+        self._stopping.set()
+        thread.join(timeout)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": config.HISTORY_ENABLED,
+            "interval_seconds": self.interval,
+            "running": self._thread is not None,
+            "runs": self.runs,
+            "events_rolled_up": self.events,
+            "last_run_ms": round(self.last_run_ms, 1),
+            "pruned_events": self.pruned_events,
+            "pruned_buckets": self.pruned_buckets,
+            "errors": self.errors,
+        }
+
+
+rollup_worker = RollupWorker(config.HISTORY_ROLLUP_INTERVAL_SECONDS, config.HISTORY_ROLLUP_BATCH)
+
+
+# ======================================================
+# 📈 Consulta de series
+# ======================================================
+def _point(metric: str, bucket: datetime, row) -> Dict[str, Any]:
+    if metric == "price":
+        return {
+            "bucket": bucket,
+            "min": row.min_price,
+            "max": row.max_price,
+            "avg": row.price_sum / row.changes,
+            "close": row.close_price,
+            "changes": row.changes,
+        }
+    if metric == "stock":
+        return {"bucket": bucket, "min": row.min_quantity, "max": row.max_quantity, "close": row.close_quantity, "changes": row.changes}
+    return {"bucket": bucket, "min": row.min_value, "max": row.max_value, "close": row.close_value, "changes": row.changes}
+
+
+def _carried(metric: str, bucket: datetime, row) -> Dict[str, Any]:
+    """Bucket sin cambios: el cierre del anterior se mantuvo todo el período"""
+    close = _point(metric, bucket, row)["close"]
+    point = {"bucket": bucket, "min": close, "max": close, "close": close, "changes": 0}
+    if metric == "price":
+        point["avg"] = close
+    return point
+
+
+def series(
+    session: Session, metric: str, granularity: str, key: int, start: datetime, end: datetime, fill: bool = True
+) -> List[Dict[str, Any]]:
+    """Puntos [start, end) de la serie (buckets alineados): `key` es product_id para
+    price/stock y owner_id (0 = todo el inventario) para value"""
+    if metric in PRODUCT_METRICS:
+        model, key_column = ProductRollup, ProductRollup.product_id
+    else:
+        model, key_column = InventoryRollup, InventoryRollup.owner_id
+    same_series = (key_column == key, model.granularity == granularity)
+    rows = session.execute(
+        select(model).where(*same_series, model.bucket >= start, model.bucket < end).order_by(model.bucket)
+    ).scalars().all()
+    if not fill:
+        return [_point(metric, row.bucket, row) for row in rows]
+
+    # Último bucket anterior al rango: su cierre rellena el comienzo
+    previous = session.execute(
+        select(model).where(*same_series, model.bucket < start).order_by(model.bucket.desc()).limit(1)
+    ).scalar()
+    by_bucket = {row.bucket: row for row in rows}
+    points = []
+    step = STEPS[granularity]
+    bucket = start
+    while bucket < end:
+        row = by_bucket.get(bucket)
+        if row is not None:
+            points.append(_point(metric, bucket, row))
+            previous = row
+        elif previous is not None:
+            points.append(_carried(metric, bucket, previous))
+        bucket += step
+    return points
+
+
+def main(argv: List[str]) -> int:
+    from .database import engine, prepare_database
+
+    command = argv[0] if argv else "rollup"
+    if command not in ("rollup", "prune"):
+        print("Uso: python -m app.history [rollup|prune]")
+        return 2
+
+    prepare_database()
+    with Session(engine) as session:
+        if command == "prune":
+            events, buckets = prune(session)
+            print(f"{events} eventos y {buckets} buckets por hora borrados.")
+            return 0
+        started = time.perf_counter()
+        total, carry = 0, {}
+        while True:
+            done = roll_up(session, carry=carry)
+            total += done
+            if done < config.HISTORY_ROLLUP_BATCH:
+                break
+        print(f"{total} eventos consolidados en {(time.perf_counter() - started) * 1000:.0f} ms.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
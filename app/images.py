@@ -0,0 +1,332 @@
+"""
+Imágenes de productos: subida en streaming, almacenamiento por contenido y miniaturas.
+
+- Subida: el multipart se parsea a medida que llega el cuerpo (request.stream()) y
+  el archivo se escribe de a bloques con aiofiles en IMAGE_DIR/tmp, calculando el
+  sha256 por el camino; nunca está entero en memoria y se corta con 413 apenas
+  supera IMAGE_MAX_BYTES.
+- Almacenamiento: originals/ab/<sha256>.<ext>. La clave (Product.image_path) es
+  <sha256>.<ext>, así que subir dos veces la misma imagen la guarda una sola vez.
+- Miniaturas: un pool de hilos las genera fuera de la petición (Pillow libera el
+  GIL al decodificar y redimensionar) en thumbs/<lado>/ab/<sha256>.<ext>. Pillow es
+  opcional: sin él se sirve el original.
+- Entrega: FileResponse (Range, If-Range y http.response.pathsend cuando el servidor
+  lo soporta, es decir sin copiar el archivo por Python), ETag derivado del hash y
+  Cache-Control inmutable; If-None-Match responde 304 sin abrir el archivo.
+
+Limpiar originales y miniaturas que ningún producto referencia:
+    python -m app.images gc
+"""
+import hashlib
+import logging
+import os
+import re
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Set
+
+import aiofiles
+from fastapi import HTTPException, Request
+from fastapi.responses import FileResponse, Response
+from python_multipart.multipart import MultipartParser, parse_options_header
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from . import config
+from .models import Product
+
+try:
+    from PIL import Image
+except ImportError:  # dependencia opcional: sin Pillow no hay miniaturas
+    Image = None
+
+logger = logging.getLogger(__name__)
+
+UPLOAD_FIELD = "file"
+KEY_PATTERN = re.compile(r"[0-9a-f]{64}\.(jpg|png|gif|webp)")
+MEDIA_TYPES = {"jpg": "image/jpeg", "png": "image/png", "gif": "image/gif", "webp": "image/webp"}
+PILLOW_FORMATS = {"jpg": "JPEG", "png": "PNG", "gif": "GIF", "webp": "WEBP"}
+# Archivos temporales o sin referencias más nuevos que esto pueden ser de una subida en curso
+GC_GRACE_SECONDS = 3600
+
+
+def sniff_extension(head: bytes) -> Optional[str]:
+    """Formato según los primeros bytes (no se confía en el nombre ni en el Content-Type)"""
+    if head.startswith(b"\xff\xd8\xff"):
+        return "jpg"
+    if head.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "png"
+    if head[:6] in (b"GIF87a", b"GIF89a"):
+        return "gif"
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "webp"
+    return None
+
+
+# ======================================================
+# 📁 Rutas en disco
+# ======================================================
+def original_path(key: str) -> str:
+    return os.path.join(config.IMAGE_DIR, "originals", key[:2], key)
+
+
+def thumbnail_path(key: str, size: int) -> str:
+    return os.path.join(config.IMAGE_DIR, "thumbs", str(size), key[:2], key)
+
+
+def describe(key: Optional[str]) -> Optional[Dict[str, Any]]:
+    """URLs del original y de cada miniatura"""
+    if not key:
+        return None
+    return {
+        "key": key,
+        "url": f"/images/{key}",
+        "thumbnails": {str(size): f"/images/{key}?size={size}" for size in config.IMAGE_THUMBNAIL_SIZES},
+    }
+
+
+def _publish(tmp_path: str, path: str) -> bool:
+    """Mueve el temporal a su ruta definitiva; False si el contenido ya estaba guardado"""
+    if os.path.exists(path):
+        os.remove(tmp_path)
+        return False
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    os.replace(tmp_path, path)  # atómico: nunca se sirve un archivo a medio escribir
+    return True
+
+
+# ======================================================
+# 📤 Subida en streaming
+# ======================================================
+class _FilePart:
+    """Callbacks de MultipartParser: junta los bytes del campo `field` (sólo el primero)"""
+
+    def __init__(self, field: str):
+        self.field = field.encode()
+        self.found = False
+        self.chunks: List[bytes] = []
+        self._in_field = False
+        self._header_field = b""
+        self._header_value = b""
+        self._headers: Dict[bytes, bytes] = {}
+
+    def callbacks(self) -> Dict[str, Any]:
+        return {
+            "on_part_begin": self._part_begin,
+            "on_header_field": self._add_header_field,
+            "on_header_value": self._add_header_value,
+            "on_header_end": self._header_end,
+            "on_headers_finished": self._headers_finished,
+            "on_part_data": self._part_data,
+            "on_part_end": self._part_end,
+        }
+
+    def take(self) -> List[bytes]:
+        chunks, self.chunks = self.chunks, []
+        return chunks
+
+    def _part_begin(self):
+        self._headers = {}
+
+    def _add_header_field(self, data: bytes, start: int, end: int):
+        self._header_field += data[start:end]
+
+    def _add_header_value(self, data: bytes, start: int, end: int):
+        self._header_value += data[start:end]
+
+    def _header_end(self):
+        self._headers[self._header_field.lower()] = self._header_value
+        self._header_field = self._header_value = b""
+
+    def _headers_finished(self):
+        _, options = parse_options_header(self._headers.get(b"content-disposition", b""))
+        self._in_field = not self.found and options.get(b"name") == self.field and b"filename" in options
+        self.found = self.found or self._in_field
+
+    def _part_data(self, data: bytes, start: int, end: int):
+        if self._in_field:
+            self.chunks.append(data[start:end])
+
+    def _part_end(self):
+        self._in_field = False
+
+
+async def receive_upload(request: Request, field: str = UPLOAD_FIELD) -> Dict[str, Any]:
+    """Guarda el archivo del campo `field`; devuelve su clave y si ya existía"""
+    content_type, params = parse_options_header(request.headers.get("content-type", ""))
+    boundary = params.get(b"boundary")
+    if content_type != b"multipart/form-data" or not boundary:
+        raise HTTPException(status_code=400, detail=f"Se esperaba multipart/form-data con el campo '{field}'")
+
+    part = _FilePart(field)
+    parser = MultipartParser(boundary, part.callbacks())
+    tmp_dir = os.path.join(config.IMAGE_DIR, "tmp")
+    os.makedirs(tmp_dir, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=tmp_dir)
+    os.close(fd)
+
+    digest, size, head = hashlib.sha256(), 0, b""
+    try:
+        async with aiofiles.open(tmp_path, "wb") as out:
+            async for chunk in request.stream():
+                parser.write(chunk)
+                for data in part.take():
+                    size += len(data)
+                    if size > config.IMAGE_MAX_BYTES:
+                        raise HTTPException(
+                            status_code=413, detail=f"La imagen supera el máximo de {config.IMAGE_MAX_BYTES} bytes"
+                        )
+                    if len(head) < 16:
+                        head += data[:16]
+                    digest.update(data)
+                    await out.write(data)
+            parser.finalize()
+
+        if not part.found or size == 0:
+            raise HTTPException(status_code=400, detail=f"Falta el archivo en el campo '{field}'")
+        extension = sniff_extension(head)
+        if extension is None:
+            raise HTTPException(status_code=415, detail="Formato no soportado (JPEG, PNG, GIF o WebP)")
+        key = f"{digest.hexdigest()}.{extension}"
+        created = _publish(tmp_path, original_path(key))
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return {"key": key, "size": size, "deduplicated": not created}
+
+
+# ======================================================
+# 🧵 Miniaturas (pool de hilos en segundo plano)
+# ======================================================
+class Thumbnailer:
+    def __init__(self, sizes, workers: int):
+        self.sizes = tuple(sizes)
+        self.workers = workers
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._pending: Set[str] = set()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return Image is not None and bool(self.sizes)
+
+    def submit(self, key: str):
+        """Encola la generación de las miniaturas que falten (una vez por clave)"""
+        if not self.enabled:
+            return
+        with self._lock:
+            if key in self._pending:
+                return
+            self._pending.add(key)
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix="thumbnails")
+            self._executor.submit(self._generate, key)
+
+    def _generate(self, key: str):
+        try:
+            for size in self.sizes:
+                path = thumbnail_path(key, size)
+                if not os.path.exists(path):
+                    self._write_thumbnail(key, size, path)
+        except Exception:
+            logger.exception("No se pudieron generar las miniaturas de %s", key)
+        finally:
+            with self._lock:
+                self._pending.discard(key)
+
+    def _write_thumbnail(self, key: str, size: int, path: str):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+        os.close(fd)
+        try:
+            with Image.open(original_path(key)) as image:
+                image.draft("RGB", (size, size))  # JPEG: decodifica ya reducido (mucho más rápido)
+                image.thumbnail((size, size))
+                image.save(tmp_path, PILLOW_FORMATS[key.rsplit(".", 1)[1]])
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+thumbnailer = Thumbnailer(config.IMAGE_THUMBNAIL_SIZES, config.IMAGE_THUMBNAIL_WORKERS)
+
+
+# ======================================================
+# 📦 Entrega con caché HTTP
+# ======================================================
+def image_response(request: Request, key: str, size: Optional[int] = None) -> Response:
+    if not KEY_PATTERN.fullmatch(key):
+        raise HTTPException(status_code=404, detail="Imagen no encontrada")
+    if size is not None and size not in config.IMAGE_THUMBNAIL_SIZES:
+        opciones = ", ".join(str(option) for option in config.IMAGE_THUMBNAIL_SIZES)
+        raise HTTPException(status_code=400, detail=f"Tamaño no soportado. Opciones: {opciones}")
+
+    path, immutable = original_path(key), True
+    if size is not None:
+        thumbnail = thumbnail_path(key, size)
+        if os.path.exists(thumbnail):
+            path = thumbnail
+        else:
+            # Todavía no está (o no hay Pillow): el original, sin caché de larga duración
+            thumbnailer.submit(key)
+            immutable = False
+    if not os.path.exists(path):
+        raise HTTPException(status_code=404, detail="Imagen no encontrada")
+
+    variant = size if path != original_path(key) else "original"
+    headers = {
+        "ETag": f'"{key.split(".")[0][:32]}-{variant}"',
+        "Cache-Control": f"public, max-age={config.IMAGE_CACHE_MAX_AGE}, immutable" if immutable else "no-cache",
+    }
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and headers["ETag"] in (tag.strip() for tag in if_none_match.split(",")):
+        return Response(status_code=304, headers=headers)
+    return FileResponse(path, media_type=MEDIA_TYPES[key.rsplit(".", 1)[1]], headers=headers)
+
+
+# ======================================================
+# 🧹 Limpieza de imágenes sin referencias
+# ======================================================
+def collect_garbage(session: Session, grace_seconds: int = GC_GRACE_SECONDS) -> int:
+    """Borra originales y miniaturas que ningún producto usa; devuelve cuántos archivos"""
+    referenced = set(
+        session.execute(select(Product.image_path).where(Product.image_path.is_not(None)).distinct()).scalars()
+    )
+    cutoff = time.time() - grace_seconds
+    removed = 0
+    for directory, _, files in os.walk(config.IMAGE_DIR):
+        in_tmp = os.path.relpath(directory, config.IMAGE_DIR).split(os.sep)[0] == "tmp"
+        for name in files:
+            path = os.path.join(directory, name)
+            if (in_tmp or name not in referenced) and os.path.getmtime(path) < cutoff:
+                os.remove(path)
+                removed += 1
+    return removed
+
+
+def main(argv: List[str]) -> int:
+    from .database import engine, init_db
+
+    if argv[:1] != ["gc"]:
+        print("Uso: python -m app.images gc")
+        return 2
+
+    init_db()
+    with Session(engine) as session:
+        print(f"{collect_garbage(session)} archivos eliminados de {config.IMAGE_DIR}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -1,14 +1,58 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
-from .database import init_db
+from . import config, startup
+from .audit_writer import audit_writer
+from .auth import hashing_pool
+from .bus import invalidation_bus
+from .database import dispose_async_engine, engine, prepare_database
+from .history import rollup_worker
+from .images import thumbnailer
+from .metrics import MetricsMiddleware
 from .models import User, Product, AuditLog # ✅ corregido: antes decía Item
-from .routers import users, auth_router, products, audit, stats
+from .routers import auth_router, images, metrics
+from .stock import reservation_sweeper
+
+# DB_MODE=async usa las versiones con AsyncSession (mismas rutas y respuestas)
+if config.DB_MODE == "async":
+    from .routers.async_api import users, products, audit, stats, stock
+else:
+    from .routers import users, products, audit, stats, stock
 
-app = FastAPI()
+# Arranque y apagado (tiempos por fase en app.startup.timings)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Base de datos: sólo se crea/migra si cambió la versión del esquema
+    # (con varios workers, uno a la vez bajo el lock)
+    with startup.phase("schema"):
+        prepare_database()
+    # LAZY_IMPORTS=0: passlib/bcrypt, plantillas y páginas estáticas listas antes de atender
+    if not config.LAZY_IMPORTS:
+        with startup.phase("warmup"):
+            startup.warm_up()
+    with startup.phase("background"):
+        # Con varios workers: aplicar las invalidaciones de caché de los demás procesos
+        invalidation_bus.start(engine)
+        # Devuelve al stock las reservas vencidas cada STOCK_SWEEP_INTERVAL_SECONDS
+        reservation_sweeper.start(engine)
+        # Consolida el historial de precios y stock cada HISTORY_ROLLUP_INTERVAL_SECONDS
+        rollup_worker.start(engine)
+    yield
+    # Vaciar la cola del historial, detener el bus de invalidación, el barrendero de
+    # reservas, la consolidación de series, los pools de bcrypt (y sus procesos) y de
+    # miniaturas, y el engine async
+    with startup.phase("shutdown"):
+        audit_writer.flush()
+        invalidation_bus.stop()
+        reservation_sweeper.stop()
+        rollup_worker.stop()
+        hashing_pool.shutdown()
+        thumbnailer.shutdown()
+        await dispose_async_engine()
 
-# Inicializar base de datos al arrancar
-@app.on_event("startup")
-def on_startup():
-    init_db()
+app = FastAPI(lifespan=lifespan)
+# Latencia por ruta, consultas SQL por petición y encabezado Server-Timing
+app.add_middleware(MetricsMiddleware)
 
 # Incluir rutas
 app.include_router(users.router)
@@ -16,15 +60,15 @@ app.include_router(auth_router.router)
 app.include_router(products.router)
 app.include_router(audit.router)
 app.include_router(stats.router) 
+app.include_router(stock.router)
+app.include_router(metrics.router)
+app.include_router(images.router)
 
 @app.get("/")
 def read_root():
     return {"message": "Base de datos inicializada y servidor corriendo correctamente."}
 
-@app.get("/")
-def simple_test():
-    return {"message": "Test simple - sin base de datos"}
-
+# Un solo proceso de desarrollo; en producción: python -m app.server --workers N
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="127.0.0.1", port=8000)
@@ -0,0 +1,261 @@
+"""
+Instrumentación de rendimiento sin dependencias externas.
+
+- MetricsMiddleware (ASGI): histograma de latencia por ruta (la plantilla, p. ej.
+  /products/{product_id}), contador de respuestas por código y, por petición,
+  cantidad de consultas SQL y tiempo en la base (hace visibles los patrones N+1).
+- Eventos de SQLAlchemy por engine: duración de cada sentencia y espera para
+  obtener una conexión del pool.
+- bcrypt: duración de cada hash/verificación (incluida la espera en el pool).
+
+Todo se expone en formato de texto de Prometheus en GET /metrics. Cada respuesta
+lleva el encabezado Server-Timing (app, db, bcrypt) y, con SLOW_REQUEST_MS > 0, las
+peticiones más lentas que ese umbral se registran junto con sus sentencias SQL.
+"""
+import bisect
+import contextvars
+import logging
+import threading
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from . import config
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 500)
+SLOW_LOG_MAX_STATEMENTS = 50
+
+
+# ======================================================
+# 📊 Métricas (contadores e histogramas con etiquetas)
+# ======================================================
+class Counter:
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        self.name, self.help, self.labels = name, help, tuple(labels)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values: str, amount: float = 1.0):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0.0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for label_values, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_labels(self.labels, label_values)} {_number(value)}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, buckets: Sequence[float], labels: Sequence[str] = ()):
+        self.name, self.help, self.labels = name, help, tuple(labels)
+        self.buckets = tuple(buckets)
+        # Por cada combinación de etiquetas: [conteo por bucket..., +Inf], suma
+        self._series: Dict[Tuple[str, ...], Tuple[List[int], List[float]]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values: str):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = ([0] * (len(self.buckets) + 1), [0.0])
+            series[0][index] += 1
+            series[1][0] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for label_values, (counts, total) in sorted(self._series.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets + (float("inf"),), counts):
+                    cumulative += count
+                    le = "+Inf" if bound == float("inf") else _number(bound)
+                    names, values = self.labels + ("le",), label_values + (le,)
+                    lines.append(f"{self.name}_bucket{_labels(names, values)} {cumulative}")
+                lines.append(f"{self.name}_sum{_labels(self.labels, label_values)} {_number(total[0])}")
+                lines.append(f"{self.name}_count{_labels(self.labels, label_values)} {cumulative}")
+        return lines
+
+
+def _labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for value in values)
+    return "{" + ",".join(f'{name}="{value}"' for name, value in zip(names, escaped)) + "}"
+
+
+def _number(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+http_requests = Counter("http_requests_total", "Respuestas por ruta y código", ("method", "route", "status"))
+http_latency = Histogram(
+    "http_request_duration_seconds", "Latencia por ruta", LATENCY_BUCKETS, ("method", "route")
+)
+db_queries = Histogram(
+    "db_queries_per_request", "Consultas SQL por petición", QUERY_COUNT_BUCKETS, ("method", "route")
+)
+db_time = Counter("db_time_seconds_total", "Tiempo en la base por ruta", ("method", "route"))
+db_statement = Histogram("db_statement_duration_seconds", "Duración de cada sentencia SQL", LATENCY_BUCKETS)
+pool_wait = Histogram(
+    "db_pool_checkout_seconds", "Espera para obtener una conexión del pool", LATENCY_BUCKETS, ("engine",)
+)
+bcrypt_time = Histogram(
+    "bcrypt_duration_seconds", "Hash/verificación bcrypt (incluye la espera en el pool)",
+    LATENCY_BUCKETS, ("operation",)
+)
+bcrypt_rejected = Counter("bcrypt_rejected_total", "Peticiones rechazadas con 503 por el pool de bcrypt")
+
+REGISTRY = [http_requests, http_latency, db_queries, db_time, db_statement, pool_wait, bcrypt_time, bcrypt_rejected]
+
+
+def render() -> str:
+    return "\n".join(line for metric in REGISTRY for line in metric.render()) + "\n"
+
+
+# ======================================================
+# 🧵 Datos de la petición en curso
+# ======================================================
+class RequestStats:
+    __slots__ = ("queries", "db_seconds", "bcrypt_seconds", "statements")
+
+    def __init__(self, keep_statements: bool):
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.bcrypt_seconds = 0.0
+        self.statements: Optional[List[Tuple[float, str]]] = [] if keep_statements else None
+
+
+# Se copia al threadpool y a las tareas hijas: todas comparten el mismo RequestStats
+_current: contextvars.ContextVar[Optional[RequestStats]] = contextvars.ContextVar("request_stats", default=None)
+
+
+def observe_bcrypt(operation: str, seconds: float):
+    bcrypt_time.observe(seconds, operation)
+    stats = _current.get()
+    if stats is not None:
+        stats.bcrypt_seconds += seconds
+
+
+# ======================================================
+# 🗄️ Eventos de SQLAlchemy
+# ======================================================
+def instrument_engine(sync_engine: Engine, name: str):
+    """Mide cada sentencia y la espera del pool de `sync_engine` (también el de un engine async)"""
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("metrics_started", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["metrics_started"].pop()
+        db_statement.observe(elapsed)
+        stats = _current.get()
+        if stats is not None:
+            stats.queries += 1
+            stats.db_seconds += elapsed
+            if stats.statements is not None and len(stats.statements) < SLOW_LOG_MAX_STATEMENTS:
+                stats.statements.append((elapsed, statement))
+
+    @event.listens_for(sync_engine, "handle_error")
+    def _error(context):
+        started = context.connection.info.get("metrics_started") if context.connection is not None else None
+        if started:
+            started.pop()
+
+    # El pool no tiene un evento "antes de pedir conexión": se envuelve Pool.connect,
+    # y se vuelve a envolver cuando dispose() reemplaza el pool
+    _wrap_pool(sync_engine, name)
+    event.listen(sync_engine, "engine_disposed", lambda engine: _wrap_pool(engine, name))
+
+
+def _wrap_pool(sync_engine: Engine, name: str):
+    pool = sync_engine.pool
+    connect = pool.connect
+
+    def timed_connect():
+        started = time.perf_counter()
+        try:
+            return connect()
+        finally:
+            pool_wait.observe(time.perf_counter() - started, name)
+
+    pool.connect = timed_connect
+
+
+# ======================================================
+# ⏱️ Middleware ASGI
+# ======================================================
+class MetricsMiddleware:
+    def __init__(self, app, slow_request_ms: float = config.SLOW_REQUEST_MS):
+        self.app = app
+        self.slow_request_ms = slow_request_ms
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats(keep_statements=self.slow_request_ms > 0)
+        token = _current.set(stats)
+        started = time.perf_counter()
+        status = 500
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                elapsed = time.perf_counter() - started
+                message.setdefault("headers", [])
+                message["headers"] = list(message["headers"]) + [
+                    (b"server-timing", _server_timing(elapsed, stats).encode("latin-1"))
+                ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current.reset(token)
+            elapsed = time.perf_counter() - started
+            method, route = scope["method"], _route_template(scope)
+            http_requests.inc(method, route, str(status))
+            http_latency.observe(elapsed, method, route)
+            db_queries.observe(stats.queries, method, route)
+            db_time.inc(method, route, amount=stats.db_seconds)
+            if self.slow_request_ms > 0 and elapsed * 1000 >= self.slow_request_ms:
+                _log_slow(method, scope, status, elapsed, stats)
+
+
+def _route_template(scope) -> str:
+    # FastAPI deja la ruta resuelta en el scope; sin ruta (404) se agrupa en una sola serie
+    route = scope.get("route")
+    return getattr(route, "path", None) or "(sin ruta)"
+
+
+def _server_timing(elapsed: float, stats: RequestStats) -> str:
+    parts = [
+        f"app;dur={elapsed * 1000:.2f}",
+        f'db;dur={stats.db_seconds * 1000:.2f};desc="{stats.queries} consultas"',
+    ]
+    if stats.bcrypt_seconds:
+        parts.append(f"bcrypt;dur={stats.bcrypt_seconds * 1000:.2f}")
+    return ", ".join(parts)
+
+
+def _log_slow(method: str, scope, status: int, elapsed: float, stats: RequestStats):
+    statements = "\n".join(
+        f"  {seconds * 1000:8.2f} ms  {' '.join(statement.split())}" for seconds, statement in stats.statements or []
+    )
+    logger.warning(
+        "Petición lenta: %s %s -> %s en %.1f ms (%d consultas, %.1f ms en la base, %.1f ms en bcrypt)\n%s",
+        method, scope["path"], status, elapsed * 1000, stats.queries,
+        stats.db_seconds * 1000, stats.bcrypt_seconds * 1000, statements,
+    )
@@ -1,4 +1,5 @@
 from sqlmodel import SQLModel, Field, Relationship
+from . import config
 from typing import Optional, List
 from datetime import datetime
 
@@ -21,25 +22,196 @@ class User(SQLModel, table=True):
 # ======================================================
 class Product(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
-    name: str
+    # Índices: orden/keyset de /products/list (el id va implícito en cada índice),
+    # líderes de precio y stock, y agrupación/relación por dueño
+    name: str = Field(index=True)
     description: Optional[str] = None
-    price: float
-    quantity: int = Field(default=0)
+    price: float = Field(index=True)
+    quantity: int = Field(default=0, index=True)
     image_path: Optional[str] = None
-    created_at: datetime = Field(default_factory=datetime.utcnow)
+    created_at: datetime = Field(default_factory=datetime.utcnow, index=True)
 
     # Relación con el usuario dueño
-    owner_id: Optional[int] = Field(default=None, foreign_key="user.id")
+    owner_id: Optional[int] = Field(default=None, foreign_key="user.id", index=True)
     owner: Optional[User] = Relationship(back_populates="products")
 
+# Esquema de validación (sin tabla) para la importación masiva: mismos campos
+# editables y tipos que Product, mucho más barato que instanciar el modelo ORM
+class ProductImport(SQLModel):
+    name: str
+    description: Optional[str] = None
+    price: float
+    quantity: int = Field(default=0)
+    image_path: Optional[str] = None
+
 # ======================================================
 # 📝 Modelo Historial (Auditoría)
 # ======================================================
 class AuditLog(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
-    action: str  # "DELETE_USER", "DELETE_PRODUCT", etc.
-    target_id: int  # ID del elemento eliminado
+    action: str = Field(index=True)  # "DELETE_USER", "DELETE_PRODUCT", etc.
+    target_id: int = Field(index=True)  # ID del elemento eliminado
     target_name: str  # Nombre del elemento eliminado
-    performed_by: str  # Usuario que realizó la acción
-    performed_at: datetime = Field(default_factory=datetime.utcnow)
-    details: Optional[str] = None  # Información adicional
\ No newline at end of file
+    performed_by: str = Field(index=True)  # Usuario que realizó la acción
+    performed_at: datetime = Field(default_factory=datetime.utcnow, index=True)
+    details: Optional[str] = None  # Información adicional
+
+# ======================================================
+# 📈 Contadores materializados (estadísticas O(1))
+# ======================================================
+class InventoryStats(SQLModel, table=True):
+    id: Optional[int] = Field(default=1, primary_key=True)  # Siempre una sola fila (id=1)
+    total_users: int = Field(default=0)
+    admin_users: int = Field(default=0)
+    client_users: int = Field(default=0)
+    total_products: int = Field(default=0)
+    products_with_owner: int = Field(default=0)
+    total_inventory_value: float = Field(default=0)
+    most_expensive_id: Optional[int] = None
+    most_expensive_name: Optional[str] = None
+    most_expensive_price: Optional[float] = None
+    most_stocked_id: Optional[int] = None
+    most_stocked_name: Optional[str] = None
+    most_stocked_quantity: Optional[int] = None
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+
+
+class OwnerStats(SQLModel, table=True):
+    owner_id: int = Field(primary_key=True)  # Sin FK: se borra junto con el usuario (sus productos quedan sin dueño)
+    product_count: int = Field(default=0)
+    inventory_value: float = Field(default=0)
+
+# ======================================================
+# 🛒 Reservas de stock
+# ======================================================
+# La cantidad reservada ya se descontó de Product.quantity; al vencer (expires_at)
+# el barrendero de app.stock la devuelve. Sin FK: borrar un producto o usuario no
+# debe fallar por reservas pendientes (el barrendero las limpia igual)
+class Reservation(SQLModel, table=True):
+    __table_args__ = {"sqlite_autoincrement": True}  # ids nunca reutilizados
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    product_id: int = Field(index=True)
+    user_id: int = Field(index=True)
+    quantity: int
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    expires_at: datetime = Field(index=True)
+
+# Esquemas (sin tabla) del checkout por lotes
+class CheckoutItem(SQLModel):
+    product_id: int
+    quantity: int = Field(ge=1)
+
+class Checkout(SQLModel):
+    items: List[CheckoutItem] = Field(min_length=1, max_length=100)
+
+# ======================================================
+# 🧰 Esquemas (sin tabla) de las operaciones por lotes
+# ======================================================
+# Se elige por `ids` o por `filter` (uno de los dos); dry_run sólo cuenta
+class ProductFilter(SQLModel):
+    min_price: Optional[float] = None
+    max_price: Optional[float] = None
+    in_stock: Optional[bool] = None
+    owner_id: Optional[int] = None
+    name_prefix: Optional[str] = None
+
+class ProductChanges(SQLModel):
+    description: Optional[str] = None
+    price: Optional[float] = None
+    quantity: Optional[int] = None
+    owner_id: Optional[int] = None
+
+class ProductBatchDelete(SQLModel):
+    ids: Optional[List[int]] = Field(default=None, max_length=config.BATCH_MAX_IDS)
+    filter: Optional[ProductFilter] = None
+    dry_run: bool = False
+
+class ProductBatchUpdate(ProductBatchDelete):
+    changes: ProductChanges
+
+class UserFilter(SQLModel):
+    role: Optional[str] = None
+    created_before: Optional[datetime] = None
+    username_prefix: Optional[str] = None
+
+class UserBatchDelete(SQLModel):
+    ids: Optional[List[int]] = Field(default=None, max_length=config.BATCH_MAX_IDS)
+    filter: Optional[UserFilter] = None
+    dry_run: bool = False
+
+class UserBatchUpdate(UserBatchDelete):
+    role: str
+
+# ======================================================
+# 🏷️ Versión del esquema (app.database.prepare_database)
+# ======================================================
+# Huella del esquema de los modelos con el que se creó/migró la base: si coincide,
+# el arranque no vuelve a ejecutar create_all ni a revisar índices
+class SchemaVersion(SQLModel, table=True):
+    id: Optional[int] = Field(default=1, primary_key=True)  # Siempre una sola fila (id=1)
+    fingerprint: str
+    applied_at: datetime = Field(default_factory=datetime.utcnow)
+
+# ======================================================
+# 📣 Eventos de invalidación entre procesos (app.bus)
+# ======================================================
+# Una fila por etiqueta invalidada; los demás workers las leen por id creciente
+class InvalidationEvent(SQLModel, table=True):
+    __table_args__ = {"sqlite_autoincrement": True}  # ids nunca reutilizados tras podar
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    origin: str  # proceso que la publicó (no se aplica a sí mismo)
+    tag: str
+    created_at: datetime = Field(default_factory=datetime.utcnow, index=True)
+
+# ======================================================
+# 📉 Historial de precios y stock (app.history)
+# ======================================================
+# Registro compacto y sólo de inserción: una fila por cambio con el estado del
+# producto después del cambio (quantity=0 al borrarse) y cuánto varió el valor de
+# inventario de owner_id. Sin FK: el historial sobrevive al producto y al usuario
+class ProductEvent(SQLModel, table=True):
+    __table_args__ = {"sqlite_autoincrement": True}  # ids nunca reutilizados tras podar
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    product_id: int = Field(index=True)
+    owner_id: Optional[int] = None
+    price: float
+    quantity: int
+    value_delta: float
+    at: datetime = Field(default_factory=datetime.utcnow, index=True)
+
+
+# Buckets consolidados: granularity "hour" o "day", bucket = inicio del período (UTC).
+# La clave primaria (serie, granularity, bucket) es el índice de las consultas por rango
+class ProductRollup(SQLModel, table=True):
+    product_id: int = Field(primary_key=True)
+    granularity: str = Field(primary_key=True)
+    bucket: datetime = Field(primary_key=True)
+    min_price: float
+    max_price: float
+    price_sum: float  # promedio = price_sum / changes
+    close_price: float
+    min_quantity: int
+    max_quantity: int
+    close_quantity: int
+    changes: int = Field(default=0)
+
+
+# Valor de inventario por dueño; owner_id=0 es el inventario completo
+class InventoryRollup(SQLModel, table=True):
+    owner_id: int = Field(primary_key=True)
+    granularity: str = Field(primary_key=True)
+    bucket: datetime = Field(primary_key=True)
+    min_value: float
+    max_value: float
+    close_value: float
+    changes: int = Field(default=0)
+
+
+class RollupState(SQLModel, table=True):
+    id: Optional[int] = Field(default=1, primary_key=True)  # Siempre una sola fila (id=1)
+    last_event_id: int = Field(default=0)  # eventos consolidados: id <= last_event_id
+    last_event_at: Optional[datetime] = None
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
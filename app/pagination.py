@@ -0,0 +1,112 @@
+import base64
+import json
+from datetime import datetime, timezone
+from typing import Any, AsyncIterable, Dict, Iterable, List, Optional, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import tuple_
+
+# ======================================================
+# 📄 Paginación por cursor (keyset)
+# ======================================================
+# El cursor es opaco para el cliente: JSON en base64 con el criterio de orden,
+# el último valor de la columna ordenada y el último id entregado.
+
+
+def encode_cursor(sort: str, value: Any, last_id: int) -> str:
+    """Genera el cursor de la siguiente página a partir de la última fila"""
+    if isinstance(value, datetime):
+        value = {"dt": value.isoformat()}
+    raw = json.dumps({"s": sort, "v": value, "id": last_id}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, sort: str) -> Tuple[Any, int]:
+    """Devuelve (valor, id) del cursor o lanza 400 si es inválido"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        value = data["v"]
+        if isinstance(value, dict):
+            value = datetime.fromisoformat(value["dt"])
+        last_id = int(data["id"])
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=400, detail="Cursor inválido")
+
+    if data.get("s") != sort:
+        raise HTTPException(status_code=400, detail="El cursor no corresponde al orden solicitado")
+    return value, last_id
+
+
+def parse_sort(sort: str, columns: Dict[str, Any]) -> Tuple[str, Any, bool]:
+    """Convierte 'campo' o '-campo' en (campo, columna, descendente)"""
+    descending = sort.startswith("-")
+    field = sort[1:] if descending else sort
+    if field not in columns:
+        opciones = ", ".join(sorted(columns))
+        raise HTTPException(status_code=400, detail=f"Orden no soportado. Opciones: {opciones}")
+    return field, columns[field], descending
+
+
+def keyset_clauses(column, id_column, descending: bool, cursor: Optional[Tuple[Any, int]]):
+    """Devuelve (condición WHERE, ORDER BY) para continuar después del cursor"""
+    same = column is id_column
+    if descending:
+        order_by = [id_column.desc()] if same else [column.desc(), id_column.desc()]
+    else:
+        order_by = [id_column.asc()] if same else [column.asc(), id_column.asc()]
+
+    if cursor is None:
+        return None, order_by
+
+    value, last_id = cursor
+    if same:
+        condition = id_column < last_id if descending else id_column > last_id
+    elif descending:
+        condition = tuple_(column, id_column) < tuple_(value, last_id)
+    else:
+        condition = tuple_(column, id_column) > tuple_(value, last_id)
+    return condition, order_by
+
+
+def build_page(rows: List[Dict[str, Any]], page_size: int, sort: str, sort_field: str) -> Dict[str, Any]:
+    """Arma la página a partir de page_size + 1 filas (la extra indica que hay más)"""
+    next_cursor = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        last = rows[-1]
+        next_cursor = encode_cursor(sort, last[sort_field], last["id"])
+    return {"items": rows, "next_cursor": next_cursor, "limit": page_size}
+
+
+def iter_ndjson(rows: Iterable[Dict[str, Any]]):
+    """Serializa filas como NDJSON, una línea por fila"""
+    for row in rows:
+        yield _ndjson_line(row)
+
+
+async def aiter_ndjson(rows: AsyncIterable[Dict[str, Any]]):
+    """Versión asíncrona de iter_ndjson (resultados de AsyncSession.stream)"""
+    async for row in rows:
+        yield _ndjson_line(row)
+
+
+def _ndjson_line(row) -> str:
+    return json.dumps(dict(row), default=_json_default, ensure_ascii=False) + "\n"
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Tipo no serializable: {type(value).__name__}")
+
+
+# ======================================================
+# 🕒 Filtros de fecha
+# ======================================================
+def naive_utc(value: Optional[datetime]) -> Optional[datetime]:
+    """Fecha de un query param en UTC sin zona, como se guardan en la base
+    ("2025-01-01T00:00:00Z" se compara igual que sin la Z)"""
+    if value is None or value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
@@ -0,0 +1,113 @@
+"""
+Límite de intentos fallidos de login por IP y por usuario (en memoria del proceso).
+
+Cada intento suma, antes de verificarse, en dos ventanas fijas de
+LOGIN_FAILURE_WINDOW_SECONDS: la de la IP de origen y la del usuario intentado. Así
+los intentos simultáneos también cuentan y nunca hay más verificaciones en curso
+que el máximo. Mientras alguna ventana esté en su máximo, el login se rechaza con
+429 y Retry-After antes de consultar la base o calcular bcrypt: una ráfaga de
+credenciales probadas no consume el pool de hashing. Un login correcto descuenta su
+intento y borra la ventana del usuario (no la de la IP).
+
+Con varios workers cada proceso cuenta por su cuenta: el máximo efectivo puede
+llegar a WORKERS veces el configurado.
+"""
+import math
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Tuple
+
+from . import config
+
+# Largo máximo del usuario como clave (no guardar en memoria nombres arbitrarios)
+MAX_USERNAME_KEY = 150
+
+
+class LoginLimiter:
+    def __init__(self, max_per_ip: int, max_per_user: int, window: float, max_keys: int):
+        self.max_per_ip = max_per_ip
+        self.max_per_user = max_per_user
+        self.window = window
+        self.max_keys = max_keys
+        # clave -> [vencimiento de la ventana, fallos]; orden = último fallo
+        self._windows: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        # Métricas
+        self.failures = 0
+        self.rejected = 0
+        self.evictions = 0
+
+    def _keys(self, ip: str, username: str) -> List[Tuple[str, int]]:
+        keys = []
+        if self.max_per_ip > 0:
+            keys.append((f"ip:{ip}", self.max_per_ip))
+        if self.max_per_user > 0:
+            keys.append((f"user:{username[:MAX_USERNAME_KEY]}", self.max_per_user))
+        return keys
+
+    def attempt(self, ip: str, username: str) -> int:
+        """Cuenta el intento de antemano (también los que están verificándose en paralelo).
+        Devuelve 0 si puede seguir, o los segundos hasta poder reintentar si la IP o el
+        usuario ya llegaron al máximo (en ese caso no se cuenta)"""
+        now = time.monotonic()
+        keys = self._keys(ip, username)
+        with self._lock:
+            wait = 0.0
+            for key, limit in keys:
+                entry = self._windows.get(key)
+                if entry is not None and entry[0] > now and entry[1] >= limit:
+                    wait = max(wait, entry[0] - now)
+            if wait:
+                self.rejected += 1
+                return math.ceil(wait)
+            self.failures += 1
+            for key, _ in keys:
+                entry = self._windows.get(key)
+                if entry is None or entry[0] <= now:
+                    self._windows[key] = [now + self.window, 1]
+                else:
+                    entry[1] += 1
+                self._windows.move_to_end(key)
+            while len(self._windows) > self.max_keys:
+                self._windows.popitem(last=False)
+                self.evictions += 1
+        return 0
+
+    def cancel(self, ip: str, username: str):
+        """Descuenta un intento que no llegó a verificarse (p. ej. pool de bcrypt lleno)"""
+        with self._lock:
+            self.failures -= 1
+            for key, _ in self._keys(ip, username):
+                entry = self._windows.get(key)
+                if entry is not None and entry[1] > 0:
+                    entry[1] -= 1
+
+    def succeeded(self, ip: str, username: str):
+        """Login correcto: el intento no cuenta y se borra la ventana del usuario"""
+        self.cancel(ip, username)
+        with self._lock:
+            self._windows.pop(f"user:{username[:MAX_USERNAME_KEY]}", None)
+
+    def clear(self):
+        with self._lock:
+            self._windows.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "max_failures_per_ip": self.max_per_ip,
+            "max_failures_per_user": self.max_per_user,
+            "window_seconds": self.window,
+            "tracked_keys": len(self._windows),
+            "failures": self.failures,
+            "rejected": self.rejected,
+            "evictions": self.evictions,
+        }
+
+
+login_limiter = LoginLimiter(
+    config.LOGIN_MAX_FAILURES_PER_IP,
+    config.LOGIN_MAX_FAILURES_PER_USER,
+    config.LOGIN_FAILURE_WINDOW_SECONDS,
+    config.LOGIN_LIMITER_MAX_KEYS,
+)
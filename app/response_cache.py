@@ -0,0 +1,337 @@
+"""
+Caché de respuestas JSON ya serializadas para endpoints de lectura frecuente.
+
+Cada entrada guarda el cuerpo en bytes, su ETag y la versión de cada etiqueta de la
+que depende ("products", "product:7", "owner:3", "user:3"). Los handlers que
+modifican datos llaman a `invalidate_on_commit(session, *etiquetas)`: al hacer commit
+se incrementa la versión de esas etiquetas y toda entrada que dependa de ellas deja
+de ser válida (sin recorrer claves, y entre procesos si el backend es compartido;
+con memory y varios workers, las etiquetas viajan por el bus de app.bus).
+
+Con If-None-Match igual al ETag guardado se responde 304 sin tocar la base.
+
+Los handlers async usan `lookup_async` / `store_async`: con un backend de red
+(redis) las llamadas van al threadpool y no frenan el event loop. Las invalidaciones
+de un commit hecho dentro del event loop (AsyncSession) se mandan a un hilo propio;
+toda lectura posterior espera las que sigan en curso, así que quien escribió ve su
+cambio en el siguiente pedido.
+
+Backends (RESPONSE_CACHE_BACKEND):
+- memory: LRU con TTL en la memoria del proceso (por defecto).
+- redis: servidor compatible con Redis en REDIS_URL (requiere el paquete `redis`).
+- off: sin caché.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from typing import Any, Dict, Iterable, List, Optional, Set
+from urllib.parse import urlencode
+
+from fastapi import Request, Response
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from . import config, serialization
+from .cache import TTLCache
+
+PENDING_KEY = "response_cache_tags"
+
+logger = logging.getLogger(__name__)
+
+
+# ======================================================
+# 🧱 Backends
+# ======================================================
+class MemoryBackend:
+    shared = False  # versiones propias del proceso
+    blocking = False  # todo en memoria: se llama directo desde el event loop
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.entries = TTLCache(maxsize, ttl)
+        self._versions: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self.entries.get(key)
+
+    def set(self, key: str, value: bytes):
+        self.entries.set(key, value)
+
+    def versions(self, tags: List[str]) -> List[int]:
+        return [self._versions.get(tag, 0) for tag in tags]
+
+    def bump(self, tags: Iterable[str]):
+        with self._lock:
+            for tag in tags:
+                self._versions[tag] = self._versions.get(tag, 0) + 1
+
+    def size(self) -> int:
+        return len(self.entries._data)
+
+    def clear(self):
+        self.entries.clear()
+
+
+class RedisBackend:
+    """Misma interfaz sobre Redis: las versiones de etiquetas se comparten entre procesos"""
+
+    shared = True
+    blocking = True  # cada llamada es un viaje de red
+
+    def __init__(self, url: str, ttl: float, prefix: str = "respcache:"):
+        try:
+            import redis
+        except ImportError as exc:  # dependencia opcional
+            raise RuntimeError("RESPONSE_CACHE_BACKEND=redis requiere el paquete 'redis'") from exc
+        self.client = redis.Redis.from_url(url)
+        self.ttl = int(ttl)
+        self.prefix = prefix
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self.client.get(self.prefix + key)
+
+    def set(self, key: str, value: bytes):
+        self.client.set(self.prefix + key, value, ex=self.ttl)
+
+    def versions(self, tags: List[str]) -> List[int]:
+        values = self.client.mget([f"{self.prefix}tag:{tag}" for tag in tags])
+        return [int(value) if value is not None else 0 for value in values]
+
+    def bump(self, tags: Iterable[str]):
+        pipe = self.client.pipeline()
+        for tag in tags:
+            pipe.incr(f"{self.prefix}tag:{tag}")
+        pipe.execute()
+
+    def size(self) -> int:
+        return -1  # no se recorre el keyspace para contar
+
+
+# ======================================================
+# 📦 Caché de respuestas
+# ======================================================
+class CachedLookup:
+    """Resultado de lookup(): `response` si hubo acierto; si no, `store()` guarda y responde"""
+
+    def __init__(self, cache: "ResponseCache", request: Request, key: str, tags: List[str], versions: List[int]):
+        self.cache = cache
+        self.request = request
+        self.key = key
+        self.tags = tags
+        self.versions = versions
+        self.response: Optional[Response] = None
+
+    def store(self, data: Any, extra_tags: Iterable[str] = ()) -> Response:
+        """Serializa `data` una vez, lo guarda y responde (304 si el cliente ya lo tiene)"""
+        body = serialization.encode(data)
+        etag = _etag(body)
+        if self.cache.enabled:
+            extra = [tag for tag in extra_tags if tag not in self.tags]
+            tags = self.tags + extra
+            # Las etiquetas conocidas de antemano usan la versión leída ANTES de consultar
+            # la base: si alguien modificó los datos mientras tanto, la entrada nace inválida
+            versions = self.versions + (self.cache.backend.versions(extra) if extra else [])
+            header = json.dumps({"etag": etag, "tags": dict(zip(tags, versions))}).encode()
+            self.cache.backend.set(self.key, header + b"\n" + body)
+        return self.cache._respond(self.request, body, etag, hit=False)
+
+    async def store_async(self, data: Any, extra_tags: Iterable[str] = ()) -> Response:
+        """store() para handlers async: con un backend bloqueante corre en el threadpool"""
+        if self.cache.blocking:
+            return await run_in_threadpool(self.store, data, extra_tags)
+        return self.store(data, extra_tags)
+
+
+class ResponseCache:
+    def __init__(self, backend: Optional[Any]):
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+        self.bytes_from_cache = 0
+        self.bytes_not_sent = 0
+        self.invalidations = 0
+        # Invalidaciones en curso de commits hechos dentro del event loop
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._in_flight: Set[Future] = set()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.backend is not None
+
+    @property
+    def blocking(self) -> bool:
+        return self.enabled and self.backend.blocking
+
+    def lookup(self, request: Request, tags: List[str]) -> CachedLookup:
+        key = request.url.path + "?" + urlencode(sorted(request.query_params.multi_items()))
+        if not self.enabled:
+            return CachedLookup(self, request, key, tags, [])
+
+        self._wait_in_flight()
+        versions = self.backend.versions(tags)
+        lookup = CachedLookup(self, request, key, tags, versions)
+        raw = self.backend.get(key)
+        if raw is not None:
+            header, _, body = raw.partition(b"\n")
+            meta = json.loads(header)
+            stored = meta["tags"]
+            if all(stored.get(tag) == version for tag, version in zip(tags, versions)) and self._extra_valid(
+                stored, tags
+            ):
+                self.hits += 1
+                lookup.response = self._respond(request, body, meta["etag"], hit=True)
+                return lookup
+        self.misses += 1
+        return lookup
+
+    async def lookup_async(self, request: Request, tags: List[str]) -> CachedLookup:
+        """lookup() para handlers async: con un backend bloqueante corre en el threadpool"""
+        if self.blocking:
+            return await run_in_threadpool(self.lookup, request, tags)
+        return self.lookup(request, tags)
+
+    def _extra_valid(self, stored: Dict[str, int], known: List[str]) -> bool:
+        extra = [tag for tag in stored if tag not in known]
+        if not extra:
+            return True
+        return self.backend.versions(extra) == [stored[tag] for tag in extra]
+
+    def _respond(self, request: Request, body: bytes, etag: str, hit: bool) -> Response:
+        headers = {"ETag": etag, "Cache-Control": "no-cache", "X-Cache": "HIT" if hit else "MISS"}
+        if etag in _if_none_match(request):
+            self.not_modified += 1
+            self.bytes_not_sent += len(body)
+            return Response(status_code=304, headers=headers)
+        if hit:
+            self.bytes_from_cache += len(body)
+        return Response(content=body, media_type="application/json", headers=headers)
+
+    # ======================================================
+    # 🧹 Invalidación (después del commit)
+    # ======================================================
+    def invalidate_on_commit(self, session: Session, *tags: str):
+        """Invalida las etiquetas cuando la transacción de `session` hace commit"""
+        session.info.setdefault(PENDING_KEY, set()).update(tags)
+
+    def invalidate(self, *tags: str):
+        if self.enabled and tags:
+            self.backend.bump(tags)
+            self.invalidations += len(tags)
+
+    def apply_remote(self, tags: Iterable[str]):
+        """Invalidaciones publicadas por otro proceso (app.bus); "*" descarta todo.
+        Con un backend compartido ya se aplicaron al hacer commit en ese proceso"""
+        if not self.enabled or self.backend.shared:
+            return
+        tags = set(tags)
+        if "*" in tags:
+            self.backend.clear()
+            self.invalidations += 1
+        else:
+            self.invalidate(*tags)
+
+    def _after_commit(self, session: Session):
+        tags = session.info.pop(PENDING_KEY, None)
+        if not tags:
+            return
+        if self.blocking and _in_event_loop():
+            self._invalidate_in_background(tags)
+        else:
+            self.invalidate(*tags)
+
+    def _invalidate_in_background(self, tags: Iterable[str]):
+        # Un solo hilo: las invalidaciones se aplican en el orden de los commits
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="response-cache")
+            future = self._executor.submit(self.invalidate, *tags)
+            self._in_flight.add(future)
+        future.add_done_callback(self._invalidated)
+
+    def _invalidated(self, future: Future):
+        with self._lock:
+            self._in_flight.discard(future)
+        if future.exception() is not None:
+            logger.error("No se pudo invalidar la caché de respuestas", exc_info=future.exception())
+
+    def _wait_in_flight(self):
+        with self._lock:
+            pending = list(self._in_flight)
+        if pending:
+            wait(pending)
+
+    def _after_rollback(self, session: Session):
+        session.info.pop(PENDING_KEY, None)
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "backend": config.RESPONSE_CACHE_BACKEND,
+            "entries": self.backend.size() if self.enabled else 0,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / total, 4) if total else 0.0,
+            "not_modified": self.not_modified,
+            "bytes_from_cache": self.bytes_from_cache,
+            "bytes_not_sent": self.bytes_not_sent,
+            "invalidations": self.invalidations,
+        }
+
+
+def _in_event_loop() -> bool:
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return False
+    return True
+
+
+def _etag(body: bytes) -> str:
+    return '"' + hashlib.blake2b(body, digest_size=12).hexdigest() + '"'
+
+
+def _if_none_match(request: Request) -> List[str]:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return []
+    # Acepta listas y ETags débiles (W/"...") del lado del cliente
+    return [value.strip().removeprefix("W/") for value in header.split(",")]
+
+
+def _make_backend():
+    if config.RESPONSE_CACHE_BACKEND == "off":
+        return None
+    if config.RESPONSE_CACHE_BACKEND == "redis":
+        return RedisBackend(config.REDIS_URL, config.RESPONSE_CACHE_TTL_SECONDS)
+    if config.RESPONSE_CACHE_BACKEND == "memory":
+        return MemoryBackend(config.RESPONSE_CACHE_SIZE, config.RESPONSE_CACHE_TTL_SECONDS)
+    raise ValueError(f"RESPONSE_CACHE_BACKEND desconocido: {config.RESPONSE_CACHE_BACKEND!r}")
+
+
+response_cache = ResponseCache(_make_backend())
+
+# Aplica a todas las sesiones (también a la sesión síncrona interna de AsyncSession)
+event.listen(Session, "after_commit", response_cache._after_commit)
+event.listen(Session, "after_rollback", response_cache._after_rollback)
+
+
+# ======================================================
+# 🏷️ Etiquetas de los datos de productos y usuarios
+# ======================================================
+def products_changed(session: Session, owner_id: Optional[int], product_id: Optional[int] = None):
+    """Listados del catálogo, productos del dueño y (si hay id) el dueño de ese producto"""
+    tags = ["products", f"owner:{owner_id}"]
+    if product_id is not None:
+        tags.append(f"product:{product_id}")
+    response_cache.invalidate_on_commit(session, *tags)
+
+
+def user_changed(session: Session, user_id: int):
+    """Datos del usuario mostrados como dueño y su listado de productos"""
+    response_cache.invalidate_on_commit(session, f"user:{user_id}")
@@ -0,0 +1,3 @@
+# Versiones con AsyncSession de los routers (se activan con DB_MODE=async).
+# Mismas rutas y respuestas que app/routers; la lógica compartida (contadores,
+# agregados, caché de sesiones) se reutiliza con AsyncSession.run_sync.
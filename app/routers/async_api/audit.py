@@ -0,0 +1,115 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.concurrency import run_in_threadpool
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from datetime import datetime, timedelta
+from itertools import islice
+from typing import Optional
+from ... import archive, config
+from ...database import get_async_session, get_session
+from ...models import User
+from ...pagination import aiter_ndjson, build_page, decode_cursor, iter_ndjson
+from ..auth_router import get_current_user_async
+from ..audit import (
+    DEFAULT_PAGE_SIZE, HISTORY_SORT, MAX_PAGE_SIZE, STREAM_BATCH_SIZE, history_filters, history_query,
+    get_writer_stats, list_audit_partitions,
+)
+
+router = APIRouter(prefix="/audit", tags=["audit"])
+
+@router.get("/history")
+async def get_audit_history(
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    action: Optional[str] = None,
+    performed_by: Optional[str] = None,
+    target_id: Optional[int] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    format: str = Query("json", pattern="^(json|ndjson)$"),
+    session: AsyncSession = Depends(get_async_session),
+    current_user: User = Depends(get_current_user_async)
+):
+    """Igual que la versión síncrona: lista completa, página por keyset o NDJSON"""
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Solo administradores pueden ver el historial")
+
+    stmt = history_query(cursor, history_filters(action, performed_by, target_id, since, until))
+
+    if format == "ndjson":
+        if limit:
+            stmt = stmt.limit(limit)
+        result = await session.stream(stmt.execution_options(yield_per=STREAM_BATCH_SIZE))
+        return StreamingResponse(aiter_ndjson(result.mappings()), media_type="application/x-ndjson")
+
+    if limit is None and cursor is None:
+        return [dict(row) for row in (await session.execute(stmt)).mappings()]
+
+    page_size = limit or DEFAULT_PAGE_SIZE
+    rows = [dict(row) for row in (await session.execute(stmt.limit(page_size + 1))).mappings()]
+    return JSONResponse(jsonable_encoder(build_page(rows, page_size, HISTORY_SORT, "performed_at")))
+
+
+# ======================================================
+# 🗄️ Historial archivado (archivos mensuales comprimidos)
+# ======================================================
+@router.get("/archive")
+async def get_audit_archive(
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    action: Optional[str] = None,
+    performed_by: Optional[str] = None,
+    target_id: Optional[int] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    format: str = Query("json", pattern="^(json|ndjson)$"),
+    current_user: User = Depends(get_current_user_async)
+):
+    """Igual que la versión síncrona; la descompresión corre en un hilo de trabajo"""
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Solo administradores pueden ver el historial")
+
+    filters = history_filters(action, performed_by, target_id, since, until)
+    after = decode_cursor(cursor, HISTORY_SORT) if cursor else None
+
+    if format == "ndjson":
+        # Iterador síncrono: StreamingResponse lo consume en el threadpool
+        return StreamingResponse(
+            iter_ndjson(archive.iter_archive(filters, after)), media_type="application/x-ndjson"
+        )
+
+    rows = await run_in_threadpool(lambda: list(islice(archive.iter_archive(filters, after), limit + 1)))
+    return JSONResponse(jsonable_encoder(build_page(rows, limit, HISTORY_SORT, "performed_at")))
+
+
+@router.post("/archive")
+async def run_audit_archive(
+    older_than_days: int = Query(config.AUDIT_RETENTION_DAYS, ge=0),
+    session: Session = Depends(get_session),
+    current_user: User = Depends(get_current_user_async)
+):
+    """Mueve al archivo las filas más antiguas que `older_than_days` (solo admin)"""
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Solo administradores pueden archivar el historial")
+
+    before = datetime.utcnow() - timedelta(days=older_than_days)
+
+    # Escritura de archivos y borrado por lotes: en un hilo con una Session síncrona
+    def run_archive():
+        return archive.archive(session, before)
+
+    return await run_in_threadpool(run_archive)
+
+
+@router.get("/archive/partitions")
+async def get_audit_partitions(current_user: User = Depends(get_current_user_async)):
+    """Meses archivados y tamaño de cada archivo (solo admin)"""
+    return list_audit_partitions(current_user)
+
+
+@router.get("/writer-stats")
+async def get_audit_writer_stats(current_user: User = Depends(get_current_user_async)):
+    """Modo, profundidad de la cola y latencia de escritura por lote (solo admin)"""
+    return get_writer_stats(current_user)
@@ -0,0 +1,323 @@
+from fastapi import APIRouter, Depends, HTTPException, Form, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from typing import List, Optional
+from ... import bulk, counters, images, search
+from ...audit_writer import audit_writer
+from ...database import get_async_session, get_session
+from ...models import Product, ProductBatchDelete, ProductBatchUpdate, User
+from ...pagination import aiter_ndjson, build_page
+from ...response_cache import products_changed, response_cache
+from ...serialization import json_response
+from ..auth_router import get_current_user_async
+from ..products import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, STREAM_BATCH_SIZE, list_query
+from ..products import delete_products_batch, update_products_batch
+
+router = APIRouter(prefix="/products", tags=["products"])
+
+# ======================================================
+# 🟢 Crear producto (solo admin)
+# ======================================================
+@router.post("/create")
+async def create_product(
+    name: str = Form(...),
+    description: str = Form(None),
+    price: float = Form(...),
+    quantity: int = Form(...),
+    db: AsyncSession = Depends(get_async_session),
+    current_user: User = Depends(get_current_user_async)
+):
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Solo los administradores pueden crear productos")
+
+    product = Product(
+        name=name,
+        description=description,
+        price=price,
+        quantity=quantity,
+        owner_id=current_user.id
+    )
+    db.add(product)
+    await db.run_sync(lambda sync_db: counters.product_created(sync_db, product))
+    audit_writer.record(
+        db.sync_session, "CREATE_PRODUCT", product.id, product.name, current_user.username,
+        price=price, quantity=quantity
+    )
+    products_changed(db.sync_session, current_user.id)
+    await db.commit()
+    await db.refresh(product)
+    return {"message": "Producto creado exitosamente", "product": product}
+
+
+# ======================================================
+# 🔵 Listar todos los productos (clientes y admin)
+# ======================================================
+@router.get("/list", response_model=List[Product])
+async def list_products(
+    request: Request,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    sort: str = "id",
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    in_stock: Optional[bool] = None,
+    owner_id: Optional[int] = None,
+    name_prefix: Optional[str] = None,
+    format: str = Query("json", pattern="^(json|ndjson)$"),
+    db: AsyncSession = Depends(get_async_session)
+):
+    """Igual que la versión síncrona: lista completa, página por keyset o NDJSON"""
+    stmt, sort_field = list_query(cursor, sort, min_price, max_price, in_stock, owner_id, name_prefix)
+
+    if format == "ndjson":
+        if limit:
+            stmt = stmt.limit(limit)
+        result = await db.stream(stmt.execution_options(yield_per=STREAM_BATCH_SIZE))
+        return StreamingResponse(aiter_ndjson(result.mappings()), media_type="application/x-ndjson")
+
+    cached = await response_cache.lookup_async(request, ["products"])
+    if cached.response is not None:
+        return cached.response
+
+    if limit is None and cursor is None:
+        return await cached.store_async([dict(row) for row in (await db.execute(stmt)).mappings()])
+
+    page_size = limit or DEFAULT_PAGE_SIZE
+    rows = [dict(row) for row in (await db.execute(stmt.limit(page_size + 1))).mappings()]
+    return await cached.store_async(build_page(rows, page_size, sort, sort_field))
+
+
+# ======================================================
+# 🔎 Búsqueda de texto completo (nombre y descripción)
+# ======================================================
+@router.get("/search")
+async def search_products(
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    sort: str = Query("rank", pattern="^(rank|id)$"),
+    highlight: bool = True,
+    db: AsyncSession = Depends(get_async_session)
+):
+    """Igual que la versión síncrona: relevancia bm25, fragmentos resaltados y cursor"""
+    stmt, sort, sort_field = search.page_query(q, cursor, highlight, sort, db.get_bind().dialect)
+    rows = [dict(row) for row in (await db.execute(stmt.limit(limit + 1))).mappings()]
+    return json_response(build_page(rows, limit, sort, sort_field))
+
+
+# ======================================================
+# 📥 Importación masiva CSV / NDJSON (solo admin)
+# ======================================================
+@router.post("/import")
+async def import_products(
+    request: Request,
+    format: str = Query("csv", pattern="^(csv|ndjson)$"),
+    db: Session = Depends(get_session),
+    current_user: User = Depends(get_current_user_async)
+):
+    """Importa productos desde el cuerpo de la petición (CSV con encabezado o NDJSON)"""
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Solo los administradores pueden importar productos")
+
+    # Parsear y validar es trabajo de CPU: se hace en un hilo con una Session síncrona
+    # para no bloquear el event loop
+    def run_import():
+        report = bulk.import_products(db, bulk.body_lines(request.stream()), format, current_user.id)
+        audit_writer.record(
+            db, "IMPORT_PRODUCTS", 0, f"importación {format}", current_user.username,
+            inserted=report["inserted"], error_count=report["error_count"]
+        )
+        products_changed(db, current_user.id)
+        db.commit()
+        return report
+
+    return await run_in_threadpool(run_import)
+
+
+# ======================================================
+# 📤 Exportación masiva CSV / NDJSON
+# ======================================================
+@router.get("/export")
+async def export_products(
+    format: str = Query("csv", pattern="^(csv|ndjson)$"),
+    db: AsyncSession = Depends(get_async_session)
+):
+    """Exporta todo el catálogo en streaming (mismo formato que acepta /products/import)"""
+    result = await db.stream(bulk.export_query().execution_options(yield_per=STREAM_BATCH_SIZE))
+    return StreamingResponse(
+        bulk.aexport_lines(result.mappings(), format),
+        media_type="text/csv" if format == "csv" else "application/x-ndjson",
+        headers={"Content-Disposition": f'attachment; filename="productos.{format}"'}
+    )
+
+
+# ======================================================
+# 🟠 Actualizar producto (solo admin)
+# ======================================================
+@router.put("/{product_id}")
+async def update_product(
+    product_id: int,
+    name: str = Form(None),
+    description: str = Form(None),
+    price: float = Form(None),
+    quantity: int = Form(None),
+    db: AsyncSession = Depends(get_async_session),
+    current_user: User = Depends(get_current_user_async)
+):
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Solo los administradores pueden actualizar productos")
+
+    product = await db.get(Product, product_id)
+    if not product:
+        raise HTTPException(status_code=404, detail="Producto no encontrado")
+
+    before = counters.product_snapshot(product)
+    if name:
+        product.name = name
+    if description:
+        product.description = description
+    if price is not None:
+        product.price = price
+    if quantity is not None:
+        product.quantity = quantity
+
+    await db.run_sync(lambda sync_db: counters.product_updated(sync_db, before, product))
+    changes = {"name": name or None, "description": description or None, "price": price, "quantity": quantity}
+    audit_writer.record(
+        db.sync_session, "UPDATE_PRODUCT", product.id, product.name, current_user.username,
+        changes=", ".join(f"{field}={value}" for field, value in changes.items() if value is not None)
+    )
+    products_changed(db.sync_session, product.owner_id, product.id)
+    await db.commit()
+    await db.refresh(product)
+    return {"message": "Producto actualizado correctamente", "product": product}
+
+
+# ======================================================
+# 🧰 Actualización y borrado masivos (solo admin)
+# ======================================================
+@router.post("/batch/update")
+async def batch_update_products(
+    order: ProductBatchUpdate,
+    db: AsyncSession = Depends(get_async_session),
+    current_user: User = Depends(get_current_user_async)
+):
+    """Aplica los mismos cambios a una lista de ids o a los productos del filtro"""
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Solo los administradores pueden actualizar productos")
+    return await db.run_sync(update_products_batch, order, current_user)
+
+
+@router.post("/batch/delete")
+async def batch_delete_products(
+    order: ProductBatchDelete,
+    db: AsyncSession = Depends(get_async_session),
+    current_user: User = Depends(get_current_user_async)
+):
+    """Elimina una lista de ids o los productos del filtro (con historial)"""
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Solo los administradores pueden eliminar productos")
+    return await db.run_sync(delete_products_batch, order, current_user)
+
+
+# ======================================================
+# 🖼️ Subir imagen del producto (solo admin)
+# ======================================================
+@router.post("/{product_id}/image")
+async def upload_product_image(
+    product_id: int,
+    request: Request,
+    db: AsyncSession = Depends(get_async_session),
+    current_user: User = Depends(get_current_user_async)
+):
+    """
+    Multipart con el archivo en el campo `file`, leído en streaming y guardado por
+    hash de contenido (la misma imagen se guarda una sola vez). Las miniaturas se
+    generan en segundo plano.
+    """
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Solo los administradores pueden actualizar productos")
+    if await db.get(Product, product_id) is None:
+        raise HTTPException(status_code=404, detail="Producto no encontrado")
+
+    upload = await images.receive_upload(request)
+
+    product = await db.get(Product, product_id)
+    if product is None:
+        raise HTTPException(status_code=404, detail="Producto no encontrado")
+    product.image_path = upload["key"]
+    audit_writer.record(
+        db.sync_session, "UPDATE_PRODUCT", product.id, product.name, current_user.username,
+        changes=f"image_path={upload['key']}"
+    )
+    products_changed(db.sync_session, product.owner_id, product.id)
+    await db.commit()
+    images.thumbnailer.submit(upload["key"])
+    return {
+        "message": "Imagen guardada",
+        "image": images.describe(upload["key"]),
+        "size": upload["size"],
+        "deduplicated": upload["deduplicated"],
+    }
+
+
+# ======================================================
+# 🔴 Eliminar producto (solo admin) - CON HISTORIAL
+# ======================================================
+@router.delete("/{product_id}")
+async def delete_product(
+    product_id: int,
+    db: AsyncSession = Depends(get_async_session),
+    current_user: User = Depends(get_current_user_async)
+):
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Solo los administradores pueden eliminar productos")
+
+    product = await db.get(Product, product_id)
+    if not product:
+        raise HTTPException(status_code=404, detail="Producto no encontrado")
+
+    # 🔥 REGISTRAR EN HISTORIAL ANTES de eliminar (se escribe al hacer commit)
+    audit_writer.record(
+        db.sync_session, "DELETE_PRODUCT", product_id, product.name, current_user.username,
+        price=product.price, quantity=product.quantity
+    )
+
+    await db.delete(product)
+    await db.run_sync(lambda sync_db: counters.product_deleted(sync_db, product))
+    products_changed(db.sync_session, product.owner_id, product_id)
+    await db.commit()
+    return {"message": f"Producto '{product.name}' eliminado exitosamente"}
+
+
+# ======================================================
+# 🔍 VER INFORMACIÓN DEL DUEÑO DE UN PRODUCTO
+# ======================================================
+@router.get("/{product_id}/owner")
+async def get_product_owner(
+    product_id: int,
+    request: Request,
+    db: AsyncSession = Depends(get_async_session)
+):
+    """Obtiene información del usuario dueño de un producto"""
+    cached = await response_cache.lookup_async(request, [f"product:{product_id}"])
+    if cached.response is not None:
+        return cached.response
+
+    product = await db.get(Product, product_id)
+    if not product:
+        raise HTTPException(status_code=404, detail="Producto no encontrado")
+
+    # En async no hay carga perezosa de relaciones: se busca el dueño por clave primaria
+    owner = await db.get(User, product.owner_id) if product.owner_id is not None else None
+    if not owner:
+        return await cached.store_async({"message": "Este producto no tiene dueño asignado"}, [f"user:{product.owner_id}"])
+
+    return await cached.store_async({
+        "owner_id": owner.id,
+        "owner_username": owner.username,
+        "owner_role": owner.role,
+        "owner_created_at": owner.created_at
+    }, [f"user:{product.owner_id}"])
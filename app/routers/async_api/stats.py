@@ -0,0 +1,103 @@
+from datetime import datetime
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional
+from ... import counters, history
+from ...database import get_async_session
+from ...models import User
+from ..auth_router import get_current_user_async
+from ..stats import get_response_cache_stats as get_response_cache_stats_sync, user_products_report
+from ..stats import get_reservation_stats as get_reservation_stats_sync
+from ..stats import get_invalidation_bus_stats as get_invalidation_bus_stats_sync
+from ..stats import timeseries_report
+
+router = APIRouter(prefix="/stats", tags=["stats"])
+
+@router.get("/user-products")
+async def get_user_products_stats(
+    limit: Optional[int] = Query(None, ge=1),
+    offset: int = Query(0, ge=0),
+    products_per_user: Optional[int] = Query(None, ge=0),
+    session: AsyncSession = Depends(get_async_session),
+    current_user: User = Depends(get_current_user_async)
+):
+    """Estadísticas de productos por usuario (solo admin)"""
+    if current_user.role != "admin":
+        raise HTTPException(
+            status_code=403,
+            detail="Solo los administradores pueden ver las estadísticas"
+        )
+
+    return await session.run_sync(
+        lambda sync_session: user_products_report(sync_session, limit, offset, products_per_user)
+    )
+
+@router.get("/general")
+async def get_general_stats(
+    session: AsyncSession = Depends(get_async_session),
+    current_user: User = Depends(get_current_user_async)
+):
+    """Estadísticas generales del sistema (solo admin)"""
+    if current_user.role != "admin":
+        raise HTTPException(
+            status_code=403,
+            detail="Solo los administradores pueden ver las estadísticas"
+        )
+
+    return await session.run_sync(counters.general_stats)
+
+@router.get("/response-cache")
+async def get_response_cache_stats(current_user: User = Depends(get_current_user_async)):
+    """Aciertos, 304 y bytes ahorrados por la caché de respuestas (solo admin)"""
+    return get_response_cache_stats_sync(current_user)
+
+@router.get("/reservations")
+async def get_reservation_stats(current_user: User = Depends(get_current_user_async)):
+    """Ejecuciones del barrendero y reservas vencidas devueltas al stock (solo admin)"""
+    return get_reservation_stats_sync(current_user)
+
+@router.get("/invalidation-bus")
+async def get_invalidation_bus_stats(current_user: User = Depends(get_current_user_async)):
+    """Eventos publicados y recibidos por este worker en el bus de invalidación (solo admin)"""
+    return get_invalidation_bus_stats_sync(current_user)
+
+@router.get("/history")
+async def get_history_stats(
+    session: AsyncSession = Depends(get_async_session),
+    current_user: User = Depends(get_current_user_async)
+):
+    """Consolidación del historial de precios y stock: eventos pendientes y ejecuciones (solo admin)"""
+    if current_user.role != "admin":
+        raise HTTPException(
+            status_code=403,
+            detail="Solo los administradores pueden ver las estadísticas"
+        )
+
+    pending = await session.run_sync(history.pending_events)
+    return {**history.rollup_worker.stats(), **pending}
+
+@router.get("/timeseries")
+async def get_timeseries(
+    metric: str = Query(..., pattern="^(price|stock|value)$"),
+    granularity: str = Query("hour", pattern="^(hour|day)$"),
+    product_id: Optional[int] = Query(None, ge=1),
+    owner_id: Optional[int] = Query(None, ge=1),
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    fill: bool = True,
+    session: AsyncSession = Depends(get_async_session),
+    current_user: User = Depends(get_current_user_async)
+):
+    """Serie de precio o stock de un producto, o de valor de inventario de un dueño
+    (todo el inventario sin owner_id), leída de los buckets consolidados (solo admin)"""
+    if current_user.role != "admin":
+        raise HTTPException(
+            status_code=403,
+            detail="Solo los administradores pueden ver las estadísticas"
+        )
+
+    return await session.run_sync(
+        lambda sync_session: timeseries_report(
+            sync_session, metric, granularity, product_id, owner_id, start, end, fill
+        )
+    )
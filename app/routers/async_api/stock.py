@@ -0,0 +1,84 @@
+from fastapi import APIRouter, Depends, Form
+from sqlalchemy.ext.asyncio import AsyncSession
+from ... import stock
+from ...database import get_async_session
+from ...models import Checkout, User
+from ..auth_router import get_current_user_async
+
+# Misma lógica que routers/stock.py: las funciones de app.stock corren con run_sync
+router = APIRouter(tags=["stock"])
+
+# ======================================================
+# 🛒 Comprar un producto
+# ======================================================
+@router.post("/products/{product_id}/purchase")
+async def purchase_product(
+    product_id: int,
+    quantity: int = Form(1, ge=1),
+    db: AsyncSession = Depends(get_async_session),
+    current_user: User = Depends(get_current_user_async)
+):
+    purchase = await db.run_sync(stock.purchase, product_id, quantity, current_user)
+    await db.commit()
+    return {"message": "Compra realizada", "purchase": purchase}
+
+
+# ======================================================
+# 🧾 Checkout: varios productos en una sola transacción
+# ======================================================
+@router.post("/checkout")
+async def checkout(
+    order: Checkout,
+    db: AsyncSession = Depends(get_async_session),
+    current_user: User = Depends(get_current_user_async)
+):
+    purchases = await db.run_sync(stock.checkout, order.items, current_user)
+    await db.commit()
+    return {"message": f"Checkout realizado: {len(purchases)} productos", "purchases": purchases}
+
+
+# ======================================================
+# ⏳ Reservas (el stock queda apartado hasta confirmar, liberar o vencer)
+# ======================================================
+@router.post("/products/{product_id}/reserve")
+async def reserve_product(
+    product_id: int,
+    quantity: int = Form(1, ge=1),
+    db: AsyncSession = Depends(get_async_session),
+    current_user: User = Depends(get_current_user_async)
+):
+    reservation = await db.run_sync(stock.reserve, product_id, quantity, current_user)
+    await db.commit()
+    return {"message": "Reserva creada", "reservation": reservation}
+
+
+@router.get("/reservations")
+async def list_reservations(
+    db: AsyncSession = Depends(get_async_session),
+    current_user: User = Depends(get_current_user_async)
+):
+    """Reservas vigentes del usuario logueado"""
+    return await db.run_sync(stock.list_reservations, current_user)
+
+
+@router.post("/reservations/{reservation_id}/confirm")
+async def confirm_reservation(
+    reservation_id: int,
+    db: AsyncSession = Depends(get_async_session),
+    current_user: User = Depends(get_current_user_async)
+):
+    purchase = await db.run_sync(stock.confirm, reservation_id, current_user)
+    await db.commit()
+    return {"message": "Compra realizada", "purchase": purchase}
+
+
+@router.delete("/reservations/{reservation_id}")
+async def release_reservation(
+    reservation_id: int,
+    db: AsyncSession = Depends(get_async_session),
+    current_user: User = Depends(get_current_user_async)
+):
+    """Libera la reserva (propia, o cualquiera si es admin) y devuelve el stock"""
+    released = await db.run_sync(stock.release, reservation_id, current_user)
+    await db.commit()
+    return {"message": "Reserva liberada", "reservation": released}
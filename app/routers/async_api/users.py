@@ -0,0 +1,178 @@
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List
+from ... import counters, sessions
+from ...audit_writer import audit_writer
+from ...response_cache import products_changed, response_cache, user_changed
+from ...serialization import FastJSONResponse, fast_enabled
+from ...auth import hash_password_async
+from ...database import get_async_session
+from ...models import User, Product, UserBatchDelete, UserBatchUpdate
+from ..auth_router import get_current_user_async
+from ..users import USER_COLUMNS, delete_users_batch, release_products, update_users_batch, user_products_rows
+
+router = APIRouter(prefix="/users", tags=["users"])
+
+# Crear usuario
+@router.post("/", response_model=User)
+async def create_user(user: User, session: AsyncSession = Depends(get_async_session)):
+    # Verificar si el usuario ya existe
+    db_user = (await session.execute(select(User).where(User.username == user.username))).scalars().first()
+    if db_user:
+        raise HTTPException(status_code=400, detail="El nombre de usuario ya existe.")
+
+    # Hashear la contraseña antes de guardar (en el pool de bcrypt, sin bloquear el event loop)
+    user.hashed_password = await hash_password_async(user.hashed_password)
+    session.add(user)
+    await session.run_sync(lambda sync_session: counters.user_created(sync_session, user))
+    await session.flush()  # id para el historial
+    audit_writer.record(session.sync_session, "CREATE_USER", user.id, user.username, user.username, role=user.role)
+    await session.commit()
+    await session.refresh(user)
+    return user
+
+
+# Listar todos los usuarios (solo admin)
+@router.get("/", response_model=List[User])
+async def list_users(
+    session: AsyncSession = Depends(get_async_session),
+    current_user: User = Depends(get_current_user_async)
+):
+    if current_user.role != "admin":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="No tienes permisos para ver esta lista."
+        )
+
+    if fast_enabled():
+        return FastJSONResponse([dict(row) for row in (await session.execute(select(*USER_COLUMNS))).mappings()])
+
+    return (await session.execute(select(User))).scalars().all()
+
+# Actualizar usuario (solo admin)
+@router.put("/{user_id}", response_model=User)
+async def update_user(
+    user_id: int,
+    updated_user: User,
+    session: AsyncSession = Depends(get_async_session),
+    current_user: User = Depends(get_current_user_async)
+):
+    # Solo los administradores pueden editar usuarios
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="No tienes permisos para editar usuarios")
+
+    user = await session.get(User, user_id)
+    if not user:
+        raise HTTPException(status_code=404, detail="Usuario no encontrado")
+
+    # Actualizamos los campos básicos
+    old_role = user.role
+    await session.run_sync(lambda sync_session: counters.user_role_changed(sync_session, old_role, updated_user.role))
+    user.username = updated_user.username
+    user.role = updated_user.role
+
+    # Solo actualiza contraseña si se pasa una nueva
+    if updated_user.hashed_password:
+        user.hashed_password = await hash_password_async(updated_user.hashed_password)
+
+    session.add(user)
+    audit_writer.record(
+        session.sync_session, "UPDATE_USER", user_id, user.username, current_user.username, role=user.role
+    )
+    user_changed(session.sync_session, user_id)
+    await session.commit()
+    sessions.invalidate_user(user_id)
+    await session.refresh(user)
+    return user
+
+# Eliminar usuario (solo admin) - CON HISTORIAL
+@router.delete("/{user_id}")
+async def delete_user(
+    user_id: int,
+    session: AsyncSession = Depends(get_async_session),
+    current_user: User = Depends(get_current_user_async)
+):
+    # Solo los administradores pueden eliminar usuarios
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="No tienes permisos para eliminar usuarios")
+
+    user = await session.get(User, user_id)
+    if not user:
+        raise HTTPException(status_code=404, detail="Usuario no encontrado")
+
+    # 🔥 REGISTRAR EN HISTORIAL ANTES de eliminar (se escribe al hacer commit)
+    audit_writer.record(
+        session.sync_session, "DELETE_USER", user_id, user.username, current_user.username, role=user.role
+    )
+
+    await session.run_sync(release_products, [user_id])
+    await session.delete(user)
+    await session.run_sync(lambda sync_session: counters.user_deleted(sync_session, user))
+    user_changed(session.sync_session, user_id)
+    products_changed(session.sync_session, owner_id=user_id)  # sus productos quedan sin dueño
+    await session.commit()
+    sessions.invalidate_user(user_id)
+    return {"message": f"Usuario '{user.username}' eliminado correctamente"}
+
+# ======================================================
+# 🧰 Cambio de rol y borrado masivos (solo admin)
+# ======================================================
+@router.post("/batch/update")
+async def batch_update_users(
+    order: UserBatchUpdate,
+    session: AsyncSession = Depends(get_async_session),
+    current_user: User = Depends(get_current_user_async)
+):
+    """Asigna el mismo rol a una lista de ids o a los usuarios del filtro"""
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="No tienes permisos para editar usuarios")
+    return await session.run_sync(update_users_batch, order, current_user)
+
+
+@router.post("/batch/delete")
+async def batch_delete_users(
+    order: UserBatchDelete,
+    session: AsyncSession = Depends(get_async_session),
+    current_user: User = Depends(get_current_user_async)
+):
+    """Elimina una lista de ids o los usuarios del filtro (con historial)"""
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="No tienes permisos para eliminar usuarios")
+    return await session.run_sync(delete_users_batch, order, current_user)
+
+# ======================================================
+# 👤 VER PRODUCTOS DE UN USUARIO ESPECÍFICO
+# ======================================================
+@router.get("/{user_id}/products", response_model=List[Product])
+async def get_user_products(
+    user_id: int,
+    request: Request,
+    session: AsyncSession = Depends(get_async_session),
+    current_user: User = Depends(get_current_user_async)
+):
+    """Obtiene todos los productos de un usuario específico"""
+    # El permiso se resuelve sin la base: un acierto en caché no hace ninguna consulta
+    if current_user.role == "admin" or current_user.id == user_id:
+        cached = await response_cache.lookup_async(request, [f"user:{user_id}", f"owner:{user_id}"])
+        if cached.response is not None:
+            return cached.response
+
+    # Verificar que el usuario existe
+    user = await session.get(User, user_id)
+    if not user:
+        raise HTTPException(status_code=404, detail="Usuario no encontrado")
+
+    # Solo admin puede ver productos de otros usuarios, usuarios normales solo los suyos
+    if current_user.role != "admin" and current_user.id != user_id:
+        raise HTTPException(
+            status_code=403,
+            detail="No tienes permisos para ver productos de otros usuarios"
+        )
+
+    if fast_enabled():
+        return await cached.store_async(await session.run_sync(user_products_rows, user_id))
+
+    # Sin carga perezosa en async: consulta explícita por owner_id
+    products = (await session.execute(select(Product).where(Product.owner_id == user_id))).scalars().all()
+    return await cached.store_async(products)
@@ -1,20 +1,162 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, StreamingResponse
 from sqlmodel import Session, select
-from typing import List
+from datetime import datetime, timedelta
+from itertools import islice
+import os
+from typing import Optional
+from .. import archive, config
+from ..audit_writer import audit_writer
 from ..database import get_session
 from ..models import AuditLog, User  # ✅ Agregar User aquí
+from ..pagination import build_page, decode_cursor, iter_ndjson, keyset_clauses, naive_utc
 from .auth_router import get_current_user
 
 router = APIRouter(prefix="/audit", tags=["audit"])
 
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 1000
+STREAM_BATCH_SIZE = 1000
+# Siempre del más reciente al más antiguo (desempata por id)
+HISTORY_SORT = "-performed_at"
+
 @router.get("/history")
 def get_audit_history(
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    action: Optional[str] = None,
+    performed_by: Optional[str] = None,
+    target_id: Optional[int] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    format: str = Query("json", pattern="^(json|ndjson)$"),
     session: Session = Depends(get_session),
     current_user: User = Depends(get_current_user)  # ✅ Esto requiere importar User
 ):
-    """Obtiene el historial de eliminaciones (solo admin)"""
+    """
+    Obtiene el historial de eliminaciones (solo admin), del más reciente al más antiguo.
+    Sin `limit` ni `cursor` devuelve la lista completa (modo clásico); con ellos, una
+    página {items, next_cursor}. Con `format=ndjson` transmite las filas una por línea.
+    Las filas archivadas se consultan en /audit/archive.
+    """
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Solo administradores pueden ver el historial")
+
+    filters = history_filters(action, performed_by, target_id, since, until)
+    stmt = history_query(cursor, filters)
+
+    if format == "ndjson":
+        if limit:
+            stmt = stmt.limit(limit)
+        rows = session.execute(stmt.execution_options(yield_per=STREAM_BATCH_SIZE)).mappings()
+        return StreamingResponse(iter_ndjson(rows), media_type="application/x-ndjson")
+
+    if limit is None and cursor is None:
+        return [dict(row) for row in session.execute(stmt).mappings()]
+
+    page_size = limit or DEFAULT_PAGE_SIZE
+    rows = [dict(row) for row in session.execute(stmt.limit(page_size + 1)).mappings()]
+    return JSONResponse(jsonable_encoder(build_page(rows, page_size, HISTORY_SORT, "performed_at")))
+
+
+def history_filters(action, performed_by, target_id, since, until) -> dict:
+    """Filtros del historial; los mismos se aplican en SQL y sobre el archivo"""
+    return {
+        "action": action,
+        "performed_by": performed_by,
+        "target_id": target_id,
+        "since": naive_utc(since),
+        "until": naive_utc(until),
+    }
+
+
+def history_query(cursor: Optional[str], filters: dict):
+    """SELECT del historial con filtros y cursor (compartido con el modo async)"""
+    after = decode_cursor(cursor, HISTORY_SORT) if cursor else None
+    condition, order_by = keyset_clauses(AuditLog.performed_at, AuditLog.id, True, after)
+
+    stmt = select(*archive.AUDIT_COLUMNS).order_by(*order_by)
+    if filters["action"] is not None:
+        stmt = stmt.where(AuditLog.action == filters["action"])
+    if filters["performed_by"] is not None:
+        stmt = stmt.where(AuditLog.performed_by == filters["performed_by"])
+    if filters["target_id"] is not None:
+        stmt = stmt.where(AuditLog.target_id == filters["target_id"])
+    if filters["since"] is not None:
+        stmt = stmt.where(AuditLog.performed_at >= filters["since"])
+    if filters["until"] is not None:
+        stmt = stmt.where(AuditLog.performed_at < filters["until"])
+    if condition is not None:
+        stmt = stmt.where(condition)
+    return stmt
+
+
+# ======================================================
+# 🗄️ Historial archivado (archivos mensuales comprimidos)
+# ======================================================
+@router.get("/archive")
+def get_audit_archive(
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    action: Optional[str] = None,
+    performed_by: Optional[str] = None,
+    target_id: Optional[int] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    format: str = Query("json", pattern="^(json|ndjson)$"),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Consulta las filas ya archivadas con los mismos filtros y cursor que /audit/history.
+    Sólo se descomprimen los meses que pueden contener resultados.
+    """
     if current_user.role != "admin":
         raise HTTPException(status_code=403, detail="Solo administradores pueden ver el historial")
-    
-    logs = session.exec(select(AuditLog).order_by(AuditLog.performed_at.desc())).all()
-    return logs
\ No newline at end of file
+
+    filters = history_filters(action, performed_by, target_id, since, until)
+    after = decode_cursor(cursor, HISTORY_SORT) if cursor else None
+
+    if format == "ndjson":
+        return StreamingResponse(
+            iter_ndjson(archive.iter_archive(filters, after)), media_type="application/x-ndjson"
+        )
+
+    rows = list(islice(archive.iter_archive(filters, after), limit + 1))
+    return JSONResponse(jsonable_encoder(build_page(rows, limit, HISTORY_SORT, "performed_at")))
+
+
+@router.post("/archive")
+def run_audit_archive(
+    older_than_days: int = Query(config.AUDIT_RETENTION_DAYS, ge=0),
+    session: Session = Depends(get_session),
+    current_user: User = Depends(get_current_user)
+):
+    """Mueve al archivo las filas más antiguas que `older_than_days` (solo admin)"""
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Solo administradores pueden archivar el historial")
+
+    # Hace commit por cada lote archivado: una corrida interrumpida no pierde lo ya movido
+    return archive.archive(session, datetime.utcnow() - timedelta(days=older_than_days))
+
+
+@router.get("/archive/partitions")
+def list_audit_partitions(current_user: User = Depends(get_current_user)):
+    """Meses archivados y tamaño de cada archivo (solo admin)"""
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Solo administradores pueden ver el historial")
+    return [
+        {"month": month, "bytes": os.path.getsize(path)}
+        for month, path in archive.partitions()
+    ]
+
+
+# ======================================================
+# 📈 Métricas del escritor del historial
+# ======================================================
+@router.get("/writer-stats")
+def get_writer_stats(current_user: User = Depends(get_current_user)):
+    """Modo, profundidad de la cola y latencia de escritura por lote (solo admin)"""
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Solo administradores pueden ver estas métricas")
+    return audit_writer.stats()
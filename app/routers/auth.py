@@ -1,20 +1,21 @@
 from fastapi import APIRouter, Request, Form, Depends
 from fastapi.responses import HTMLResponse, RedirectResponse
-from fastapi.templating import Jinja2Templates
 from sqlmodel import Session, select
 from ..database import get_session
 from ..models import User
+from ..templating import StaticPage
 import hashlib
 
 router = APIRouter(tags=["auth"])
-templates = Jinja2Templates(directory="app/templates")
+login_page = StaticPage("login.html")
+login_failed_page = StaticPage("login.html", error="Usuario o contraseña incorrectos.")
 
 def hash_password(password: str) -> str:
     return hashlib.sha256(password.encode()).hexdigest()
 
 @router.get("/login", response_class=HTMLResponse)
-def login_page(request: Request):
-    return templates.TemplateResponse("login.html", {"request": request})
+def login_form(request: Request):
+    return login_page.response(request)
 
 @router.post("/login")
 def login_action(
@@ -25,10 +26,7 @@ def login_action(
 ):
     user = session.exec(select(User).where(User.username == username)).first()
     if not user or user.hashed_password != hash_password(password):
-        return templates.TemplateResponse(
-            "login.html", 
-            {"request": request, "error": "Usuario o contraseña incorrectos."}
-        )
+        return login_failed_page.response(request)
     
     # Por ahora solo redirigimos, luego agregaremos sesiones reales
     response = RedirectResponse(url="/", status_code=303)
@@ -1,29 +1,37 @@
 from fastapi import APIRouter, Depends, HTTPException, Form, Cookie, Response, Request
 from fastapi.responses import HTMLResponse, RedirectResponse
-from fastapi.templating import Jinja2Templates
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from ..database import get_session
+from ..database import get_async_session, get_session
 from ..models import User
-from ..auth import verify_password
+from ..auth import verify_and_update_async
+from ..ratelimit import login_limiter
+from ..templating import StaticPage
+from .. import config, sessions
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 
-# Ruta donde estarán las plantillas HTML
-templates = Jinja2Templates(directory="app/templates")
+# Páginas de login pre-renderizadas (no dependen de la petición): bytes con ETag
+login_page = StaticPage("login.html")
+login_failed_page = StaticPage("login.html", error="Usuario o contraseña incorrectos")
+login_throttled_page = StaticPage(
+    "login.html", error="Demasiados intentos fallidos. Intente de nuevo más tarde."
+)
 
 # ------------------------------------------------------------
 # 🧩 Mostrar formulario de login (para navegador)
 # ------------------------------------------------------------
 @router.get("/login", response_class=HTMLResponse)
 def login_form(request: Request):
-    """Renderiza el formulario de inicio de sesión (HTML)."""
-    return templates.TemplateResponse("login.html", {"request": request})
+    """Formulario de inicio de sesión (HTML, pre-renderizado; 304 con If-None-Match)."""
+    return login_page.response(request)
 
 # ------------------------------------------------------------
 # 🔐 Procesar login (compatible con Swagger y navegador)
 # ------------------------------------------------------------
 @router.post("/login")
-def login(
+async def login(
     request: Request,
     response: Response,
     username: str = Form(...),
@@ -31,19 +39,42 @@ def login(
     db: Session = Depends(get_session)
 ):
     """Procesa el inicio de sesión (HTML o Swagger)."""
-    user = db.query(User).filter(User.username == username).first()
+    # Demasiados fallos de esta IP o para este usuario: 429 sin tocar la base ni bcrypt
+    ip = request.client.host if request.client else "?"
+    retry_after = login_limiter.attempt(ip, username)
+    if retry_after:
+        return login_throttled_page.response(
+            request, status_code=429, headers={"Retry-After": str(retry_after)}
+        )
+
+    user = await run_in_threadpool(lambda: db.query(User).filter(User.username == username).first())
 
-    if not user or not verify_password(password, user.hashed_password):
+    # bcrypt corre en el pool dedicado: este endpoint no ocupa un hilo mientras tanto
+    try:
+        valid, new_hash = await verify_and_update_async(password, user.hashed_password) if user else (False, None)
+    except HTTPException:
+        login_limiter.cancel(ip, username)  # 503: el pool está lleno, el intento no se verificó
+        raise
+    if not valid:
         # Si es desde navegador, mostrar error en la página HTML
-        return templates.TemplateResponse(
-            "login.html",
-            {"request": request, "error": "Usuario o contraseña incorrectos"},
-            status_code=401
-        )
+        return login_failed_page.response(request, status_code=401)
+    login_limiter.succeeded(ip, username)
 
-    # Guardamos cookie (válido para navegador y Swagger)
+    # Rehash transparente si cambió BCRYPT_ROUNDS
+    if new_hash:
+        user.hashed_password = new_hash
+        await run_in_threadpool(db.commit)
+        sessions.invalidate_user(user.id)
+
+    # Guardamos cookie con el token firmado (válido para navegador y Swagger)
     response = RedirectResponse(url="/", status_code=303)
-    response.set_cookie(key="user", value=username, httponly=True)
+    response.set_cookie(
+        key=config.SESSION_COOKIE,
+        value=sessions.create_session_token(user),
+        max_age=config.SESSION_TTL_SECONDS,
+        httponly=True,
+        samesite="lax"
+    )
     return response
 
 # ------------------------------------------------------------
@@ -52,19 +83,62 @@ def login(
 @router.get("/logout")
 def logout(response: Response):
     """Cierra sesión eliminando cookie"""
-    response.delete_cookie(key="user")
+    response.delete_cookie(key=config.SESSION_COOKIE)
     return {"message": "Sesión cerrada"}
 
 # ------------------------------------------------------------
 # 👤 Obtener usuario actual (para roles)
 # ------------------------------------------------------------
-def get_current_user(user: str = Cookie(None), db: Session = Depends(get_session)):
-    """Devuelve el usuario autenticado basado en la cookie"""
-    if not user:
-        raise HTTPException(status_code=401, detail="No autenticado")
+def get_current_user(
+    session: str = Cookie(None, alias=config.SESSION_COOKIE),
+    db: Session = Depends(get_session)
+):
+    """Devuelve el usuario autenticado a partir del token firmado de la cookie"""
+    user_id = _session_user_id(session)
 
-    db_user = db.query(User).filter(User.username == user).first()
+    # Caché en memoria: la base sólo se consulta en un fallo de caché
+    db_user = sessions.resolve_user(user_id, db)
     if not db_user:
         raise HTTPException(status_code=401, detail="Usuario no encontrado")
 
     return db_user
+
+async def get_current_user_async(
+    session: str = Cookie(None, alias=config.SESSION_COOKIE),
+    db: AsyncSession = Depends(get_async_session)
+):
+    """Igual que get_current_user, para los endpoints con AsyncSession"""
+    user_id = _session_user_id(session)
+
+    db_user = await db.run_sync(lambda sync_db: sessions.resolve_user(user_id, sync_db))
+    if not db_user:
+        raise HTTPException(status_code=401, detail="Usuario no encontrado")
+
+    return db_user
+
+def _session_user_id(token: str) -> int:
+    """Valida la cookie de sesión y devuelve el id del usuario"""
+    if not token:
+        raise HTTPException(status_code=401, detail="No autenticado")
+
+    payload = sessions.decode_session_token(token)
+    if payload is None:
+        raise HTTPException(status_code=401, detail="Sesión inválida o expirada")
+    return int(payload["sub"])
+
+# ------------------------------------------------------------
+# 📈 Estadísticas de la caché de sesiones (solo admin)
+# ------------------------------------------------------------
+@router.get("/cache-stats")
+def get_cache_stats(current_user: User = Depends(get_current_user)):
+    """Aciertos y fallos de la caché de usuarios autenticados"""
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Solo administradores pueden ver estas métricas")
+    return sessions.user_cache.stats()
+
+@router.get("/login-stats")
+def get_login_stats(current_user: User = Depends(get_current_user)):
+    """Intentos fallidos y rechazos del límite de login de este proceso"""
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Solo administradores pueden ver estas métricas")
+    return login_limiter.stats()
@@ -0,0 +1,13 @@
+from fastapi import APIRouter, Query, Request
+from typing import Optional
+from .. import images
+
+router = APIRouter(tags=["images"])
+
+# ======================================================
+# 🖼️ Imágenes y miniaturas (mismo endpoint en modo sync y async, no usa la base)
+# ======================================================
+@router.get("/images/{key}")
+def get_image(key: str, request: Request, size: Optional[int] = Query(None, ge=1)):
+    """Original o miniatura (`size`) con ETag, Range y caché de larga duración"""
+    return images.image_response(request, key, size)
@@ -0,0 +1,20 @@
+import secrets
+
+from fastapi import APIRouter, Header, HTTPException
+from fastapi.responses import PlainTextResponse
+from typing import Optional
+from .. import config, metrics
+
+router = APIRouter(tags=["metrics"])
+
+# ======================================================
+# 📈 Métricas en formato Prometheus (mismo endpoint en modo sync y async)
+# ======================================================
+@router.get("/metrics", response_class=PlainTextResponse)
+def get_metrics(authorization: Optional[str] = Header(None)):
+    """Latencias por ruta, consultas por petición, pool de conexiones y bcrypt"""
+    if config.METRICS_TOKEN:
+        expected = f"Bearer {config.METRICS_TOKEN}"
+        if not authorization or not secrets.compare_digest(authorization, expected):
+            raise HTTPException(status_code=401, detail="Token de métricas inválido")
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
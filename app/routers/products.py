@@ -1,13 +1,45 @@
-from fastapi import APIRouter, Depends, HTTPException, Form
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, Depends, HTTPException, Form, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from sqlalchemy import delete, select, update
 from sqlalchemy.orm import Session
-from typing import List
+from types import SimpleNamespace
+from typing import List, Optional
+from .. import batch, bulk, counters, images, search
+from ..audit_writer import audit_writer
 from ..database import get_session
-from ..models import Product, User, AuditLog
+from ..models import Product, ProductBatchDelete, ProductBatchUpdate, User
+from ..pagination import build_page, decode_cursor, iter_ndjson, keyset_clauses, parse_sort
+from ..response_cache import products_changed, response_cache
+from ..serialization import json_response
 from ..routers.auth_router import get_current_user  # para saber quién está logueado
 
 router = APIRouter(prefix="/products", tags=["products"])
 
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 1000
+STREAM_BATCH_SIZE = 1000
+
+# Columnas en el mismo orden que el modelo Product (misma salida que response_model)
+PRODUCT_COLUMNS = [
+    Product.id,
+    Product.name,
+    Product.description,
+    Product.price,
+    Product.quantity,
+    Product.image_path,
+    Product.created_at,
+    Product.owner_id,
+]
+
+# Órdenes permitidos para la paginación por keyset (siempre desempata por id)
+SORT_COLUMNS = {
+    "id": Product.id,
+    "created_at": Product.created_at,
+    "price": Product.price,
+    "name": Product.name,
+}
+
 # ======================================================
 # 🟢 Crear producto (solo admin)
 # ======================================================
@@ -31,6 +63,11 @@ def create_product(
         owner_id=current_user.id
     )
     db.add(product)
+    counters.product_created(db, product)
+    audit_writer.record(
+        db, "CREATE_PRODUCT", product.id, product.name, current_user.username, price=price, quantity=quantity
+    )
+    products_changed(db, current_user.id)
     db.commit()
     db.refresh(product)
     return {"message": "Producto creado exitosamente", "product": product}
@@ -40,9 +77,145 @@ def create_product(
 # 🔵 Listar todos los productos (clientes y admin)
 # ======================================================
 @router.get("/list", response_model=List[Product])
-def list_products(db: Session = Depends(get_session)):
-    products = db.query(Product).all()
-    return products
+def list_products(
+    request: Request,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    sort: str = "id",
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    in_stock: Optional[bool] = None,
+    owner_id: Optional[int] = None,
+    name_prefix: Optional[str] = None,
+    format: str = Query("json", pattern="^(json|ndjson)$"),
+    db: Session = Depends(get_session)
+):
+    """
+    Lista productos. Sin `limit` ni `cursor` devuelve la lista completa (modo clásico).
+    Con `limit`/`cursor` devuelve una página {items, next_cursor} paginada por keyset.
+    Con `format=ndjson` transmite las filas una por línea sin armar la lista en memoria.
+    Las respuestas JSON se sirven desde la caché de respuestas (ETag / 304).
+    """
+    stmt, sort_field = list_query(cursor, sort, min_price, max_price, in_stock, owner_id, name_prefix)
+
+    if format == "ndjson":
+        if limit:
+            stmt = stmt.limit(limit)
+        rows = db.execute(stmt.execution_options(yield_per=STREAM_BATCH_SIZE)).mappings()
+        return StreamingResponse(iter_ndjson(rows), media_type="application/x-ndjson")
+
+    cached = response_cache.lookup(request, ["products"])
+    if cached.response is not None:
+        return cached.response
+
+    if limit is None and cursor is None:
+        return cached.store([dict(row) for row in db.execute(stmt).mappings()])
+
+    page_size = limit or DEFAULT_PAGE_SIZE
+    rows = [dict(row) for row in db.execute(stmt.limit(page_size + 1)).mappings()]
+    return cached.store(build_page(rows, page_size, sort, sort_field))
+
+
+def list_query(cursor, sort, min_price, max_price, in_stock, owner_id, name_prefix):
+    """SELECT del catálogo con filtros, orden y cursor (compartido con el modo async)"""
+    sort_field, sort_column, descending = parse_sort(sort, SORT_COLUMNS)
+    after = decode_cursor(cursor, sort) if cursor else None
+    condition, order_by = keyset_clauses(sort_column, Product.id, descending, after)
+
+    stmt = select(*PRODUCT_COLUMNS).order_by(*order_by)
+    for clause in _product_filters(min_price, max_price, in_stock, owner_id, name_prefix):
+        stmt = stmt.where(clause)
+    if condition is not None:
+        stmt = stmt.where(condition)
+    return stmt, sort_field
+
+
+def _product_filters(min_price, max_price, in_stock, owner_id, name_prefix):
+    """Filtros del catálogo que se resuelven en SQL"""
+    if min_price is not None:
+        yield Product.price >= min_price
+    if max_price is not None:
+        yield Product.price <= max_price
+    if in_stock is True:
+        yield Product.quantity > 0
+    elif in_stock is False:
+        yield Product.quantity <= 0
+    if owner_id is not None:
+        yield Product.owner_id == owner_id
+    if name_prefix:
+        escaped = name_prefix.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        yield Product.name.like(f"{escaped}%", escape="\\")
+
+
+# ======================================================
+# 🔎 Búsqueda de texto completo (nombre y descripción)
+# ======================================================
+@router.get("/search")
+def search_products(
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    sort: str = Query("rank", pattern="^(rank|id)$"),
+    highlight: bool = True,
+    db: Session = Depends(get_session)
+):
+    """
+    Busca productos por palabras (la última, o las que terminan en `*`, como prefijo).
+    Con FTS5 ordena por relevancia (bm25, `score`) o con `sort=id` por id (más rápido
+    para términos muy comunes); `snippet` resalta las coincidencias con <mark>.
+    Pagina por keyset con `next_cursor`.
+    """
+    stmt, sort, sort_field = search.page_query(q, cursor, highlight, sort, db.get_bind().dialect)
+    rows = [dict(row) for row in db.execute(stmt.limit(limit + 1)).mappings()]
+    return json_response(build_page(rows, limit, sort, sort_field))
+
+
+# ======================================================
+# 📥 Importación masiva CSV / NDJSON (solo admin)
+# ======================================================
+@router.post("/import")
+async def import_products(
+    request: Request,
+    format: str = Query("csv", pattern="^(csv|ndjson)$"),
+    db: Session = Depends(get_session),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Importa productos desde el cuerpo de la petición (CSV con encabezado o NDJSON),
+    leído en streaming. Devuelve insertados y errores por número de línea.
+    """
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Solo los administradores pueden importar productos")
+
+    # Parseo e inserción en un hilo de trabajo; el cuerpo se lee de a bloques
+    def run_import():
+        report = bulk.import_products(db, bulk.body_lines(request.stream()), format, current_user.id)
+        audit_writer.record(
+            db, "IMPORT_PRODUCTS", 0, f"importación {format}", current_user.username,
+            inserted=report["inserted"], error_count=report["error_count"]
+        )
+        products_changed(db, current_user.id)
+        db.commit()
+        return report
+
+    return await run_in_threadpool(run_import)
+
+
+# ======================================================
+# 📤 Exportación masiva CSV / NDJSON
+# ======================================================
+@router.get("/export")
+def export_products(
+    format: str = Query("csv", pattern="^(csv|ndjson)$"),
+    db: Session = Depends(get_session)
+):
+    """Exporta todo el catálogo en streaming (mismo formato que acepta /products/import)"""
+    rows = db.execute(bulk.export_query().execution_options(yield_per=STREAM_BATCH_SIZE)).mappings()
+    return StreamingResponse(
+        bulk.export_lines(rows, format),
+        media_type="text/csv" if format == "csv" else "application/x-ndjson",
+        headers={"Content-Disposition": f'attachment; filename="productos.{format}"'}
+    )
 
 
 # ======================================================
@@ -65,6 +238,7 @@ def update_product(
     if not product:
         raise HTTPException(status_code=404, detail="Producto no encontrado")
 
+    before = counters.product_snapshot(product)
     if name:
         product.name = name
     if description:
@@ -74,11 +248,149 @@ def update_product(
     if quantity is not None:
         product.quantity = quantity
 
+    counters.product_updated(db, before, product)
+    changes = {"name": name or None, "description": description or None, "price": price, "quantity": quantity}
+    audit_writer.record(
+        db, "UPDATE_PRODUCT", product.id, product.name, current_user.username,
+        changes=", ".join(f"{field}={value}" for field, value in changes.items() if value is not None)
+    )
+    products_changed(db, product.owner_id, product.id)
     db.commit()
     db.refresh(product)
     return {"message": "Producto actualizado correctamente", "product": product}
 
 
+# ======================================================
+# 🧰 Actualización y borrado masivos (solo admin)
+# ======================================================
+BATCH_COLUMNS = (Product.id, Product.name, Product.price, Product.quantity, Product.owner_id)
+
+
+@router.post("/batch/update")
+def batch_update_products(
+    order: ProductBatchUpdate,
+    db: Session = Depends(get_session),
+    current_user: User = Depends(get_current_user)
+):
+    """Aplica los mismos cambios a una lista de ids o a los productos del filtro"""
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Solo los administradores pueden actualizar productos")
+    return update_products_batch(db, order, current_user)
+
+
+@router.post("/batch/delete")
+def batch_delete_products(
+    order: ProductBatchDelete,
+    db: Session = Depends(get_session),
+    current_user: User = Depends(get_current_user)
+):
+    """Elimina una lista de ids o los productos del filtro (con historial)"""
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Solo los administradores pueden eliminar productos")
+    return delete_products_batch(db, order, current_user)
+
+
+def _batch_filters(order: ProductBatchDelete):
+    return list(_product_filters(**order.filter.model_dump())) if order.filter else []
+
+
+def update_products_batch(session: Session, order: ProductBatchUpdate, current_user: User):
+    values = order.changes.model_dump(exclude_none=True)
+    if not values:
+        raise HTTPException(status_code=400, detail="No hay cambios para aplicar")
+    if "owner_id" in values and session.get(User, values["owner_id"]) is None:
+        raise HTTPException(status_code=404, detail="Usuario dueño no encontrado")
+    changes = ", ".join(f"{field}={value}" for field, value in values.items())
+
+    def apply(session: Session, rows):
+        session.execute(
+            update(Product)
+            .where(Product.id.in_([row.id for row in rows]))
+            .values(**values)
+            .execution_options(synchronize_session=False)
+        )
+        after = [SimpleNamespace(**{**row._asdict(), **values}) for row in rows]
+        counters.products_bulk_changed(session, rows, after)
+        audit_writer.record_many(
+            session, "UPDATE_PRODUCT", current_user.username,
+            ((row.id, row.name, {"changes": changes}) for row in rows)
+        )
+        for row in rows:
+            products_changed(session, row.owner_id, row.id)
+        if "owner_id" in values:
+            products_changed(session, values["owner_id"])
+
+    return batch.run(
+        session, columns=BATCH_COLUMNS, ids=order.ids, where=_batch_filters(order),
+        status="updated", apply=apply, dry_run=order.dry_run,
+    )
+
+
+def delete_products_batch(session: Session, order: ProductBatchDelete, current_user: User):
+    def apply(session: Session, rows):
+        session.execute(
+            delete(Product)
+            .where(Product.id.in_([row.id for row in rows]))
+            .execution_options(synchronize_session=False)
+        )
+        counters.products_bulk_changed(session, rows, [])
+        audit_writer.record_many(
+            session, "DELETE_PRODUCT", current_user.username,
+            ((row.id, row.name, {"price": row.price, "quantity": row.quantity}) for row in rows)
+        )
+        for row in rows:
+            products_changed(session, row.owner_id, row.id)
+
+    return batch.run(
+        session, columns=BATCH_COLUMNS, ids=order.ids, where=_batch_filters(order),
+        status="deleted", apply=apply, dry_run=order.dry_run,
+    )
+
+
+# ======================================================
+# 🖼️ Subir imagen del producto (solo admin)
+# ======================================================
+@router.post("/{product_id}/image")
+async def upload_product_image(
+    product_id: int,
+    request: Request,
+    db: Session = Depends(get_session),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Multipart con el archivo en el campo `file`, leído en streaming y guardado por
+    hash de contenido (la misma imagen se guarda una sola vez). Las miniaturas se
+    generan en segundo plano.
+    """
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Solo los administradores pueden actualizar productos")
+    if await run_in_threadpool(db.get, Product, product_id) is None:
+        raise HTTPException(status_code=404, detail="Producto no encontrado")
+
+    upload = await images.receive_upload(request)
+
+    def attach():
+        product = db.get(Product, product_id)
+        if product is None:
+            raise HTTPException(status_code=404, detail="Producto no encontrado")
+        product.image_path = upload["key"]
+        audit_writer.record(
+            db, "UPDATE_PRODUCT", product.id, product.name, current_user.username,
+            changes=f"image_path={upload['key']}"
+        )
+        products_changed(db, product.owner_id, product.id)
+        db.commit()
+
+    await run_in_threadpool(attach)
+    images.thumbnailer.submit(upload["key"])
+    return {
+        "message": "Imagen guardada",
+        "image": images.describe(upload["key"]),
+        "size": upload["size"],
+        "deduplicated": upload["deduplicated"],
+    }
+
+
 # ======================================================
 # 🔴 Eliminar producto (solo admin) - CON HISTORIAL
 # ======================================================
@@ -95,17 +407,15 @@ def delete_product(
     if not product:
         raise HTTPException(status_code=404, detail="Producto no encontrado")
 
-    # 🔥 REGISTRAR EN HISTORIAL ANTES de eliminar
-    audit_log = AuditLog(
-        action="DELETE_PRODUCT",
-        target_id=product_id,
-        target_name=product.name,
-        performed_by=current_user.username,
-        details=f"Producto '{product.name}' (Precio: ${product.price}, Cantidad: {product.quantity}) eliminado por {current_user.username}"
+    # 🔥 REGISTRAR EN HISTORIAL ANTES de eliminar (se escribe al hacer commit)
+    audit_writer.record(
+        db, "DELETE_PRODUCT", product_id, product.name, current_user.username,
+        price=product.price, quantity=product.quantity
     )
-    db.add(audit_log)
-    
+
     db.delete(product)
+    counters.product_deleted(db, product)
+    products_changed(db, product.owner_id, product_id)
     db.commit()
     return {"message": f"Producto '{product.name}' eliminado exitosamente"}
 
@@ -115,19 +425,24 @@ def delete_product(
 @router.get("/{product_id}/owner")
 def get_product_owner(
     product_id: int,
+    request: Request,
     db: Session = Depends(get_session)
 ):
     """Obtiene información del usuario dueño de un producto"""
+    cached = response_cache.lookup(request, [f"product:{product_id}"])
+    if cached.response is not None:
+        return cached.response
+
     product = db.query(Product).filter(Product.id == product_id).first()
     if not product:
         raise HTTPException(status_code=404, detail="Producto no encontrado")
     
     if not product.owner:
-        return {"message": "Este producto no tiene dueño asignado"}
+        return cached.store({"message": "Este producto no tiene dueño asignado"}, [f"user:{product.owner_id}"])
     
-    return {
+    return cached.store({
         "owner_id": product.owner.id,
         "owner_username": product.owner.username,
         "owner_role": product.owner.role,
         "owner_created_at": product.owner.created_at
-    }
\ No newline at end of file
+    }, [f"user:{product.owner_id}"])
\ No newline at end of file
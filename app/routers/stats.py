@@ -1,14 +1,23 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlmodel import Session, select, func
-from typing import List, Dict, Any
+from datetime import datetime, timedelta
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlmodel import Session
+from typing import Optional
+from .. import aggregates, config, counters, history
+from ..bus import invalidation_bus
 from ..database import get_session
-from ..models import User, Product
+from ..models import User
+from ..pagination import naive_utc
+from ..response_cache import response_cache
+from ..stock import reservation_sweeper
 from .auth_router import get_current_user
 
 router = APIRouter(prefix="/stats", tags=["stats"])
 
 @router.get("/user-products")
 def get_user_products_stats(
+    limit: Optional[int] = Query(None, ge=1),
+    offset: int = Query(0, ge=0),
+    products_per_user: Optional[int] = Query(None, ge=0),
     session: Session = Depends(get_session),
     current_user: User = Depends(get_current_user)
 ):
@@ -19,37 +28,23 @@ def get_user_products_stats(
             detail="Solo los administradores pueden ver las estadísticas"
         )
     
-    users = session.exec(select(User)).all()
-    
-    stats = []
-    for user in users:
-        product_count = len(user.products)
-        total_value = sum(product.price * product.quantity for product in user.products)
-        
-        stats.append({
-            "user_id": user.id,
-            "username": user.username,
-            "role": user.role,
-            "product_count": product_count,
-            "total_inventory_value": total_value,
-            "products": [
-                {
-                    "id": product.id,
-                    "name": product.name,
-                    "price": product.price,
-                    "quantity": product.quantity,
-                    "total_value": product.price * product.quantity
-                } for product in user.products
-            ]
-        })
-    
-    # Ordenar por mayor cantidad de productos
-    stats.sort(key=lambda x: x["product_count"], reverse=True)
+    return user_products_report(session, limit, offset, products_per_user)
+
+def user_products_report(session: Session, limit: Optional[int], offset: int, products_per_user: Optional[int]):
+    """Arma la respuesta de /stats/user-products (compartida con el modo async)"""
+    # Conteos y sumas por usuario leídos de los contadores materializados
+    stats = counters.user_product_summaries(session, limit=limit, offset=offset)
+    products = aggregates.products_by_owner(
+        session, [stat["user_id"] for stat in stats], per_owner=products_per_user
+    )
+    for stat in stats:
+        stat["products"] = products[stat["user_id"]]
     
+    totals = counters.owned_totals(session)
     return {
-        "total_users": len(users),
-        "total_products": sum(stat["product_count"] for stat in stats),
-        "total_inventory_value": sum(stat["total_inventory_value"] for stat in stats),
+        "total_users": counters.general_stats(session)["users"]["total"],
+        "total_products": totals["total_products"],
+        "total_inventory_value": totals["total_inventory_value"],
         "users_stats": stats
     }
 
@@ -65,41 +60,121 @@ def get_general_stats(
             detail="Solo los administradores pueden ver las estadísticas"
         )
     
-    # Contar usuarios por rol
-    users = session.exec(select(User)).all()
-    admin_count = sum(1 for user in users if user.role == "admin")
-    client_count = sum(1 for user in users if user.role == "client")
-    
-    # Estadísticas de productos
-    products = session.exec(select(Product)).all()
-    total_products = len(products)
-    products_with_owner = sum(1 for product in products if product.owner_id is not None)
-    
-    # Producto más caro
-    most_expensive = max(products, key=lambda x: x.price) if products else None
-    # Producto con mayor cantidad
-    most_quantity = max(products, key=lambda x: x.quantity) if products else None
-    
+    # Lectura O(1) de la fila materializada (ver app/counters.py)
+    return counters.general_stats(session)
+
+@router.get("/response-cache")
+def get_response_cache_stats(current_user: User = Depends(get_current_user)):
+    """Aciertos, 304 y bytes ahorrados por la caché de respuestas (solo admin)"""
+    if current_user.role != "admin":
+        raise HTTPException(
+            status_code=403,
+            detail="Solo los administradores pueden ver las estadísticas"
+        )
+
+    return response_cache.stats()
+
+@router.get("/reservations")
+def get_reservation_stats(current_user: User = Depends(get_current_user)):
+    """Ejecuciones del barrendero y reservas vencidas devueltas al stock (solo admin)"""
+    if current_user.role != "admin":
+        raise HTTPException(
+            status_code=403,
+            detail="Solo los administradores pueden ver las estadísticas"
+        )
+
+    return reservation_sweeper.stats()
+
+@router.get("/invalidation-bus")
+def get_invalidation_bus_stats(current_user: User = Depends(get_current_user)):
+    """Eventos publicados y recibidos por este worker en el bus de invalidación (solo admin)"""
+    if current_user.role != "admin":
+        raise HTTPException(
+            status_code=403,
+            detail="Solo los administradores pueden ver las estadísticas"
+        )
+
+    return invalidation_bus.stats()
+
+@router.get("/history")
+def get_history_stats(
+    session: Session = Depends(get_session),
+    current_user: User = Depends(get_current_user)
+):
+    """Consolidación del historial de precios y stock: eventos pendientes y ejecuciones (solo admin)"""
+    if current_user.role != "admin":
+        raise HTTPException(
+            status_code=403,
+            detail="Solo los administradores pueden ver las estadísticas"
+        )
+
+    return {**history.rollup_worker.stats(), **history.pending_events(session)}
+
+# Rango por defecto (hasta ahora) según la granularidad
+DEFAULT_SPAN = {"hour": timedelta(hours=48), "day": timedelta(days=90)}
+
+@router.get("/timeseries")
+def get_timeseries(
+    metric: str = Query(..., pattern="^(price|stock|value)$"),
+    granularity: str = Query("hour", pattern="^(hour|day)$"),
+    product_id: Optional[int] = Query(None, ge=1),
+    owner_id: Optional[int] = Query(None, ge=1),
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    fill: bool = True,
+    session: Session = Depends(get_session),
+    current_user: User = Depends(get_current_user)
+):
+    """Serie de precio o stock de un producto, o de valor de inventario de un dueño
+    (todo el inventario sin owner_id), leída de los buckets consolidados (solo admin)"""
+    if current_user.role != "admin":
+        raise HTTPException(
+            status_code=403,
+            detail="Solo los administradores pueden ver las estadísticas"
+        )
+
+    return timeseries_report(session, metric, granularity, product_id, owner_id, start, end, fill)
+
+def timeseries_report(
+    session: Session,
+    metric: str,
+    granularity: str,
+    product_id: Optional[int],
+    owner_id: Optional[int],
+    start: Optional[datetime],
+    end: Optional[datetime],
+    fill: bool,
+):
+    """Arma la respuesta de /stats/timeseries (compartida con el modo async)"""
+    if metric == "value":
+        if product_id is not None:
+            raise HTTPException(status_code=400, detail="product_id sólo aplica a las métricas price y stock")
+        series = {"owner_id": owner_id}
+        key = owner_id or history.TOTAL_OWNER
+    else:
+        if product_id is None or owner_id is not None:
+            raise HTTPException(status_code=400, detail="Las métricas price y stock requieren product_id (y no owner_id)")
+        series = {"product_id": product_id}
+        key = product_id
+
+    # Buckets completos: se incluyen el que contiene `start` y el que contiene `end`
+    step = history.STEPS[granularity]
+    end = history.bucket_start(naive_utc(end) or datetime.utcnow(), granularity) + step
+    start = history.bucket_start(naive_utc(start), granularity) if start else end - DEFAULT_SPAN[granularity]
+    if start >= end:
+        raise HTTPException(status_code=400, detail="start debe ser anterior a end")
+    if (end - start) // step > config.TIMESERIES_MAX_POINTS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"El rango supera {config.TIMESERIES_MAX_POINTS} buckets: acótelo o use granularity=day"
+        )
+
     return {
-        "users": {
-            "total": len(users),
-            "admins": admin_count,
-            "clients": client_count
-        },
-        "products": {
-            "total": total_products,
-            "with_owner": products_with_owner,
-            "without_owner": total_products - products_with_owner,
-            "total_inventory_value": sum(product.price * product.quantity for product in products),
-            "most_expensive_product": {
-                "id": most_expensive.id if most_expensive else None,
-                "name": most_expensive.name if most_expensive else None,
-                "price": most_expensive.price if most_expensive else None
-            } if most_expensive else None,
-            "most_stocked_product": {
-                "id": most_quantity.id if most_quantity else None,
-                "name": most_quantity.name if most_quantity else None,
-                "quantity": most_quantity.quantity if most_quantity else None
-            } if most_quantity else None
-        }
-    }
\ No newline at end of file
+        "metric": metric,
+        "granularity": granularity,
+        **series,
+        "start": start,
+        "end": end,
+        "rolled_up_to": history.rolled_up_to(session),
+        "points": history.series(session, metric, granularity, key, start, end, fill),
+    }
@@ -0,0 +1,85 @@
+from fastapi import APIRouter, Depends, Form
+from sqlalchemy.orm import Session
+from .. import stock
+from ..database import get_session
+from ..models import Checkout, User
+from .auth_router import get_current_user
+
+# Compras y reservas (cualquier usuario logueado); el stock se descuenta con un
+# UPDATE atómico, ver app/stock.py
+router = APIRouter(tags=["stock"])
+
+# ======================================================
+# 🛒 Comprar un producto
+# ======================================================
+@router.post("/products/{product_id}/purchase")
+def purchase_product(
+    product_id: int,
+    quantity: int = Form(1, ge=1),
+    db: Session = Depends(get_session),
+    current_user: User = Depends(get_current_user)
+):
+    purchase = stock.purchase(db, product_id, quantity, current_user)
+    db.commit()
+    return {"message": "Compra realizada", "purchase": purchase}
+
+
+# ======================================================
+# 🧾 Checkout: varios productos en una sola transacción
+# ======================================================
+@router.post("/checkout")
+def checkout(
+    order: Checkout,
+    db: Session = Depends(get_session),
+    current_user: User = Depends(get_current_user)
+):
+    purchases = stock.checkout(db, order.items, current_user)
+    db.commit()
+    return {"message": f"Checkout realizado: {len(purchases)} productos", "purchases": purchases}
+
+
+# ======================================================
+# ⏳ Reservas (el stock queda apartado hasta confirmar, liberar o vencer)
+# ======================================================
+@router.post("/products/{product_id}/reserve")
+def reserve_product(
+    product_id: int,
+    quantity: int = Form(1, ge=1),
+    db: Session = Depends(get_session),
+    current_user: User = Depends(get_current_user)
+):
+    reservation = stock.reserve(db, product_id, quantity, current_user)
+    db.commit()
+    return {"message": "Reserva creada", "reservation": reservation}
+
+
+@router.get("/reservations")
+def list_reservations(
+    db: Session = Depends(get_session),
+    current_user: User = Depends(get_current_user)
+):
+    """Reservas vigentes del usuario logueado"""
+    return stock.list_reservations(db, current_user)
+
+
+@router.post("/reservations/{reservation_id}/confirm")
+def confirm_reservation(
+    reservation_id: int,
+    db: Session = Depends(get_session),
+    current_user: User = Depends(get_current_user)
+):
+    purchase = stock.confirm(db, reservation_id, current_user)
+    db.commit()
+    return {"message": "Compra realizada", "purchase": purchase}
+
+
+@router.delete("/reservations/{reservation_id}")
+def release_reservation(
+    reservation_id: int,
+    db: Session = Depends(get_session),
+    current_user: User = Depends(get_current_user)
+):
+    """Libera la reserva (propia, o cualquiera si es admin) y devuelve el stock"""
+    released = stock.release(db, reservation_id, current_user)
+    db.commit()
+    return {"message": "Reserva liberada", "reservation": released}
@@ -1,15 +1,25 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from sqlalchemy import delete, update
 from sqlmodel import Session, select
-from typing import List
+from types import SimpleNamespace
+from typing import Any, List
+from .. import batch, counters, sessions
+from ..audit_writer import audit_writer
+from ..response_cache import products_changed, response_cache, user_changed
+from ..serialization import FastJSONResponse, fast_enabled, model_columns
 from ..database import get_session
-from ..models import User, AuditLog
+from ..models import User, UserBatchDelete, UserBatchUpdate
 from ..auth import hash_password
 from .auth_router import get_current_user  # Para verificar rol
 from ..models import Product  # ✅ Agregar Product a los imports si no está
+from .products import PRODUCT_COLUMNS
 
 
 router = APIRouter(prefix="/users", tags=["users"])
 
+# Columnas de User en el orden del modelo (misma salida que response_model)
+USER_COLUMNS = model_columns(User)
+
 # Crear usuario
 @router.post("/", response_model=User)
 def create_user(user: User, session: Session = Depends(get_session)):
@@ -21,6 +31,9 @@ def create_user(user: User, session: Session = Depends(get_session)):
     # Hashear la contraseña antes de guardar
     user.hashed_password = hash_password(user.hashed_password)
     session.add(user)
+    counters.user_created(session, user)
+    session.flush()  # id para el historial
+    audit_writer.record(session, "CREATE_USER", user.id, user.username, user.username, role=user.role)
     session.commit()
     session.refresh(user)
     return user
@@ -38,6 +51,9 @@ def list_users(
             detail="No tienes permisos para ver esta lista."
         )
 
+    if fast_enabled():
+        return FastJSONResponse([dict(row) for row in session.execute(select(*USER_COLUMNS)).mappings()])
+
     users = session.exec(select(User)).all()
     return users
 
@@ -58,6 +74,7 @@ def update_user(
         raise HTTPException(status_code=404, detail="Usuario no encontrado")
 
     # Actualizamos los campos básicos
+    counters.user_role_changed(session, user.role, updated_user.role)
     user.username = updated_user.username
     user.role = updated_user.role
 
@@ -67,7 +84,10 @@ def update_user(
         user.hashed_password = hash_password(updated_user.hashed_password)
 
     session.add(user)
+    audit_writer.record(session, "UPDATE_USER", user_id, user.username, current_user.username, role=user.role)
+    user_changed(session, user_id)
     session.commit()
+    sessions.invalidate_user(user_id)
     session.refresh(user)
     return user
 
@@ -86,30 +106,165 @@ def delete_user(
     if not user:
         raise HTTPException(status_code=404, detail="Usuario no encontrado")
 
-    # 🔥 REGISTRAR EN HISTORIAL ANTES de eliminar
-    audit_log = AuditLog(
-        action="DELETE_USER",
-        target_id=user_id,
-        target_name=user.username,
-        performed_by=current_user.username,
-        details=f"Usuario '{user.username}' (Rol: {user.role}) eliminado por {current_user.username}"
-    )
-    session.add(audit_log)
-    
+    # 🔥 REGISTRAR EN HISTORIAL ANTES de eliminar (se escribe al hacer commit)
+    audit_writer.record(session, "DELETE_USER", user_id, user.username, current_user.username, role=user.role)
+
+    release_products(session, [user_id])
     session.delete(user)
+    counters.user_deleted(session, user)
+    user_changed(session, user_id)
+    products_changed(session, owner_id=user_id)  # sus productos quedan sin dueño
     session.commit()
+    sessions.invalidate_user(user_id)
     return {"message": f"Usuario '{user.username}' eliminado correctamente"}
 
+RELEASED_COLUMNS = (Product.id, Product.price, Product.quantity)
+
+
+def release_products(session: Session, user_ids: List[int]) -> List[Any]:
+    """Deja sin dueño los productos de usuarios que se van a eliminar, con contadores.
+    Es lo mismo que hace el borrado por ORM (owner_id = NULL), pero explícito: un
+    UPDATE ... RETURNING por usuario devuelve exactamente las filas que cambiaron"""
+    rows = []
+    for user_id in user_ids:
+        released = session.execute(
+            update(Product)
+            .where(Product.owner_id == user_id)
+            .values(owner_id=None)
+            .returning(*RELEASED_COLUMNS)
+            .execution_options(synchronize_session=False)
+        ).all()
+        rows.extend(SimpleNamespace(**row._asdict(), owner_id=user_id) for row in released)
+    counters.products_released(session, user_ids, rows)
+    return rows
+
+# ======================================================
+# 🧰 Cambio de rol y borrado masivos (solo admin)
+# ======================================================
+ROLES = {"admin", "client"}
+BATCH_COLUMNS = (User.id, User.username, User.role)
+
+
+@router.post("/batch/update")
+def batch_update_users(
+    order: UserBatchUpdate,
+    session: Session = Depends(get_session),
+    current_user: User = Depends(get_current_user)
+):
+    """Asigna el mismo rol a una lista de ids o a los usuarios del filtro"""
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="No tienes permisos para editar usuarios")
+    return update_users_batch(session, order, current_user)
+
+
+@router.post("/batch/delete")
+def batch_delete_users(
+    order: UserBatchDelete,
+    session: Session = Depends(get_session),
+    current_user: User = Depends(get_current_user)
+):
+    """Elimina una lista de ids o los usuarios del filtro (con historial)"""
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="No tienes permisos para eliminar usuarios")
+    return delete_users_batch(session, order, current_user)
+
+
+def _batch_filters(order: UserBatchDelete):
+    criteria = order.filter
+    if criteria is None:
+        return []
+    clauses = []
+    if criteria.role is not None:
+        clauses.append(User.role == criteria.role)
+    if criteria.created_before is not None:
+        clauses.append(User.created_at < criteria.created_before)
+    if criteria.username_prefix:
+        escaped = criteria.username_prefix.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        clauses.append(User.username.like(f"{escaped}%", escape="\\"))
+    return clauses
+
+
+def _skip_self(current_user: User):
+    # Un admin no se quita el rol ni se elimina a sí mismo en un lote
+    return lambda row: "skipped_self" if row.id == current_user.id else None
+
+
+def _invalidate(rows):
+    for row in rows:
+        sessions.invalidate_user(row.id)
+
+
+def update_users_batch(session: Session, order: UserBatchUpdate, current_user: User):
+    if order.role not in ROLES:
+        raise HTTPException(status_code=400, detail=f"Rol inválido. Opciones: {', '.join(sorted(ROLES))}")
+    skip_self = _skip_self(current_user)
+
+    def skip(row):
+        return skip_self(row) or ("unchanged" if row.role == order.role else None)
+
+    def apply(session: Session, rows):
+        session.execute(
+            update(User)
+            .where(User.id.in_([row.id for row in rows]))
+            .values(role=order.role)
+            .execution_options(synchronize_session=False)
+        )
+        counters.users_bulk_changed(session, [row.role for row in rows], [order.role] * len(rows))
+        audit_writer.record_many(
+            session, "UPDATE_USER", current_user.username,
+            ((row.id, row.username, {"role": order.role}) for row in rows)
+        )
+        for row in rows:
+            user_changed(session, row.id)
+
+    return batch.run(
+        session, columns=BATCH_COLUMNS, ids=order.ids, where=_batch_filters(order),
+        status="updated", apply=apply, dry_run=order.dry_run, skip=skip, committed=_invalidate,
+    )
+
+
+def delete_users_batch(session: Session, order: UserBatchDelete, current_user: User):
+    def apply(session: Session, rows):
+        # El DELETE de Core no pasa por el ORM: los productos se liberan antes, en el
+        # mismo lote, para no dejar owner_id apuntando a usuarios borrados
+        release_products(session, [row.id for row in rows])
+        session.execute(
+            delete(User)
+            .where(User.id.in_([row.id for row in rows]))
+            .execution_options(synchronize_session=False)
+        )
+        counters.users_bulk_changed(session, [row.role for row in rows])
+        audit_writer.record_many(
+            session, "DELETE_USER", current_user.username,
+            ((row.id, row.username, {"role": row.role}) for row in rows)
+        )
+        for row in rows:
+            user_changed(session, row.id)
+            products_changed(session, owner_id=row.id)
+
+    return batch.run(
+        session, columns=BATCH_COLUMNS, ids=order.ids, where=_batch_filters(order),
+        status="deleted", apply=apply, dry_run=order.dry_run, skip=_skip_self(current_user),
+        committed=_invalidate,
+    )
+
     # ======================================================
 # 👤 VER PRODUCTOS DE UN USUARIO ESPECÍFICO
 # ======================================================
 @router.get("/{user_id}/products", response_model=List[Product])
 def get_user_products(
     user_id: int,
+    request: Request,
     session: Session = Depends(get_session),
     current_user: User = Depends(get_current_user)
 ):
     """Obtiene todos los productos de un usuario específico"""
+    # El permiso se resuelve sin la base: un acierto en caché no hace ninguna consulta
+    if current_user.role == "admin" or current_user.id == user_id:
+        cached = response_cache.lookup(request, [f"user:{user_id}", f"owner:{user_id}"])
+        if cached.response is not None:
+            return cached.response
+
     # Verificar que el usuario existe
     user = session.get(User, user_id)
     if not user:
@@ -122,4 +277,12 @@ def get_user_products(
             detail="No tienes permisos para ver productos de otros usuarios"
         )
     
-    return user.products  # ✅ Esto funciona gracias a la Relationship en el modelo
\ No newline at end of file
+    if fast_enabled():
+        return cached.store(user_products_rows(session, user_id))
+    return cached.store(user.products)  # ✅ Esto funciona gracias a la Relationship en el modelo
+
+
+def user_products_rows(session: Session, user_id: int):
+    """Productos del usuario como filas, en el mismo orden que la relación (modo fast)"""
+    stmt = select(*PRODUCT_COLUMNS).where(Product.owner_id == user_id).order_by(Product.id)
+    return [dict(row) for row in session.execute(stmt).mappings()]
\ No newline at end of file
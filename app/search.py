@@ -0,0 +1,218 @@
+"""
+Búsqueda de texto completo en productos con un índice FTS5 de SQLite.
+
+`product_fts` es una tabla virtual de contenido externo (los textos viven en
+`product`) que se mantiene sincronizada con triggers de INSERT/UPDATE/DELETE, así
+cualquier escritura (handlers, importación masiva, SQL directo) queda indexada.
+
+Reconstruir o verificar el índice:
+    python -m app.search reindex
+    python -m app.search check
+"""
+import re
+import sqlite3
+import sys
+from functools import lru_cache
+from typing import Any, List, Optional, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import column, func, literal_column, select, table, text, tuple_
+from sqlalchemy.engine import Connection, Engine
+
+from .models import Product
+from .pagination import decode_cursor
+
+FTS_TABLE = "product_fts"
+# Peso de cada columna en bm25: una coincidencia en el nombre vale más
+NAME_WEIGHT = 10.0
+DESCRIPTION_WEIGHT = 1.0
+SNIPPET_TOKENS = 12
+MAX_TERMS = 10
+
+FTS_DDL = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        name, description,
+        content='product', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2',
+        prefix='2 3 4'
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS product_fts_insert AFTER INSERT ON product BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, name, description) VALUES (new.id, new.name, new.description);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS product_fts_delete AFTER DELETE ON product BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, description)
+        VALUES ('delete', old.id, old.name, old.description);
+    END""",
+    # Sólo si cambia el texto: actualizar precio o stock no toca el índice
+    f"""CREATE TRIGGER IF NOT EXISTS product_fts_update AFTER UPDATE OF name, description ON product BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, description)
+        VALUES ('delete', old.id, old.name, old.description);
+        INSERT INTO {FTS_TABLE}(rowid, name, description) VALUES (new.id, new.name, new.description);
+    END""",
+]
+
+_fts = table(FTS_TABLE, column("rowid"))
+_fts_ref = literal_column(FTS_TABLE)
+
+# Mismas columnas que /products/list, más el puntaje y el fragmento resaltado
+RESULT_COLUMNS = [
+    Product.id,
+    Product.name,
+    Product.description,
+    Product.price,
+    Product.quantity,
+    Product.image_path,
+    Product.created_at,
+    Product.owner_id,
+]
+
+
+# ======================================================
+# 🛠️ Creación y mantenimiento del índice
+# ======================================================
+@lru_cache(maxsize=None)
+def _sqlite_has_fts5() -> bool:
+    try:
+        sqlite3.connect(":memory:").execute("CREATE VIRTUAL TABLE t USING fts5(x)")
+        return True
+    except sqlite3.OperationalError:
+        return False
+
+
+def fts_supported(dialect) -> bool:
+    """FTS5 sólo existe en SQLite (y sólo si fue compilado con la extensión)"""
+    return dialect.name == "sqlite" and _sqlite_has_fts5()
+
+
+def ensure_index(bind: Engine):
+    """Crea la tabla FTS y sus triggers si faltan; la primera vez indexa lo existente"""
+    if not fts_supported(bind.dialect):
+        return
+    with bind.begin() as conn:
+        exists = conn.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"), {"name": FTS_TABLE}
+        ).first()
+        for statement in FTS_DDL:
+            conn.exec_driver_sql(statement)
+        if not exists:
+            reindex(conn)
+
+
+def reindex(conn: Connection):
+    """Reconstruye el índice completo a partir de la tabla product"""
+    conn.exec_driver_sql(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+
+
+def check(conn: Connection):
+    """Lanza un error si el índice no coincide con la tabla product"""
+    conn.exec_driver_sql(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rank) VALUES ('integrity-check', 1)")
+
+
+# ======================================================
+# 🔎 Consultas
+# ======================================================
+def match_expression(q: str) -> Tuple[str, List[str]]:
+    """
+    Convierte el texto del usuario en una consulta FTS5 segura: cada palabra va entre
+    comillas (sin operadores inyectados) y todas deben aparecer. Una palabra con `*`
+    al final, y siempre la última, se buscan como prefijo ("lap" encuentra "laptop").
+    """
+    words = re.findall(r"\w+\*?", q)[:MAX_TERMS]
+    if not words:
+        raise HTTPException(status_code=400, detail="La búsqueda debe contener al menos una palabra")
+
+    terms, parts = [], []
+    for position, word in enumerate(words):
+        prefix = word.endswith("*") or position == len(words) - 1
+        word = word.rstrip("*")
+        terms.append(word)
+        parts.append(f'"{word}"*' if prefix else f'"{word}"')
+    return " ".join(parts), terms
+
+
+def search_query(q: str, after: Optional[Tuple[Any, int]] = None, highlight: bool = True, by_rank: bool = True):
+    """
+    SELECT de coincidencias ordenado por relevancia (bm25, menor es mejor) y luego por
+    id, o sólo por id: sin bm25 el índice entrega las filas en orden y corta en LIMIT,
+    mientras que rankear un término muy común obliga a puntuar todas las coincidencias.
+    """
+    expression, _ = match_expression(q)
+    columns = [_fts.c.rowid.label("id")]
+    if by_rank:
+        columns.append(func.bm25(_fts_ref, NAME_WEIGHT, DESCRIPTION_WEIGHT).label("score"))
+    if highlight:
+        columns.append(
+            func.snippet(_fts_ref, -1, "<mark>", "</mark>", "…", SNIPPET_TOKENS).label("snippet")
+        )
+    matches = select(*columns).where(_fts_ref.match(expression)).subquery("matches")
+
+    stmt = select(*RESULT_COLUMNS, *[c for c in matches.c if c.name != "id"]).join_from(
+        matches, Product, Product.id == matches.c.id
+    )
+    if not by_rank:
+        if after is not None:
+            stmt = stmt.where(matches.c.id > after[1])
+        return stmt.order_by(matches.c.id)
+
+    if after is not None:
+        stmt = stmt.where(tuple_(matches.c.score, matches.c.id) > tuple_(*after))
+    return stmt.order_by(matches.c.score, matches.c.id)
+
+
+def page_query(q: str, cursor: Optional[str], highlight: bool, sort: str, dialect):
+    """Devuelve (SELECT, nombre del orden, campo del cursor) con FTS5 o, si no hay, con LIKE"""
+    if fts_supported(dialect) and sort == "rank":
+        after = decode_cursor(cursor, "rank") if cursor else None
+        return search_query(q, after, highlight), "rank", "score"
+    after = decode_cursor(cursor, "id") if cursor else None
+    if fts_supported(dialect):
+        return search_query(q, after, highlight, by_rank=False), "id", "id"
+    return like_query(q, after), "id", "id"
+
+
+def like_query(q: str, after: Optional[Tuple[Any, int]] = None):
+    """
+    Búsqueda sin índice (LIKE '%palabra%' en nombre o descripción), ordenada por id.
+    Se usa cuando la base no es SQLite/FTS5 y como referencia en el benchmark.
+    """
+    _, terms = match_expression(q)
+    stmt = select(*RESULT_COLUMNS).order_by(Product.id)
+    for term in terms:
+        pattern = f"%{term}%"
+        stmt = stmt.where(Product.name.like(pattern) | Product.description.like(pattern))
+    if after is not None:
+        stmt = stmt.where(Product.id > after[1])
+    return stmt
+
+
+# ======================================================
+# 🖥️ Consola
+# ======================================================
+def main(argv: List[str]) -> int:
+    from .database import engine, init_db
+
+    command = argv[0] if argv else "check"
+    if command not in ("reindex", "check"):
+        print("Uso: python -m app.search [reindex|check]")
+        return 2
+    if not fts_supported(engine.dialect):
+        print("La base de datos no soporta FTS5 (se usa la búsqueda con LIKE).")
+        return 1
+
+    init_db()
+    with engine.begin() as conn:
+        if command == "reindex":
+            reindex(conn)
+            print("Índice de búsqueda reconstruido.")
+            return 0
+        try:
+            check(conn)
+        except Exception as exc:
+            print(f"El índice no coincide con la tabla product: {exc}")
+            return 1
+    print("Índice de búsqueda consistente.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
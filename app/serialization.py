@@ -0,0 +1,87 @@
+"""
+Serialización JSON rápida para respuestas grandes (RESPONSE_SERIALIZER=fast).
+
+En el modo por defecto ("model") los listados devuelven instancias del modelo y
+FastAPI las valida y re-serializa campo por campo con response_model. En modo
+"fast" los handlers seleccionan sólo las columnas como filas (dict) y se codifican
+directamente a bytes. El JSON es el mismo (compacto, UTF-8 sin escapar, fechas en
+ISO 8601); sólo cambian detalles de formato sin efecto en el valor: las claves van
+siempre en el orden del modelo (desde instancias ORM el orden dependía del estado
+de la instancia) y, con orjson, los exponentes de floats muy chicos o muy grandes
+se escriben sin cero a la izquierda (1e-7 en lugar de 1e-07).
+
+Usa orjson si está instalado (dependencia opcional); si no, el json estándar.
+"""
+import json
+from datetime import datetime
+from typing import Any, List
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+from . import config
+
+try:
+    import orjson
+except ImportError:  # dependencia opcional
+    orjson = None
+
+SERIALIZERS = {"model", "fast"}
+if config.RESPONSE_SERIALIZER not in SERIALIZERS:
+    raise ValueError(
+        f"RESPONSE_SERIALIZER desconocido: {config.RESPONSE_SERIALIZER!r} "
+        f"(opciones: {', '.join(sorted(SERIALIZERS))})"
+    )
+
+
+def fast_enabled() -> bool:
+    return config.RESPONSE_SERIALIZER == "fast"
+
+
+def model_columns(model) -> List[Any]:
+    """Columnas de la tabla en el orden de los campos del modelo (sin relaciones)"""
+    return [getattr(model, name) for name in model.model_fields]
+
+
+def dumps(data: Any) -> bytes:
+    """Codifica dicts/listas de valores simples (y datetime) sin pasar por jsonable_encoder"""
+    if orjson is not None:
+        return orjson.dumps(data)
+    return dumps_std(data)
+
+
+def dumps_std(data: Any) -> bytes:
+    """Mismos bytes que JSONResponse(jsonable_encoder(data)).body, sin recorrer en Python"""
+    return json.dumps(
+        data, default=_default, ensure_ascii=False, allow_nan=False, separators=(",", ":")
+    ).encode("utf-8")
+
+
+def _default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, BaseModel):
+        return value.model_dump(mode="json")
+    raise TypeError(f"Tipo no serializable: {type(value).__name__}")
+
+
+def encode(data: Any) -> bytes:
+    """Cuerpo JSON de `data` (filas, o instancias de modelos en modo "model")"""
+    if fast_enabled():
+        return dumps(data)
+    return dumps_std(data)
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse que codifica con dumps() (sin jsonable_encoder ni response_model)"""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def json_response(data: Any) -> JSONResponse:
+    """Respuesta JSON de filas con el serializador configurado"""
+    if fast_enabled():
+        return FastJSONResponse(data)
+    return JSONResponse(jsonable_encoder(data))
@@ -0,0 +1,75 @@
+"""
+Punto de entrada de producción: uvicorn con varios procesos worker.
+
+    python -m app.server --workers 4 --host 0.0.0.0 --port 8000
+
+(o WORKERS/HOST/PORT en el entorno). Antes de lanzar los workers, el proceso
+principal:
+
+- usa DB_PROFILE=production si no se indicó otro (WAL: lectores y escritor de
+  distintos procesos no se bloquean entre sí);
+- genera una SECRET_KEY compartida si falta: con una clave aleatoria por proceso,
+  una sesión creada en un worker sería inválida en los demás;
+- activa el bus de invalidación entre procesos (INVALIDATION_BUS=db, ver app.bus);
+- crea el esquema bajo el lock de INIT_LOCK_FILE. Cada worker vuelve a tomar el lock
+  al arrancar y encuentra todo hecho.
+
+Las cachés, el historial en modo buffered y las métricas (/metrics, /stats/*) son
+por worker.
+
+    python -m app.server --profile-startup
+
+no levanta el servidor: mide el arranque en frío de un worker (import por módulo y
+fases del lifespan, ver app.startup).
+"""
+import argparse
+import logging
+import os
+import secrets
+import sys
+from typing import List
+
+logger = logging.getLogger("app.server")
+
+
+def main(argv: List[str]) -> int:
+    parser = argparse.ArgumentParser(description="Servidor de producción con varios workers")
+    parser.add_argument("--workers", type=int, default=int(os.getenv("WORKERS", "1")))
+    parser.add_argument("--host", default=os.getenv("HOST", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "8000")))
+    parser.add_argument("--log-level", default="info")
+    parser.add_argument("--profile-startup", action="store_true", help="mide el arranque de un worker y sale")
+    parser.add_argument("--top", type=int, default=20, help="módulos a mostrar con --profile-startup")
+    args = parser.parse_args(argv)
+    if args.workers < 1:
+        parser.error("--workers debe ser al menos 1")
+    if args.profile_startup:
+        from .startup import profile
+
+        return profile(args.top)
+
+    # Antes de importar app.config: los workers heredan este entorno
+    os.environ["WORKERS"] = str(args.workers)
+    os.environ.setdefault("DB_PROFILE", "production")
+    if args.workers > 1 and not os.getenv("SECRET_KEY"):
+        os.environ["SECRET_KEY"] = secrets.token_urlsafe(32)
+        logger.warning("SECRET_KEY no definida: se generó una para esta ejecución (las sesiones no sobreviven a un reinicio)")
+
+    import uvicorn
+
+    from .database import prepare_database
+
+    prepare_database()
+    uvicorn.run(
+        "app.main:app",
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        log_level=args.log_level,
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,59 @@
+import time
+from typing import Any, Dict, Optional
+
+from jose import JWTError, jwt
+from sqlalchemy.orm import Session
+
+from . import config
+from .cache import TTLCache
+from .models import User
+
+# ======================================================
+# 🎫 Token de sesión firmado + caché de usuarios
+# ======================================================
+# El token (JWT HS256) lleva id y rol del usuario; el usuario resuelto se guarda
+# en memoria para no consultar la base en cada petición autenticada.
+
+user_cache = TTLCache(config.USER_CACHE_SIZE, config.USER_CACHE_TTL_SECONDS)
+
+
+def create_session_token(user: User) -> str:
+    now = int(time.time())
+    payload = {
+        "sub": str(user.id),
+        "role": user.role,
+        "iat": now,
+        "exp": now + config.SESSION_TTL_SECONDS,
+    }
+    return jwt.encode(payload, config.SECRET_KEY, algorithm=config.SESSION_ALGORITHM)
+
+
+def decode_session_token(token: str) -> Optional[Dict[str, Any]]:
+    """Devuelve el payload si la firma y la expiración son válidas"""
+    try:
+        payload = jwt.decode(token, config.SECRET_KEY, algorithms=[config.SESSION_ALGORITHM])
+        int(payload["sub"])
+    except (JWTError, KeyError, ValueError):
+        return None
+    return payload
+
+
+def resolve_user(user_id: int, db: Session) -> Optional[User]:
+    """Usuario desde la caché; si no está, una sola consulta por clave primaria"""
+    cached = user_cache.get(user_id)
+    if cached is not None:
+        return cached
+
+    db_user = db.get(User, user_id)
+    if db_user is None:
+        return None
+
+    # Copia desacoplada de la sesión: se comparte entre peticiones de solo lectura
+    user = User(**db_user.model_dump())
+    user_cache.set(user_id, user)
+    return user
+
+
+def invalidate_user(user_id: int):
+    """Llamar después de modificar o eliminar un usuario"""
+    user_cache.invalidate(user_id)
@@ -0,0 +1,127 @@
+"""
+Fases del arranque (lifespan) con sus tiempos y perfil de arranque en frío.
+
+`python -m app.server --profile-startup` lanza un proceso nuevo con
+`python -X importtime` que importa app.main, ejecuta el arranque completo, atiende
+las primeras peticiones y se apaga. Después muestra:
+
+- los módulos con más tiempo propio de importación y el total por paquete;
+- el tiempo acumulado de cada módulo de la app (incluye lo que importa);
+- la duración de cada fase (import, schema, warmup, background, primeras
+  peticiones, shutdown).
+
+Usa el mismo entorno (DATABASE_URL, DB_MODE, LAZY_IMPORTS, ...) que el servidor.
+"""
+import asyncio
+import contextlib
+import json
+import os
+import re
+import subprocess
+import sys
+import time
+from typing import Dict, List, Tuple
+
+# fase -> milisegundos, del último arranque de este proceso
+timings: Dict[str, float] = {}
+
+MARKER = "STARTUP_TIMINGS "
+IMPORT_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \| \s*(\S+)$")
+
+
+@contextlib.contextmanager
+def phase(name: str):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[name] = (time.perf_counter() - started) * 1000
+
+
+def warm_up():
+    """Carga por adelantado lo que con LAZY_IMPORTS se importa al primer uso"""
+    from . import auth, templating
+
+    auth.get_pwd_context()
+    templating.warm_up()
+
+
+# ======================================================
+# 🔬 Perfil de arranque
+# ======================================================
+def _child():
+    """Proceso perfilado: import, arranque, primeras peticiones y apagado"""
+    with phase("import"):
+        from .main import app
+
+    async def run():
+        import httpx
+
+        async with app.router.lifespan_context(app):
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://startup") as client:
+                with phase("first_request /"):
+                    await client.get("/")
+                with phase("first_request /auth/login"):
+                    await client.get("/auth/login")
+
+    asyncio.run(run())
+    print(MARKER + json.dumps(timings), flush=True)
+
+
+def _parse_importtime(stderr: str) -> List[Tuple[str, int, int]]:
+    """(módulo, µs propios, µs acumulados) por línea de -X importtime"""
+    rows = []
+    for line in stderr.splitlines():
+        match = IMPORT_LINE.match(line)
+        if match:
+            rows.append((match.group(3), int(match.group(1)), int(match.group(2))))
+    return rows
+
+
+def profile(top: int = 20) -> int:
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    started = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "from app.startup import _child; _child()"],
+        cwd=root,
+        capture_output=True,
+        text=True,
+    )
+    wall = (time.perf_counter() - started) * 1000
+    phases = None
+    for line in proc.stdout.splitlines():
+        if line.startswith(MARKER):
+            phases = json.loads(line[len(MARKER):])
+    if proc.returncode != 0 or phases is None:
+        print(proc.stderr[-4000:], file=sys.stderr)
+        print("El proceso perfilado falló", file=sys.stderr)
+        return 1
+
+    imports = _parse_importtime(proc.stderr)
+    packages: Dict[str, int] = {}
+    for module, own, _ in imports:
+        package = module.split(".")[0]
+        packages[package] = packages.get(package, 0) + own
+
+    print(f"Proceso completo: {wall:.0f} ms (intérprete + import + arranque + apagado)\n")
+    print("Fases:")
+    for name, ms in phases.items():
+        print(f"  {name:<28} {ms:>9.1f} ms")
+
+    print(f"\nMódulos con más tiempo propio de importación (top {top}):")
+    for module, own, cumulative in sorted(imports, key=lambda row: row[1], reverse=True)[:top]:
+        print(f"  {module:<45} {own / 1000:>8.1f} ms  (acumulado {cumulative / 1000:.1f} ms)")
+
+    print(f"\nTiempo propio por paquete (top {top}):")
+    for package, own in sorted(packages.items(), key=lambda item: item[1], reverse=True)[:top]:
+        print(f"  {package:<28} {own / 1000:>9.1f} ms")
+
+    print("\nMódulos de la app (acumulado, incluye sus dependencias):")
+    for module, _, cumulative in sorted(
+        (row for row in imports if row[0] == "app" or row[0].startswith("app.")),
+        key=lambda row: row[2],
+        reverse=True,
+    ):
+        print(f"  {module:<45} {cumulative / 1000:>8.1f} ms")
+    return 0
@@ -0,0 +1,256 @@
+"""
+Compras y reservas de stock sin pérdidas de actualización.
+
+Product.quantity nunca se lee para decidir y después se escribe: cada cambio es un
+único UPDATE condicional que la base aplica de forma atómica,
+
+    UPDATE product SET quantity = quantity - :n WHERE id = :id AND quantity >= :n
+    RETURNING id, name, price, quantity, owner_id
+
+y si no afecta ninguna fila no había stock suficiente (409). Con compradores
+concurrentes sobre el mismo producto SQLite serializa las escrituras y PostgreSQL
+vuelve a evaluar el WHERE tras el bloqueo de la fila: nunca se vende de más.
+
+- Compra directa: descuenta y registra PURCHASE en el historial.
+- Reserva: descuenta y crea una Reservation con vencimiento; al confirmarla se
+  registra la compra, al liberarla (o al vencer) la cantidad vuelve al stock.
+- Checkout: varios productos en una sola transacción; si alguno no alcanza no se
+  descuenta ninguno. Los renglones se aplican en orden de id (mismo orden de
+  bloqueos en todas las transacciones, sin interbloqueos en PostgreSQL).
+
+Las funciones reciben una Session síncrona y no hacen commit (las rutas async las
+llaman con run_sync). Un hilo de fondo (ReservationSweeper) devuelve al stock las
+reservas vencidas cada STOCK_SWEEP_INTERVAL_SECONDS.
+"""
+import logging
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional
+
+from fastapi import HTTPException
+from sqlalchemy import delete, select, update
+from sqlalchemy.engine import Engine, Row
+from sqlalchemy.orm import Session
+
+from . import config, counters
+from .audit_writer import audit_writer
+from .models import Product, Reservation, User
+from .response_cache import products_changed
+
+logger = logging.getLogger(__name__)
+
+STOCK_COLUMNS = (Product.id, Product.name, Product.price, Product.quantity, Product.owner_id)
+RESERVATION_COLUMNS = (Reservation.id, Reservation.product_id, Reservation.quantity)
+
+
+# ======================================================
+# ⚛️ Cambios atómicos de stock
+# ======================================================
+def take(session: Session, product_id: int, quantity: int) -> Row:
+    """Descuenta `quantity` si hay stock suficiente; devuelve la fila ya actualizada"""
+    row = session.execute(
+        update(Product)
+        .where(Product.id == product_id, Product.quantity >= quantity)
+        .values(quantity=Product.quantity - quantity)
+        .returning(*STOCK_COLUMNS)
+        .execution_options(synchronize_session=False)
+    ).first()
+    if row is None:
+        available = session.execute(select(Product.quantity).where(Product.id == product_id)).scalar()
+        if available is None:
+            raise HTTPException(status_code=404, detail=f"Producto {product_id} no encontrado")
+        raise HTTPException(
+            status_code=409,
+            detail=f"Stock insuficiente para el producto {product_id}: disponibles {available}, pedidos {quantity}",
+        )
+    counters.stock_changed(session, row, -quantity)
+    products_changed(session, row.owner_id, row.id)
+    return row
+
+
+def put_back(session: Session, product_id: int, quantity: int) -> Optional[Row]:
+    """Devuelve `quantity` al stock (None si el producto ya no existe)"""
+    row = session.execute(
+        update(Product)
+        .where(Product.id == product_id)
+        .values(quantity=Product.quantity + quantity)
+        .returning(*STOCK_COLUMNS)
+        .execution_options(synchronize_session=False)
+    ).first()
+    if row is not None:
+        counters.stock_changed(session, row, quantity)
+        products_changed(session, row.owner_id, row.id)
+    return row
+
+
+def _record_purchase(session: Session, row, quantity: int, user: User) -> Dict[str, Any]:
+    # SQLite devuelve en RETURNING los REAL enteros sin convertir (10 en vez de 10.0)
+    price = float(row.price)
+    audit_writer.record(
+        session, "PURCHASE", row.id, row.name, user.username,
+        quantity=quantity, price=price, remaining=row.quantity
+    )
+    return {"product_id": row.id, "name": row.name, "quantity": quantity, "price": price, "remaining": row.quantity}
+
+
+# ======================================================
+# 🛒 Compras
+# ======================================================
+def purchase(session: Session, product_id: int, quantity: int, user: User) -> Dict[str, Any]:
+    return _record_purchase(session, take(session, product_id, quantity), quantity, user)
+
+
+def checkout(session: Session, items: Iterable[Any], user: User) -> List[Dict[str, Any]]:
+    """Compra todos los renglones o ninguno (el llamador hace commit sólo si no hubo error)"""
+    wanted: Dict[int, int] = defaultdict(int)
+    for item in items:
+        wanted[item.product_id] += item.quantity
+    return [purchase(session, product_id, wanted[product_id], user) for product_id in sorted(wanted)]
+
+
+# ======================================================
+# ⏳ Reservas
+# ======================================================
+def reserve(
+    session: Session, product_id: int, quantity: int, user: User,
+    ttl_seconds: int = config.STOCK_RESERVATION_TTL_SECONDS,
+) -> Dict[str, Any]:
+    row = take(session, product_id, quantity)
+    now = datetime.utcnow()
+    reservation = Reservation(
+        product_id=product_id,
+        user_id=user.id,
+        quantity=quantity,
+        created_at=now,
+        expires_at=now + timedelta(seconds=ttl_seconds),
+    )
+    session.add(reservation)
+    session.flush()
+    return {**reservation.model_dump(), "remaining": row.quantity}
+
+
+def list_reservations(session: Session, user: User) -> List[Dict[str, Any]]:
+    rows = session.execute(
+        select(Reservation)
+        .where(Reservation.user_id == user.id, Reservation.expires_at > datetime.utcnow())
+        .order_by(Reservation.expires_at)
+    ).scalars()
+    return [reservation.model_dump() for reservation in rows]
+
+
+def _claim(session: Session, reservation_id: int, user: User, only_active: bool) -> Row:
+    """Borra la reserva y devuelve sus datos; DELETE ... RETURNING hace que entre
+    confirmar, liberar y el barrendero sólo uno pueda quedarse con ella"""
+    stmt = delete(Reservation).where(Reservation.id == reservation_id)
+    if user.role != "admin":
+        stmt = stmt.where(Reservation.user_id == user.id)
+    if only_active:
+        stmt = stmt.where(Reservation.expires_at > datetime.utcnow())
+    row = session.execute(
+        stmt.returning(*RESERVATION_COLUMNS).execution_options(synchronize_session=False)
+    ).first()
+    if row is None:
+        raise HTTPException(status_code=404, detail="Reserva no encontrada o vencida")
+    return row
+
+
+def confirm(session: Session, reservation_id: int, user: User) -> Dict[str, Any]:
+    """Convierte la reserva en compra (el stock ya estaba descontado)"""
+    reservation = _claim(session, reservation_id, user, only_active=True)
+    product = session.execute(
+        select(*STOCK_COLUMNS).where(Product.id == reservation.product_id)
+    ).first()
+    if product is None:
+        raise HTTPException(status_code=404, detail=f"Producto {reservation.product_id} no encontrado")
+    return _record_purchase(session, product, reservation.quantity, user)
+
+
+def release(session: Session, reservation_id: int, user: User) -> Dict[str, Any]:
+    reservation = _claim(session, reservation_id, user, only_active=False)
+    row = put_back(session, reservation.product_id, reservation.quantity)
+    return {
+        "reservation_id": reservation.id,
+        "product_id": reservation.product_id,
+        "quantity": reservation.quantity,
+        "remaining": row.quantity if row is not None else None,
+    }
+
+
+def expire_reservations(session: Session, now: Optional[datetime] = None) -> int:
+    """Libera todas las reservas vencidas; devuelve cuántas (no hace commit)"""
+    expired = session.execute(
+        delete(Reservation)
+        .where(Reservation.expires_at <= (now or datetime.utcnow()))
+        .returning(*RESERVATION_COLUMNS)
+        .execution_options(synchronize_session=False)
+    ).all()
+    per_product: Dict[int, int] = defaultdict(int)
+    for row in expired:
+        per_product[row.product_id] += row.quantity
+    for product_id in sorted(per_product):
+        put_back(session, product_id, per_product[product_id])
+    return len(expired)
+
+
+# ======================================================
+# 🧹 Barrendero de reservas vencidas (hilo de fondo)
+# ======================================================
+class ReservationSweeper:
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = threading.Event()
+        # Métricas
+        self.runs = 0
+        self.released = 0
+        self.errors = 0
+
+    def start(self, bind: Engine):
+        if self.interval <= 0 or self._thread is not None:
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, args=(bind,), name="reservation-sweeper", daemon=True)
+        self._thread.start()
+
+    def _run(self, bind: Engine):
+        while not self._stopping.wait(self.interval):
+            self.sweep(bind)
+
+    def sweep(self, bind: Engine) -> int:
+        started = time.perf_counter()
+        try:
+            with Session(bind) as session:
+                released = expire_reservations(session)
+                session.commit()
+        except Exception:
+            self.errors += 1
+            logger.exception("No se pudieron liberar las reservas vencidas")
+            return 0
+        self.runs += 1
+        self.released += released
+        if released:
+            logger.info(
+                "%d reservas vencidas liberadas en %.1f ms", released, (time.perf_counter() - started) * 1000
+            )
+        return released
+
+    def stop(self, timeout: Optional[float] = None):
+        thread, self._thread = self._thread, None
+        if thread is None:
+            return
+        self._stopping.set()
+        thread.join(timeout)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "interval_seconds": self.interval,
+            "running": self._thread is not None,
+            "runs": self.runs,
+            "released": self.released,
+            "errors": self.errors,
+        }
+
+
+reservation_sweeper = ReservationSweeper(config.STOCK_SWEEP_INTERVAL_SECONDS)
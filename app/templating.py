@@ -0,0 +1,101 @@
+"""
+Plantillas HTML (Jinja2) compiladas una sola vez y páginas estáticas pre-renderizadas.
+
+El entorno guarda el bytecode de cada plantilla compilada en disco
+(FileSystemBytecodeCache, en TEMPLATE_CACHE_DIR): un proceso nuevo lo carga en lugar
+de volver a compilar. En memoria Jinja2 conserva las plantillas ya cargadas; con
+TEMPLATE_AUTO_RELOAD desactivado (por defecto fuera del perfil dev) tampoco revisa
+la fecha del archivo en cada uso.
+
+Las páginas que no dependen de la petición (el login anónimo y sus variantes con
+error) son `StaticPage`: se renderizan al primer uso (o en el arranque con
+LAZY_IMPORTS=0, ver `warm_up`) y se sirven como bytes con ETag; If-None-Match
+coincidente responde 304. Jinja2 se importa recién entonces.
+"""
+import hashlib
+import os
+import threading
+from typing import TYPE_CHECKING, Any, Dict, List, Optional
+
+from fastapi import Request, Response
+
+from . import config
+
+if TYPE_CHECKING:
+    from jinja2 import BytecodeCache, Environment, Template
+
+# Relativo al paquete: no depende del directorio desde el que se lanza el servidor
+TEMPLATE_DIR = os.path.join(os.path.dirname(__file__), "templates")
+
+_environment: Optional["Environment"] = None
+_environment_lock = threading.Lock()
+_pages: List["StaticPage"] = []
+
+
+def _bytecode_cache() -> Optional["BytecodeCache"]:
+    from jinja2 import FileSystemBytecodeCache
+
+    if config.TEMPLATE_CACHE_DIR == "off":
+        return None
+    if config.TEMPLATE_CACHE_DIR:
+        os.makedirs(config.TEMPLATE_CACHE_DIR, exist_ok=True)
+        return FileSystemBytecodeCache(config.TEMPLATE_CACHE_DIR)
+    return FileSystemBytecodeCache()
+
+
+def get_environment() -> "Environment":
+    global _environment
+    if _environment is None:
+        with _environment_lock:
+            if _environment is None:
+                from jinja2 import Environment, FileSystemLoader
+
+                _environment = Environment(
+                    loader=FileSystemLoader(TEMPLATE_DIR),
+                    autoescape=True,
+                    bytecode_cache=_bytecode_cache(),
+                    auto_reload=config.TEMPLATE_AUTO_RELOAD,
+                )
+    return _environment
+
+
+def warm_up():
+    """Carga todas las plantillas y pre-renderiza las páginas estáticas"""
+    environment = get_environment()
+    for name in environment.list_templates():
+        environment.get_template(name)
+    for page in _pages:
+        page._ensure_rendered()
+
+
+class StaticPage:
+    """Plantilla con contexto fijo, renderizada al primer uso y servida como bytes"""
+
+    def __init__(self, name: str, **context: Any):
+        self.name = name
+        self.context = context
+        self._template: Optional["Template"] = None
+        self._lock = threading.Lock()
+        self.body = b""
+        self.etag = ""
+        _pages.append(self)
+
+    def _ensure_rendered(self):
+        template = self._template
+        if template is not None and (not config.TEMPLATE_AUTO_RELOAD or template.is_up_to_date):
+            return
+        with self._lock:
+            template = get_environment().get_template(self.name)
+            if template is self._template:
+                return
+            body = template.render(**self.context).encode()
+            self.body, self.etag = body, '"' + hashlib.blake2b(body, digest_size=12).hexdigest() + '"'
+            self._template = template
+
+    def response(self, request: Request, status_code: int = 200, headers: Optional[Dict[str, str]] = None) -> Response:
+        self._ensure_rendered()
+        headers = {"ETag": self.etag, "Cache-Control": "no-cache", **(headers or {})}
+        if_none_match = request.headers.get("if-none-match")
+        if status_code == 200 and if_none_match and self.etag in (tag.strip() for tag in if_none_match.split(",")):
+            return Response(status_code=304, headers=headers)
+        return Response(content=self.body, status_code=status_code, media_type="text/html", headers=headers)
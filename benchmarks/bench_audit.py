@@ -0,0 +1,49 @@
+"""
+Benchmark de borrados masivos según el modo de escritura del historial (AUDIT_MODE).
+
+Uso:
+    python -m benchmarks.bench_audit --deletes 2000
+"""
+import argparse
+import statistics
+import time
+
+from app.audit_writer import MODES, audit_writer
+from .common import bench_client, percentile, seed_products, seed_users
+
+
+def run_mode(mode: str, deletes: int):
+    audit_writer.mode = mode
+    with bench_client(as_admin=True) as (client, path):
+        seed_users(path, 1)
+        seed_products(path, deletes, owners=1)
+        before = audit_writer.stats()
+        samples = []
+        started = time.perf_counter()
+        for product_id in range(1, deletes + 1):
+            start = time.perf_counter()
+            response = client.delete(f"/products/{product_id}")
+            samples.append((time.perf_counter() - start) * 1000)
+            assert response.status_code == 200, response.text
+        audit_writer.flush()
+        total = time.perf_counter() - started
+        after = audit_writer.stats()
+    batches = after["batches"] - before["batches"]
+    flush_ms = after["avg_flush_ms"] * after["batches"] - before["avg_flush_ms"] * before["batches"]
+    return deletes / total, statistics.median(samples), percentile(samples, 99), batches, flush_ms / max(batches, 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--deletes", type=int, default=2000)
+    parser.add_argument("--modes", nargs="+", default=sorted(MODES), choices=sorted(MODES))
+    args = parser.parse_args()
+
+    print(f"{'modo':>12} | {'borrados/s':>10} | {'p50':>8} | {'p99':>8} | lotes | flush prom.")
+    for mode in args.modes:
+        rate, p50, p99, batches, flush_ms = run_mode(mode, args.deletes)
+        print(f"{mode:>12} | {rate:>10.0f} | {p50:>5.2f} ms | {p99:>5.2f} ms | {batches:>5} | {flush_ms:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
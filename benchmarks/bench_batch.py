@@ -0,0 +1,55 @@
+"""
+Benchmark de las operaciones masivas: N peticiones de a un id (PUT/DELETE
+/products/{id}) contra una sola petición por lotes (POST /products/batch/...).
+
+Uso:
+    python -m benchmarks.bench_batch --items 1000 5000
+"""
+import argparse
+import time
+
+from .common import bench_client, seed_products, seed_users
+
+
+def run(items: int):
+    with bench_client(as_admin=True) as (client, path):
+        seed_users(path, 10)
+        seed_products(path, items * 4, owners=10)
+        first, second = list(range(1, items + 1)), list(range(items + 1, 2 * items + 1))
+        timings = {}
+
+        start = time.perf_counter()
+        for product_id in first:
+            assert client.put(f"/products/{product_id}", data={"price": 1.5}).status_code == 200
+        timings["update uno a uno"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        response = client.post("/products/batch/update", json={"ids": second, "changes": {"price": 1.5}})
+        timings["update por lotes"] = time.perf_counter() - start
+        assert response.json()["counts"] == {"updated": items}, response.json()
+
+        start = time.perf_counter()
+        for product_id in first:
+            assert client.delete(f"/products/{product_id}").status_code == 200
+        timings["delete uno a uno"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        response = client.post("/products/batch/delete", json={"ids": second})
+        timings["delete por lotes"] = time.perf_counter() - start
+        assert response.json()["counts"] == {"deleted": items}, response.json()
+        return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, nargs="+", default=[1000, 5000])
+    args = parser.parse_args()
+
+    print(f"{'ids':>6} | {'operación':<18} | {'total s':>8} | {'ids/s':>8}")
+    for items in args.items:
+        for label, seconds in run(items).items():
+            print(f"{items:>6} | {label:<18} | {seconds:>8.2f} | {items / seconds:>8.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""
+Benchmark de la importación masiva (POST /products/import) y de la exportación.
+
+Uso:
+    python -m benchmarks.bench_bulk_import --rows 100000 500000
+"""
+import argparse
+import json
+import time
+
+from .common import bench_client, seed_users
+
+
+def build_body(rows: int, fmt: str) -> bytes:
+    if fmt == "ndjson":
+        lines = (
+            json.dumps({"name": f"Producto {i}", "description": "importado", "price": i % 1000 + 0.5, "quantity": i % 100})
+            for i in range(rows)
+        )
+        return ("\n".join(lines) + "\n").encode()
+    lines = (f"Producto {i},importado,{i % 1000 + 0.5},{i % 100}\n" for i in range(rows))
+    return ("name,description,price,quantity\n" + "".join(lines)).encode()
+
+
+def run(rows: int, fmt: str):
+    with bench_client(as_admin=True) as (client, path):
+        seed_users(path, 1)
+        body = build_body(rows, fmt)
+
+        start = time.perf_counter()
+        response = client.post("/products/import", params={"format": fmt}, content=body)
+        imported = time.perf_counter() - start
+        assert response.status_code == 200, response.text
+        assert response.json()["inserted"] == rows, response.json()
+
+        start = time.perf_counter()
+        response = client.get("/products/export", params={"format": fmt})
+        exported = time.perf_counter() - start
+        assert response.status_code == 200
+        return rows / imported, rows / exported
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[100_000, 500_000])
+    parser.add_argument("--formats", nargs="+", default=["csv", "ndjson"], choices=["csv", "ndjson"])
+    args = parser.parse_args()
+
+    print(f"{'filas':>8} | {'formato':>7} | {'import filas/s':>14} | {'export filas/s':>14}")
+    for rows in args.rows:
+        for fmt in args.formats:
+            imported, exported = run(rows, fmt)
+            print(f"{rows:>8} | {fmt:>7} | {imported:>14.0f} | {exported:>14.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""
+Benchmark de throughput de POST /auth/login a distintos niveles de concurrencia.
+
+Mientras dura la ráfaga de logins, una sonda consulta GET /products/list?limit=1 para
+mostrar que el resto de endpoints sigue respondiendo (bcrypt corre en su propio pool).
+Configurar el pool con BCRYPT_ROUNDS, HASH_EXECUTOR, HASH_WORKERS y HASH_MAX_PENDING.
+
+Con --storm la ráfaga usa contraseñas incorrectas (relleno de credenciales desde una
+misma IP), primero sin el límite de intentos y después con él: cada 401 es una
+verificación bcrypt; cada 429 se rechazó sin consultar la base ni calcular el hash.
+
+Uso:
+    HASH_EXECUTOR=process python -m benchmarks.bench_login --concurrency 1 8 32 128
+    python -m benchmarks.bench_login --storm --concurrency 32 128
+"""
+import argparse
+import asyncio
+import time
+
+from app import config
+from app.auth import pwd_context
+from app.ratelimit import login_limiter
+
+from .common import async_client, bench_database, percentile, seed_users
+
+PASSWORD = "benchmark"
+
+
+async def login_burst(concurrency: int, total: int, users: int, password: str = PASSWORD):
+    latencies, statuses, probe = [], {}, []
+    gate = asyncio.Semaphore(concurrency)
+    done = asyncio.Event()
+
+    async with async_client() as client:
+        async def one_login(i: int):
+            async with gate:
+                start = time.perf_counter()
+                response = await client.post(
+                    "/auth/login", data={"username": f"usuario{i % users}", "password": password}
+                )
+                latencies.append((time.perf_counter() - start) * 1000)
+                statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+        async def probe_loop():
+            while not done.is_set():
+                start = time.perf_counter()
+                await client.get("/products/list", params={"limit": 1})
+                probe.append((time.perf_counter() - start) * 1000)
+                await asyncio.sleep(0.05)
+
+        probe_task = asyncio.create_task(probe_loop())
+        start = time.perf_counter()
+        await asyncio.gather(*(one_login(i) for i in range(total)))
+        elapsed = time.perf_counter() - start
+        done.set()
+        await probe_task
+
+    ok = statuses.get(303, 0)
+    return {
+        "logins_s": ok / elapsed,
+        "requests_s": total / elapsed,
+        "statuses": statuses,
+        "ok": ok,
+        "rechazados_503": statuses.get(503, 0),
+        "p50": percentile(latencies, 50),
+        "p99": percentile(latencies, 99),
+        "sonda_p99": percentile(probe, 99),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32, 128])
+    parser.add_argument("--requests", type=int, default=0, help="logins por nivel (por defecto 4x la concurrencia, mínimo 32)")
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--storm", action="store_true", help="ráfaga de contraseñas incorrectas, sin y con límite")
+    args = parser.parse_args()
+    if args.storm:
+        storm(args)
+        return
+
+    print(
+        f"bcrypt rounds={config.BCRYPT_ROUNDS} executor={config.HASH_EXECUTOR} "
+        f"workers={config.HASH_WORKERS} max_pending={config.HASH_MAX_PENDING}"
+    )
+    print(f"{'concurrencia':>12} | {'logins/s':>8} | {'ok':>5} | {'503':>5} | {'p50 ms':>8} | {'p99 ms':>8} | sonda p99 ms")
+    with bench_database() as path:
+        seed_users(path, args.users, hashed_password=pwd_context.hash(PASSWORD))
+        for concurrency in args.concurrency:
+            total = args.requests or max(32, concurrency * 4)
+            r = asyncio.run(login_burst(concurrency, total, args.users))
+            print(
+                f"{concurrency:>12} | {r['logins_s']:>8.1f} | {r['ok']:>5} | {r['rechazados_503']:>5} | "
+                f"{r['p50']:>8.1f} | {r['p99']:>8.1f} | {r['sonda_p99']:.1f}"
+            )
+
+
+def storm(args):
+    print(
+        f"bcrypt rounds={config.BCRYPT_ROUNDS}; límite: {login_limiter.max_per_ip} fallos por IP, "
+        f"{login_limiter.max_per_user} por usuario cada {login_limiter.window} s"
+    )
+    print(
+        f"{'límite':>6} | {'concurrencia':>12} | {'intentos/s':>10} | {'401':>5} | {'429':>5} | {'503':>5} | "
+        f"{'p50 ms':>8} | {'p99 ms':>8} | sonda p99 ms"
+    )
+    limits = (login_limiter.max_per_ip, login_limiter.max_per_user)
+    with bench_database() as path:
+        seed_users(path, args.users, hashed_password=pwd_context.hash(PASSWORD))
+        for enabled in (False, True):
+            login_limiter.max_per_ip, login_limiter.max_per_user = limits if enabled else (0, 0)
+            for concurrency in args.concurrency:
+                login_limiter.clear()
+                total = args.requests or max(200, concurrency * 4)
+                r = asyncio.run(login_burst(concurrency, total, args.users, password="incorrecta"))
+                print(
+                    f"{'sí' if enabled else 'no':>6} | {concurrency:>12} | {r['requests_s']:>10.1f} | "
+                    f"{r['statuses'].get(401, 0):>5} | {r['statuses'].get(429, 0):>5} | "
+                    f"{r['statuses'].get(503, 0):>5} | {r['p50']:>8.1f} | {r['p99']:>8.1f} | {r['sonda_p99']:.1f}"
+                )
+    login_limiter.max_per_ip, login_limiter.max_per_user = limits
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""
+Benchmark de GET /products/list paginado por keyset.
+
+Mide la latencia por página al inicio, a la mitad y al final del catálogo para
+varios tamaños; con keyset la latencia debe mantenerse plana aunque crezca la tabla.
+
+Uso:
+    python -m benchmarks.bench_products_list --scales 10000 100000 1000000
+"""
+import argparse
+
+from app.pagination import encode_cursor
+
+from .common import bench_client, seed_products, time_request
+
+
+def run_scale(total: int, limit: int, repeat: int, legacy: bool):
+    with bench_client() as (client, path):
+        seed_products(path, total)
+        middle = encode_cursor("id", total // 2, total // 2)
+        result = {
+            "primera": time_request(client, "/products/list", {"limit": limit}, repeat),
+            "mitad": time_request(client, "/products/list", {"limit": limit, "cursor": middle}, repeat),
+            "final": time_request(
+                client, "/products/list", {"limit": limit, "cursor": encode_cursor("id", total - limit, total - limit)}, repeat
+            ),
+            "mitad_en_stock": time_request(
+                client, "/products/list", {"limit": limit, "in_stock": True, "cursor": middle}, repeat
+            ),
+        }
+        if legacy:
+            result["lista_completa"] = time_request(client, "/products/list", {}, 1)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scales", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--limit", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=30)
+    parser.add_argument("--legacy", action="store_true", help="mide también la lista completa (modo clásico)")
+    args = parser.parse_args()
+
+    print(f"{'productos':>10} | " + " | ".join(f"{k:>14}" for k in ("primera", "mitad", "final", "mitad_en_stock")))
+    for total in args.scales:
+        result = run_scale(total, args.limit, args.repeat, args.legacy)
+        line = f"{total:>10} | " + " | ".join(f"{result[k]:>11.2f} ms" for k in ("primera", "mitad", "final", "mitad_en_stock"))
+        if "lista_completa" in result:
+            line += f" | lista completa: {result['lista_completa']:.0f} ms"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+Benchmark de la caché de respuestas: sin caché, con acierto (200 desde caché) y con
+revalidación (If-None-Match -> 304), para los endpoints de lectura frecuente.
+
+Uso:
+    python -m benchmarks.bench_response_cache --products 20000 --repeat 300
+"""
+import argparse
+import statistics
+import time
+
+from app import config
+from app.response_cache import MemoryBackend, response_cache
+from .common import bench_client, seed_products, seed_users, time_request
+
+ENDPOINTS = [
+    ("/products/list", {"limit": 50}),
+    ("/products/list", {"limit": 1000, "sort": "-price"}),
+    ("/products/1/owner", {}),
+    ("/users/1/products", {}),
+]
+
+
+def run(products: int, owners: int, repeat: int):
+    with bench_client(as_admin=True) as (client, path):
+        seed_users(path, owners)
+        seed_products(path, products, owners=owners)
+
+        print(f"{'endpoint':<40} | {'sin caché':>10} | {'acierto':>10} | {'304':>10} | bytes")
+        for url, params in ENDPOINTS:
+            label = url + ("?" + "&".join(f"{k}={v}" for k, v in params.items()) if params else "")
+
+            response_cache.backend = None
+            off = time_request(client, url, params, repeat)
+
+            response_cache.backend = MemoryBackend(config.RESPONSE_CACHE_SIZE, config.RESPONSE_CACHE_TTL_SECONDS)
+            first = client.get(url, params=params)
+            hit = time_request(client, url, params, repeat)
+
+            etag = first.headers["etag"]
+            client.headers["If-None-Match"] = etag
+            revalidated = _time_not_modified(client, url, params, repeat)
+            del client.headers["If-None-Match"]
+
+            print(f"{label:<40} | {off:>7.2f} ms | {hit:>7.2f} ms | {revalidated:>7.2f} ms | {len(first.content)}")
+
+    print(response_cache.stats())
+
+
+def _time_not_modified(client, url, params, repeat) -> float:
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        response = client.get(url, params=params)
+        samples.append((time.perf_counter() - start) * 1000)
+        assert response.status_code == 304, response.status_code
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--products", type=int, default=20_000)
+    parser.add_argument("--owners", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=300)
+    args = parser.parse_args()
+    run(args.products, args.owners, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Benchmark de /products/search: índice FTS5 (bm25) frente a un LIKE '%término%'.
+
+Todas las consultas piden la primera página (50 filas). El LIKE puede cortar antes
+si el término es común; con un término raro recorre la tabla completa. Rankear por
+bm25 un término que aparece en casi todas las filas exige puntuarlas todas.
+
+Uso:
+    python -m benchmarks.bench_search --scales 100000 1000000
+"""
+import argparse
+import random
+import sqlite3
+import statistics
+import time
+
+from sqlmodel import Session, create_engine
+
+from app import search
+from .common import bench_database
+
+PAGE = 50
+SYLLABLES = ["ba", "ca", "de", "fi", "go", "lu", "ma", "ne", "po", "ra", "si", "to", "vu", "za", "ñe"]
+
+
+def vocabulary(size: int, rng: random.Random):
+    words = set()
+    while len(words) < size:
+        words.add("".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))))
+    return sorted(words)
+
+
+def seed_catalog(path: str, total: int, batch: int = 50_000):
+    """Productos con nombres y descripciones de un vocabulario con frecuencias de Zipf"""
+    rng = random.Random(7)
+    words = vocabulary(5000, rng)
+    weights = [1 / (rank + 1) for rank in range(len(words))]
+    conn = sqlite3.connect(path)
+    for start in range(0, total, batch):
+        rows = []
+        for i in range(start, min(start + batch, total)):
+            name = " ".join(rng.choices(words, weights, k=3))
+            description = " ".join(rng.choices(words, weights, k=12))
+            rows.append((name, description, 10.0, 1, "2025-01-01 00:00:00"))
+        conn.executemany(
+            "INSERT INTO product (name, description, price, quantity, created_at) VALUES (?, ?, ?, ?, ?)", rows
+        )
+        conn.commit()
+    conn.close()
+    return words
+
+
+def median_ms(session: Session, stmt, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        session.execute(stmt.limit(PAGE)).all()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def run_scale(total: int, repeat: int):
+    with bench_database() as path:
+        words = seed_catalog(path, total)
+        engine = create_engine(f"sqlite:///{path}")
+        start = time.perf_counter()
+        search.ensure_index(engine)
+        index_seconds = time.perf_counter() - start
+
+        # `words` está ordenado por frecuencia: el primero es el más común
+        queries = {
+            "común": words[0],
+            "rara": words[-1],
+            "prefijo": words[len(words) // 2][:3],
+            "sin hits": "xyzzy",
+        }
+        results = {}
+        with Session(engine) as session:
+            for label, q in queries.items():
+                results[label] = (
+                    median_ms(session, search.search_query(q), repeat),
+                    median_ms(session, search.search_query(q, by_rank=False), repeat),
+                    median_ms(session, search.like_query(q), repeat),
+                )
+        engine.dispose()
+        return index_seconds, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scales", type=int, nargs="+", default=[100_000, 1_000_000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'productos':>10} | {'indexado':>9} | {'consulta':>8} | {'FTS5 bm25':>10} | {'FTS5 id':>10} | {'LIKE':>10}")
+    for total in args.scales:
+        index_seconds, results = run_scale(total, args.repeat)
+        for label, (rank_ms, id_ms, like_ms) in results.items():
+            print(
+                f"{total:>10} | {index_seconds:>7.1f} s | {label:>8} | "
+                f"{rank_ms:>7.1f} ms | {id_ms:>7.1f} ms | {like_ms:>7.1f} ms"
+            )
+
+
+if __name__ == "__main__":
+    main()
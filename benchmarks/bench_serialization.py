@@ -0,0 +1,95 @@
+"""
+Micro-benchmark de serialización de listados: costo por cada 10k filas de Product.
+
+Compara la carga (instancias ORM vs filas de columnas) y la codificación:
+response_model (lo que hace FastAPI con List[Product]), jsonable_encoder +
+JSONResponse, y el camino rápido de app.serialization (json estándar y orjson).
+
+Uso:
+    python -m benchmarks.bench_serialization --rows 10000 --repeat 5
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from typing import List
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_model_field
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import Session
+
+from app import serialization
+from app.models import Product
+from app.routers.products import PRODUCT_COLUMNS
+from .common import bench_database, seed_products, seed_users
+
+RESPONSE_FIELD = create_model_field("Response", List[Product], mode="serialization")
+
+
+def measure(fn, repeat: int) -> float:
+    """Mediana en milisegundos"""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def response_model_body(objects) -> bytes:
+    content = asyncio.run(serialize_response(field=RESPONSE_FIELD, response_content=objects))
+    return JSONResponse(content).body
+
+
+def run(rows: int, repeat: int):
+    per_10k = 10_000 / rows
+    with bench_database() as path:
+        seed_users(path, 10)
+        seed_products(path, rows, owners=10)
+        engine = create_engine(f"sqlite:///{path}")
+
+        # Sesión nueva por carga: el identity map no debe reutilizar instancias
+        def load_orm():
+            with Session(engine, expire_on_commit=False) as session:
+                return session.execute(select(Product)).scalars().all()
+
+        def load_rows():
+            with Session(engine) as session:
+                return [dict(row) for row in session.execute(select(*PRODUCT_COLUMNS)).mappings()]
+
+        objects, row_dicts = load_orm(), load_rows()
+        print(f"{rows} filas, mediana de {repeat} corridas, normalizado a 10k filas\n")
+        print(f"{'carga':<44} | {'ms/10k':>8}")
+        print(f"{'instancias ORM (select(Product))':<44} | {measure(load_orm, repeat) * per_10k:>8.1f}")
+        print(f"{'filas de columnas (select(*PRODUCT_COLUMNS))':<44} | {measure(load_rows, repeat) * per_10k:>8.1f}")
+
+        cases = [
+            ("response_model List[Product] (ORM)", lambda: response_model_body(objects)),
+            ("jsonable_encoder + JSONResponse (ORM)", lambda: JSONResponse(jsonable_encoder(objects)).body),
+            ("jsonable_encoder + JSONResponse (filas)", lambda: JSONResponse(jsonable_encoder(row_dicts)).body),
+            ("json estándar (ORM, modo model)", lambda: serialization.dumps_std(objects)),
+            ("json estándar (filas)", lambda: serialization.dumps_std(row_dicts)),
+        ]
+        if serialization.orjson is not None:
+            cases.append(("orjson (filas)", lambda: serialization.orjson.dumps(row_dicts)))
+
+        print(f"\n{'codificación':<44} | {'ms/10k':>8} | bytes")
+        for label, fn in cases:
+            elapsed = measure(fn, repeat) * per_10k
+            print(f"{label:<44} | {elapsed:>8.1f} | {len(fn())}")
+        engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    run(args.rows, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+Benchmark mixto lectura/escritura: perfil dev (journal por defecto) vs production (WAL).
+
+Hilos escritores repiten la transacción de delete_product (insertar AuditLog + borrar
+producto) y vuelven a insertar el producto; hilos lectores leen páginas del catálogo.
+Con el journal por defecto los lectores esperan a cada escritura; con WAL no.
+
+Uso:
+    python -m benchmarks.bench_sqlite_profile --readers 8 --writers 2 --duration 10
+"""
+import argparse
+import os
+import random
+import tempfile
+import threading
+import time
+
+from sqlalchemy import select
+from sqlalchemy.exc import OperationalError
+from sqlmodel import Session, SQLModel
+
+from app.database import make_engine
+from app.models import AuditLog, Product
+
+from .common import percentile, seed_products
+
+
+def run_profile(profile: str, products: int, readers: int, writers: int, duration: float):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        engine = make_engine(f"sqlite:///{path}", profile, echo=False)
+        SQLModel.metadata.create_all(engine)
+        seed_products(path, products)
+
+        deadline = time.monotonic() + duration
+        read_latencies, writes, errors = [], [0], [0]
+        lock = threading.Lock()
+
+        def reader(seed: int):
+            rng = random.Random(seed)
+            local = []
+            while time.monotonic() < deadline:
+                start = time.perf_counter()
+                try:
+                    with Session(engine) as session:
+                        after = rng.randint(0, products)
+                        session.execute(
+                            select(Product.id, Product.name, Product.price)
+                            .where(Product.id > after)
+                            .order_by(Product.id)
+                            .limit(50)
+                        ).all()
+                except OperationalError:
+                    with lock:
+                        errors[0] += 1
+                local.append((time.perf_counter() - start) * 1000)
+            with lock:
+                read_latencies.extend(local)
+
+        def writer(seed: int):
+            rng = random.Random(seed)
+            while time.monotonic() < deadline:
+                try:
+                    with Session(engine) as session:
+                        product = session.get(Product, rng.randint(1, products))
+                        if product is None:
+                            continue
+                        session.add(AuditLog(
+                            action="DELETE_PRODUCT",
+                            target_id=product.id,
+                            target_name=product.name,
+                            performed_by="benchmark",
+                            details=f"Producto '{product.name}' eliminado por benchmark",
+                        ))
+                        session.delete(product)
+                        session.commit()
+                        session.add(Product(id=product.id, name=product.name, price=product.price, quantity=product.quantity))
+                        session.commit()
+                    with lock:
+                        writes[0] += 1
+                except OperationalError:
+                    with lock:
+                        errors[0] += 1
+
+        threads = [threading.Thread(target=reader, args=(i,)) for i in range(readers)]
+        threads += [threading.Thread(target=writer, args=(1000 + i,)) for i in range(writers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        engine.dispose()
+
+    return {
+        "lecturas_s": len(read_latencies) / duration,
+        "lectura_p50": percentile(read_latencies, 50),
+        "lectura_p99": percentile(read_latencies, 99),
+        "escrituras_s": writes[0] / duration,
+        "errores": errors[0],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--products", type=int, default=100_000)
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--writers", type=int, default=2)
+    parser.add_argument("--duration", type=float, default=10)
+    args = parser.parse_args()
+
+    print(f"{'perfil':>10} | {'lecturas/s':>10} | {'p50 ms':>7} | {'p99 ms':>7} | {'escrituras/s':>12} | errores")
+    for profile in ("dev", "production"):
+        r = run_profile(profile, args.products, args.readers, args.writers, args.duration)
+        print(
+            f"{profile:>10} | {r['lecturas_s']:>10.0f} | {r['lectura_p50']:>7.2f} | {r['lectura_p99']:>7.2f} | "
+            f"{r['escrituras_s']:>12.0f} | {r['errores']}"
+        )
+
+
+if __name__ == "__main__":
+    main()
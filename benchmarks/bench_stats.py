@@ -0,0 +1,40 @@
+"""
+Benchmark de los endpoints /stats con agregación en SQL.
+
+Uso:
+    python -m benchmarks.bench_stats --scales 10000 100000 1000000 --users 100
+"""
+import argparse
+import resource
+
+from .common import bench_client, seed_products, seed_users, time_request
+
+
+def run_scale(total: int, users: int, repeat: int):
+    with bench_client(as_admin=True) as (client, path):
+        seed_users(path, users)
+        seed_products(path, total, owners=users)
+        return {
+            "general": time_request(client, "/stats/general", {}, repeat),
+            "por_usuario_paginado": time_request(
+                client, "/stats/user-products", {"limit": 10, "products_per_user": 10}, repeat
+            ),
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scales", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    print(f"{'productos':>10} | {'general':>12} | {'por usuario':>12} | memoria máx")
+    for total in args.scales:
+        result = run_scale(total, args.users, args.repeat)
+        rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        print(f"{total:>10} | {result['general']:>9.1f} ms | {result['por_usuario_paginado']:>9.1f} ms | {rss_mb:.0f} MB")
+
+
+if __name__ == "__main__":
+    main()
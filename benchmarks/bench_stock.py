@@ -0,0 +1,176 @@
+"""
+Benchmark de concurrencia de compras: cientos de compradores simultáneos sobre
+unos pocos productos "calientes" con más demanda que stock.
+
+Por cada nivel de concurrencia se reinicia el stock y se lanza la ráfaga; al final
+se verifica que no hubo sobreventa: stock inicial - stock final == unidades de las
+compras respondidas con 200 (y lo mismo según el historial PURCHASE), ningún stock
+negativo y contadores sin desvío.
+
+Escenarios:
+- purchase: POST /products/{id}/purchase
+- reserve:  POST /products/{id}/reserve y luego POST /reservations/{id}/confirm
+- checkout: POST /checkout con dos productos calientes por orden
+- naive:    lectura + PUT /products/{id} del admin (lectura-modificación-escritura);
+            sólo como referencia de las actualizaciones perdidas que se evitan
+
+Uso:
+    python -m benchmarks.bench_stock --concurrency 50 200 500 --hot 3 --stock 200
+"""
+import argparse
+import asyncio
+import random
+import sqlite3
+import time
+
+from sqlmodel import Session, create_engine, select
+
+from app import counters
+from app.models import AuditLog
+
+from .common import async_client, bench_database, percentile, seed_products, seed_users
+
+SCENARIOS = ("purchase", "reserve", "checkout", "naive")
+
+
+def reset_stock(path: str, hot_ids, stock: int):
+    conn = sqlite3.connect(path)
+    conn.executemany("UPDATE product SET quantity = ? WHERE id = ?", [(stock, pid) for pid in hot_ids])
+    conn.execute("DELETE FROM auditlog")
+    conn.execute("DELETE FROM reservation")
+    conn.commit()
+    conn.close()
+    engine = create_engine(f"sqlite:///{path}")
+    with Session(engine) as session:
+        counters.rebuild(session)
+        session.commit()
+    engine.dispose()
+
+
+def read_stock(path: str, hot_ids) -> dict:
+    conn = sqlite3.connect(path)
+    marks = ",".join("?" * len(hot_ids))
+    rows = dict(conn.execute(f"SELECT id, quantity FROM product WHERE id IN ({marks})", list(hot_ids)))
+    conn.close()
+    return rows
+
+
+async def burst(scenario: str, concurrency: int, total: int, hot_ids, path: str):
+    rng = random.Random(concurrency)
+    latencies, statuses = [], {}
+    sold = {pid: 0 for pid in hot_ids}
+    gate = asyncio.Semaphore(concurrency)
+
+    async with async_client() as client:
+        async def one_order(i: int):
+            product_id, quantity = rng.choice(hot_ids), rng.randint(1, 3)
+            async with gate:
+                start = time.perf_counter()
+                if scenario == "purchase":
+                    response = await client.post(f"/products/{product_id}/purchase", data={"quantity": quantity})
+                    lines = {product_id: quantity}
+                elif scenario == "reserve":
+                    response = await client.post(f"/products/{product_id}/reserve", data={"quantity": quantity})
+                    if response.status_code == 200:
+                        reservation_id = response.json()["reservation"]["id"]
+                        response = await client.post(f"/reservations/{reservation_id}/confirm")
+                    lines = {product_id: quantity}
+                elif scenario == "checkout":
+                    other = hot_ids[(hot_ids.index(product_id) + 1) % len(hot_ids)]
+                    lines = {product_id: quantity, other: 1} if other != product_id else {product_id: quantity + 1}
+                    response = await client.post("/checkout", json={
+                        "items": [{"product_id": pid, "quantity": n} for pid, n in lines.items()]
+                    })
+                else:
+                    # Lectura y escritura separadas: entre ambas otro comprador pudo comprar
+                    current = (await asyncio.to_thread(read_stock, path, [product_id]))[product_id]
+                    if current < quantity:
+                        response = None
+                    else:
+                        response = await client.put(f"/products/{product_id}", data={"quantity": current - quantity})
+                    lines = {product_id: quantity}
+                latencies.append((time.perf_counter() - start) * 1000)
+                status = response.status_code if response is not None else 409
+                statuses[status] = statuses.get(status, 0) + 1
+                if status == 200:
+                    for pid, n in lines.items():
+                        sold[pid] += n
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one_order(i) for i in range(total)))
+        elapsed = time.perf_counter() - start
+
+    return {
+        "orders_s": total / elapsed,
+        "ok": statuses.get(200, 0),
+        "statuses": statuses,
+        "p50": percentile(latencies, 50),
+        "p99": percentile(latencies, 99),
+        "sold": sold,
+    }
+
+
+def check(path: str, hot_ids, stock: int, sold: dict, audited: bool) -> list:
+    """Diferencias entre lo vendido según las respuestas, el stock y el historial"""
+    problems = []
+    final = read_stock(path, hot_ids)
+    for pid in hot_ids:
+        if final[pid] < 0:
+            problems.append(f"producto {pid}: stock negativo ({final[pid]})")
+        if stock - final[pid] != sold[pid]:
+            problems.append(f"producto {pid}: vendidas {sold[pid]}, descontadas {stock - final[pid]}")
+
+    engine = create_engine(f"sqlite:///{path}")
+    with Session(engine) as session:
+        if audited:
+            purchases = session.exec(select(AuditLog).where(AuditLog.action == "PURCHASE")).all()
+            per_product = {pid: 0 for pid in hot_ids}
+            for log in purchases:
+                per_product[log.target_id] += int(log.details.split(" x ", 1)[0])
+            for pid in hot_ids:
+                if per_product[pid] != sold[pid]:
+                    problems.append(f"producto {pid}: historial {per_product[pid]}, vendidas {sold[pid]}")
+        problems.extend(counters.verify(session))
+    engine.dispose()
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[50, 200, 500])
+    parser.add_argument("--orders", type=int, default=0, help="órdenes por nivel (por defecto 2x la concurrencia, mínimo 200)")
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=["purchase", "reserve", "checkout", "naive"])
+    parser.add_argument("--hot", type=int, default=3, help="productos calientes")
+    parser.add_argument("--stock", type=int, default=200, help="stock inicial de cada producto caliente")
+    parser.add_argument("--products", type=int, default=10_000)
+    args = parser.parse_args()
+
+    hot_ids = list(range(1, args.hot + 1))
+    print(f"{args.hot} productos calientes con stock {args.stock}, {args.products} productos en total\n")
+    print(
+        f"{'escenario':>9} | {'concurrencia':>12} | {'órdenes/s':>9} | {'ok':>5} | {'409':>5} | "
+        f"{'p50 ms':>8} | {'p99 ms':>8} | verificación"
+    )
+    failed = False
+    with bench_database(as_admin=True) as path:
+        seed_users(path, 10)
+        seed_products(path, args.products, owners=10)
+        for scenario in args.scenarios:
+            for concurrency in args.concurrency:
+                reset_stock(path, hot_ids, args.stock)
+                total = args.orders or max(200, concurrency * 2)
+                r = asyncio.run(burst(scenario, concurrency, total, hot_ids, path))
+                problems = check(path, hot_ids, args.stock, r["sold"], audited=scenario != "naive")
+                if scenario != "naive":
+                    failed = failed or bool(problems)
+                verdict = "sin sobreventa" if not problems else f"{len(problems)} diferencias: {problems[0]}"
+                print(
+                    f"{scenario:>9} | {concurrency:>12} | {r['orders_s']:>9.1f} | {r['ok']:>5} | "
+                    f"{r['statuses'].get(409, 0):>5} | {r['p50']:>8.1f} | {r['p99']:>8.1f} | {verdict}"
+                )
+    if failed:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,209 @@
+"""
+Benchmark del historial de precios y stock (app.history).
+
+1. Costo en el camino de escritura: compras de una unidad (UPDATE ... RETURNING +
+   contadores + commit) con HISTORY_ENABLED apagado y prendido.
+2. Consolidación: eventos sintéticos repartidos en `--days` días (paseo aleatorio de
+   precio y stock por producto) y tiempo de roll_up hasta no dejar pendientes.
+3. Consultas: GET /stats/timeseries (buckets consolidados) frente a la misma serie
+   calculada desde los eventos crudos con GROUP BY (precio de un producto) y con una
+   suma acumulada por ventana (valor de inventario de un dueño y total).
+
+Uso:
+    python -m benchmarks.bench_timeseries --products 10000 --events 500000 --days 90
+"""
+import argparse
+import random
+import sqlite3
+import statistics
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import update
+from sqlmodel import Session, create_engine
+
+from app import config, counters, history, stock
+from app.models import Product
+
+from .common import bench_client, seed_products, seed_users, time_request
+
+# Mismo bucket que history.bucket_start, calculado en SQLite
+SQL_BUCKET = {"hour": "strftime('%Y-%m-%d %H:00:00', at)", "day": "strftime('%Y-%m-%d 00:00:00', at)"}
+
+
+def write_overhead(path: str, products: int, purchases: int) -> dict:
+    engine = create_engine(f"sqlite:///{path}")
+    rng = random.Random(1)
+    result = {}
+    try:
+        for enabled in (False, True):
+            config.HISTORY_ENABLED = enabled
+            ids = [rng.randint(1, products) for _ in range(purchases)]
+            started = time.perf_counter()
+            with Session(engine) as session:
+                for product_id in ids:
+                    # Repone la unidad: nunca falta stock y el producto no cambia entre corridas
+                    session.execute(update(Product).where(Product.id == product_id).values(quantity=Product.quantity + 1))
+                    row = stock.take(session, product_id, 1)
+                    counters.stock_changed(session, row, -1)
+                    session.commit()
+            result[enabled] = (time.perf_counter() - started) * 1e6 / purchases
+    finally:
+        config.HISTORY_ENABLED = True
+        engine.dispose()
+    return result
+
+
+def seed_events(path: str, products: int, owners: int, total: int, days: int):
+    """Eventos en orden de tiempo hasta ahora; cada uno cambia precio o stock"""
+    conn = sqlite3.connect(path)
+    rng = random.Random(7)
+    state = {
+        product_id: [owner_id, price, quantity]
+        for product_id, owner_id, price, quantity in conn.execute("SELECT id, owner_id, price, quantity FROM product")
+    }
+    end = datetime.utcnow()
+    span = days * 86400
+    rows = []
+    for i in range(total):
+        product_id = rng.randint(1, products)
+        owner_id, price, quantity = state[product_id]
+        if rng.random() < 0.2:
+            new_price, new_quantity = round(max(1.0, price * rng.uniform(0.9, 1.1)), 2), quantity
+        else:
+            new_price, new_quantity = price, max(0, quantity + rng.randint(-3, 3))
+        state[product_id] = [owner_id, new_price, new_quantity]
+        at = end - timedelta(seconds=span * (total - i) / total)
+        rows.append((product_id, owner_id, new_price, new_quantity,
+                     new_price * new_quantity - price * quantity, at.isoformat(sep=" ")))
+        if len(rows) == 50_000:
+            conn.executemany(
+                "INSERT INTO productevent (product_id, owner_id, price, quantity, value_delta, at) VALUES (?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            rows = []
+    if rows:
+        conn.executemany(
+            "INSERT INTO productevent (product_id, owner_id, price, quantity, value_delta, at) VALUES (?, ?, ?, ?, ?, ?)",
+            rows,
+        )
+    # El estado final es el de los productos: los contadores quedan en línea con los eventos
+    conn.executemany(
+        "UPDATE product SET price = ?, quantity = ? WHERE id = ?",
+        [(price, quantity, product_id) for product_id, (_, price, quantity) in state.items()],
+    )
+    conn.commit()
+    conn.close()
+
+
+def roll_up_all(path: str) -> float:
+    engine = create_engine(f"sqlite:///{path}")
+    try:
+        with Session(engine) as session:
+            counters.rebuild(session)
+            session.commit()
+            started = time.perf_counter()
+            carry = {}
+            while history.roll_up(session, carry=carry) == config.HISTORY_ROLLUP_BATCH:
+                pass
+            return time.perf_counter() - started
+    finally:
+        engine.dispose()
+
+
+def time_raw(path: str, sql: str, params: tuple, repeat: int) -> float:
+    conn = sqlite3.connect(path)
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        conn.execute(sql, params).fetchall()
+        samples.append((time.perf_counter() - start) * 1000)
+    conn.close()
+    return statistics.median(samples)
+
+
+def raw_price(granularity: str) -> str:
+    bucket = SQL_BUCKET[granularity]
+    return (
+        f"SELECT {bucket} AS b, MIN(price), MAX(price), AVG(price), COUNT(*) FROM productevent "
+        "WHERE product_id = ? AND at >= ? GROUP BY b ORDER BY b"
+    )
+
+
+def raw_value(granularity: str, owner: bool) -> str:
+    # El nivel de cada evento es la suma acumulada desde el primero: se recorre toda la serie
+    bucket = SQL_BUCKET[granularity]
+    where = "WHERE owner_id = ?" if owner else "WHERE ? IS NULL"
+    return (
+        f"SELECT b, MIN(level), MAX(level), COUNT(*) FROM ("
+        f"  SELECT {bucket} AS b, at, SUM(value_delta) OVER (ORDER BY id) AS level FROM productevent {where}"
+        ") WHERE at >= ? GROUP BY b ORDER BY b"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--products", type=int, default=10_000)
+    parser.add_argument("--owners", type=int, default=100)
+    parser.add_argument("--events", type=int, default=500_000)
+    parser.add_argument("--days", type=int, default=90)
+    parser.add_argument("--purchases", type=int, default=2_000)
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    with bench_client(as_admin=True) as (client, path):
+        seed_users(path, args.owners)
+        seed_products(path, args.products, owners=args.owners)
+
+        overhead = write_overhead(path, args.products, args.purchases)
+        print(f"Compra de una unidad ({args.purchases} transacciones):")
+        print(f"  sin historial {overhead[False]:>8.0f} µs | con historial {overhead[True]:>8.0f} µs "
+              f"(+{overhead[True] - overhead[False]:.0f} µs)")
+
+        sqlite3.connect(path).execute("DELETE FROM productevent").connection.commit()
+        started = time.perf_counter()
+        seed_events(path, args.products, args.owners, args.events, args.days)
+        print(f"\n{args.events} eventos sintéticos en {args.days} días ({time.perf_counter() - started:.1f} s)")
+        elapsed = roll_up_all(path)
+        print(f"Consolidación: {elapsed:.1f} s ({args.events / elapsed:,.0f} eventos/s)")
+
+        product_id = random.Random(3).randint(1, args.products)
+        now = datetime.utcnow()
+        cases = [
+            ("precio producto, hora, 7 días", "hour", 7,
+             {"metric": "price", "product_id": product_id}, raw_price("hour"), (product_id,)),
+            ("precio producto, día, 90 días", "day", 90,
+             {"metric": "price", "product_id": product_id}, raw_price("day"), (product_id,)),
+            ("valor dueño, hora, 7 días", "hour", 7,
+             {"metric": "value", "owner_id": 1}, raw_value("hour", True), (1,)),
+            ("valor dueño, día, 90 días", "day", 90,
+             {"metric": "value", "owner_id": 1}, raw_value("day", True), (1,)),
+            ("valor total, hora, 7 días", "hour", 7,
+             {"metric": "value"}, raw_value("hour", False), (None,)),
+            ("valor total, día, 90 días", "day", 90,
+             {"metric": "value"}, raw_value("day", False), (None,)),
+        ]
+        print(f"\n{'serie':<32} | {'buckets':>7} | {'endpoint':>9} | {'series()':>9} | {'eventos crudos':>14}")
+        engine = create_engine(f"sqlite:///{path}")
+        for label, granularity, days, params, sql, sql_params in cases:
+            start = now - timedelta(days=days)
+            query = {**params, "granularity": granularity, "start": start.isoformat()}
+            points = len(client.get("/stats/timeseries", params=query).json()["points"])
+            endpoint = time_request(client, "/stats/timeseries", query, args.repeat)
+            key = params.get("product_id") or params.get("owner_id") or history.TOTAL_OWNER
+            aligned = history.bucket_start(start, granularity)
+            samples = []
+            with Session(engine) as session:
+                for _ in range(args.repeat):
+                    started = time.perf_counter()
+                    history.series(session, params["metric"], granularity, key, aligned, now)
+                    samples.append((time.perf_counter() - started) * 1000)
+            raw = time_raw(path, sql, (*sql_params, start.isoformat(sep=" ")), args.repeat)
+            print(
+                f"{label:<32} | {points:>7} | {endpoint:>6.1f} ms | {statistics.median(samples):>6.2f} ms | "
+                f"{raw:>11.2f} ms"
+            )
+        engine.dispose()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+"""
+Throughput según la cantidad de workers (python -m app.server --workers N).
+
+Genera una base con benchmarks.generate, levanta el servidor de producción con cada
+cantidad de workers y lo ataca durante unos segundos con una mezcla de lecturas
+(catálogo filtrado, dueño de producto, estadísticas) y un porcentaje de compras,
+cuyos commits publican invalidaciones en el bus entre procesos. Al final verifica
+que todos los workers ven el mismo listado después de la última escritura.
+
+El generador de carga corre en esta misma máquina y compite por CPU con el
+servidor: con pocos núcleos el aumento de workers se nota poco o nada.
+
+Uso:
+    python -m benchmarks.bench_workers --workers 1 2 4 8 --clients 64 --duration 15
+"""
+import argparse
+import asyncio
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+from .common import percentile
+from .generate import PASSWORD, generate
+from .load_db_mode import REPO_ROOT, wait_ready
+
+
+def start_server(workers: int, db_path: str, port: int, mode: str) -> subprocess.Popen:
+    env = dict(
+        os.environ,
+        DATABASE_URL=f"sqlite:///{db_path}",
+        DB_MODE=mode,
+        DB_PROFILE="production",
+        SECRET_KEY="bench-workers",
+        INIT_LOCK_FILE=db_path + ".lock",
+    )
+    return subprocess.Popen(
+        [sys.executable, "-m", "app.server", "--workers", str(workers), "--port", str(port), "--log-level", "warning"],
+        cwd=REPO_ROOT,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+
+
+async def run_load(base_url: str, clients: int, duration: float, products: int, write_ratio: float):
+    limits = httpx.Limits(max_connections=clients, max_keepalive_connections=clients)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        login = await client.post("/auth/login", data={"username": "usuario0", "password": PASSWORD})
+        cookies = dict(login.cookies) or dict(client.cookies)
+
+        latencies, errors, writes = [], 0, 0
+        deadline = time.monotonic() + duration
+
+        async def one_client(seed: int):
+            nonlocal errors, writes
+            rng = random.Random(seed)
+            while time.monotonic() < deadline:
+                roll = rng.random()
+                if roll < write_ratio:
+                    writes += 1
+                    request = client.post(
+                        f"/products/{rng.randint(1, products)}/purchase", data={"quantity": 1}, cookies=cookies
+                    )
+                elif roll < 0.6:
+                    request = client.get("/products/list", params={"limit": 20, "min_price": rng.randint(1, 900)})
+                elif roll < 0.9:
+                    request = client.get(f"/products/{rng.randint(1, products)}/owner")
+                else:
+                    request = client.get("/stats/general", cookies=cookies)
+                start = time.perf_counter()
+                try:
+                    response = await request
+                    # 409 = sin stock: respuesta esperada de una compra
+                    if response.status_code >= 400 and response.status_code != 409:
+                        errors += 1
+                except httpx.HTTPError:
+                    errors += 1
+                latencies.append((time.perf_counter() - start) * 1000)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one_client(i) for i in range(clients)))
+        elapsed = time.perf_counter() - start
+
+    return {
+        "rps": len(latencies) / elapsed,
+        "requests": len(latencies),
+        "writes": writes,
+        "errors": errors,
+        "p50": percentile(latencies, 50),
+        "p99": percentile(latencies, 99),
+    }
+
+
+async def check_consistency(base_url: str, poll_ms: float) -> bool:
+    """Una compra y luego el listado desde conexiones nuevas (repartidas entre workers)"""
+    async with httpx.AsyncClient(base_url=base_url) as client:
+        await client.post("/auth/login", data={"username": "usuario0", "password": PASSWORD})
+        params = {"limit": 1, "min_price": 0}
+        first = (await client.get("/products/list", params=params)).json()["items"][0]
+        for _ in range(20):  # calentar la caché de todos los workers
+            async with httpx.AsyncClient(base_url=base_url) as other:
+                await other.get("/products/list", params=params)
+        bought = await client.post(f"/products/{first['id']}/purchase", data={"quantity": 1})
+        expected = first["quantity"] - 1 if bought.status_code == 200 else first["quantity"]
+    await asyncio.sleep(poll_ms * 3 / 1000)
+    seen = set()
+    for _ in range(20):
+        async with httpx.AsyncClient(base_url=base_url) as other:
+            seen.add((await other.get("/products/list", params=params)).json()["items"][0]["quantity"])
+    return seen == {expected}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--clients", type=int, default=64)
+    parser.add_argument("--duration", type=float, default=15)
+    parser.add_argument("--products", type=int, default=50_000)
+    parser.add_argument("--write-ratio", type=float, default=0.05, help="fracción de compras en la mezcla")
+    parser.add_argument("--mode", default="sync", choices=["sync", "async"])
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    poll_ms = float(os.environ.get("BUS_POLL_INTERVAL_MS", "200"))
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "workers.db")
+        generate(db_path, users=100, products=args.products, audit=0)
+
+        print(
+            f"{os.cpu_count()} CPU, DB_MODE={args.mode}, {args.clients} clientes, {args.duration:.0f} s, "
+            f"{args.products} productos, {args.write_ratio:.0%} compras"
+        )
+        print(
+            f"{'workers':>7} | {'req/s':>8} | {'peticiones':>10} | {'compras':>7} | {'errores':>7} | "
+            f"{'p50 ms':>8} | {'p99 ms':>8} | coherencia"
+        )
+        for workers in args.workers:
+            server = start_server(workers, db_path, args.port, args.mode)
+            try:
+                base_url = f"http://127.0.0.1:{args.port}"
+                asyncio.run(wait_ready(base_url, timeout=60))
+                time.sleep(1 + workers * 0.5)  # el primero en responder no implica que todos arrancaron
+                r = asyncio.run(run_load(base_url, args.clients, args.duration, args.products, args.write_ratio))
+                consistent = asyncio.run(check_consistency(base_url, poll_ms))
+            finally:
+                server.terminate()
+                server.wait()
+            print(
+                f"{workers:>7} | {r['rps']:>8.1f} | {r['requests']:>10} | {r['writes']:>7} | {r['errors']:>7} | "
+                f"{r['p50']:>8.1f} | {r['p99']:>8.1f} | {'ok' if consistent else 'DESFASADA'}"
+            )
+
+
+if __name__ == "__main__":
+    main()
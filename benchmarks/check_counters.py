@@ -0,0 +1,135 @@
+"""
+Verificación de los contadores materializados (app.counters) después de borrar
+usuarios que tienen productos. Cada escenario corre contra la app sobre una base
+temporal sembrada; después de cada uno `counters.verify` no debe informar
+diferencias, ningún producto puede quedar con el owner_id de un usuario que ya no
+existe y el listado por dueño (cacheado antes del borrado) tiene que salir vacío.
+Al final se consolida el historial (app.history): el valor de inventario de cada
+usuario borrado debe cerrar en 0. Falla (código 1) con la lista de problemas.
+
+Usa el DB_MODE del entorno:
+    python -m benchmarks.check_counters
+    DB_MODE=async python -m benchmarks.check_counters
+"""
+import os
+import sys
+import tempfile
+from typing import Callable, List, Optional, Tuple
+
+USERS = 12
+PRODUCTS = 300
+
+
+def _dangling(session) -> int:
+    from sqlalchemy import func, select
+
+    from app.models import Product, User
+
+    return session.execute(
+        select(func.count(Product.id))
+        .outerjoin(User, User.id == Product.owner_id)
+        .where(Product.owner_id.is_not(None), User.id.is_(None))
+    ).scalar()
+
+
+def _history_problems(session, user_ids: List[int]) -> List[str]:
+    from sqlalchemy import select
+
+    from app import config, history
+    from app.models import InventoryRollup
+
+    while history.roll_up(session) == config.HISTORY_ROLLUP_BATCH:
+        pass
+    problems = []
+    for user_id in user_ids:
+        close = session.execute(
+            select(InventoryRollup.close_value)
+            .where(InventoryRollup.owner_id == user_id, InventoryRollup.granularity == "day")
+            .order_by(InventoryRollup.bucket.desc())
+            .limit(1)
+        ).scalar()
+        if close is None or abs(close) > 1e-6:
+            problems.append(f"historial: el valor del dueño {user_id} cierra en {close} (esperado 0)")
+    return problems
+
+
+def check() -> List[str]:
+    from fastapi.testclient import TestClient
+    from sqlmodel import Session
+
+    from app import counters
+    from app.database import engine, prepare_database
+    from app.main import app
+    from app.models import User
+    from app.routers.auth_router import get_current_user, get_current_user_async
+
+    from .common import seed_products, seed_users
+
+    path = engine.url.database
+    prepare_database()
+    seed_users(path, USERS)
+    seed_products(path, PRODUCTS, owners=USERS)
+    with Session(engine) as session:
+        counters.rebuild(session)
+        session.commit()
+
+    admin = User(id=1, username="usuario0", hashed_password="x", role="admin")
+    app.dependency_overrides[get_current_user] = lambda: admin
+    app.dependency_overrides[get_current_user_async] = lambda: admin
+
+    # (descripción, usuarios borrados, petición) en orden; cada usuario tiene productos
+    # al momento de borrarlo
+    scenarios: List[Tuple[str, List[int], Callable[[TestClient], object]]] = [
+        ("DELETE /users/2", [2], lambda client: client.delete("/users/2")),
+        ("POST /users/batch/delete", [3, 4, 5],
+         lambda client: client.post("/users/batch/delete", json={"ids": [3, 4, 5]})),
+    ]
+    problems = []
+    try:
+        with TestClient(app) as client:
+            for name, user_ids, request in scenarios:
+                # Deja en la caché de respuestas el listado de cada dueño
+                for user_id in user_ids:
+                    client.get("/products/list", params={"owner_id": user_id})
+                response = request(client)
+                if response.status_code != 200:
+                    problems.append(f"{name}: HTTP {response.status_code} {response.text[:200]}")
+                    continue
+                with Session(engine) as session:
+                    problems.extend(f"{name}: {line}" for line in counters.verify(session))
+                    dangling = _dangling(session)
+                if dangling:
+                    problems.append(f"{name}: {dangling} productos con dueño inexistente")
+                for user_id in user_ids:
+                    stale = client.get("/products/list", params={"owner_id": user_id}).json()
+                    if stale:
+                        problems.append(f"{name}: caché con {len(stale)} productos del dueño {user_id}")
+        with Session(engine) as session:
+            problems.extend(_history_problems(session, [user_id for _, ids, _ in scenarios for user_id in ids]))
+    finally:
+        app.dependency_overrides.clear()
+    return problems
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    with tempfile.TemporaryDirectory() as tmp:
+        # Antes de importar app: la configuración se lee del entorno al importarla
+        os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tmp, 'counters.db')}"
+        os.environ.setdefault("DB_PROFILE", "production")  # sin eco de SQL
+        os.environ.setdefault("HISTORY_ROLLUP_INTERVAL_SECONDS", "0")
+        os.environ.setdefault("STOCK_SWEEP_INTERVAL_SECONDS", "0")
+        problems = check()
+        from app.database import engine
+
+        engine.dispose()
+    if problems:
+        print(f"Se encontraron {len(problems)} problemas:")
+        for line in problems:
+            print(f"  - {line}")
+        return 1
+    print("Contadores, caché e historial consistentes después de borrar usuarios con productos.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,186 @@
+"""
+Verificación de planes de consulta: recorre los endpoints de cada router sobre una
+base sembrada, captura cada SELECT/UPDATE/DELETE emitido y ejecuta EXPLAIN QUERY
+PLAN con los mismos parámetros. Falla (código 1) si alguna consulta recorre una
+tabla completa ("SCAN tabla" sin índice) fuera de las excepciones documentadas.
+Un SCAN en el orden de la tabla con LIMIT y sin ordenar aparte (sin TEMP B-TREE)
+se corta al llegar al límite, así que no cuenta como recorrido completo.
+
+Los routers se eligen con DB_MODE al importar la app: sin --mode se corre una vez
+por modo (sync y async, cada uno en su proceso), así también se revisan las
+consultas de app.routers.async_api.
+
+Uso:
+    python -m benchmarks.check_query_plans
+    python -m benchmarks.check_query_plans --verbose   # muestra todos los planes
+    DB_MODE=async python -m benchmarks.check_query_plans --mode async
+"""
+import argparse
+import os
+import re
+import sqlite3
+import subprocess
+import sys
+from typing import List, Optional, Set, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlmodel import Session, create_engine
+
+from app import config, counters, search
+from .common import bench_client, seed_products, seed_users
+
+MODES = ("sync", "async")
+USERS = 50
+PRODUCTS = 20_000
+
+# Recorridos completos esperados: estos endpoints devuelven o agregan la tabla entera
+# (o una fila por usuario), así que un índice no evitaría leer todas las filas.
+FULL_LIST = {"product"}
+PER_USER = {"user", "ownerstats"}
+
+# (método, ruta, argumentos de la petición, tablas que pueden recorrerse completas)
+SCENARIOS: List[Tuple[str, str, dict, Set[str]]] = [
+    ("GET", "/products/list", {}, FULL_LIST),
+    ("GET", "/products/list", {"params": {"limit": 20}}, set()),
+    ("GET", "/products/list", {"params": {"limit": 20, "sort": "-price"}}, set()),
+    ("GET", "/products/list", {"params": {"limit": 20, "sort": "created_at"}}, set()),
+    ("GET", "/products/list", {"params": {"limit": 20, "sort": "name", "name_prefix": "Producto 1"}}, set()),
+    ("GET", "/products/list", {"params": {"limit": 20, "owner_id": 3}}, set()),
+    ("GET", "/products/list", {"params": {"limit": 20, "sort": "price", "min_price": 500}}, set()),
+    ("GET", "/products/list", {"params": {"limit": 20, "format": "ndjson"}}, set()),
+    ("GET", "/products/search", {"params": {"q": "producto 12"}}, set()),
+    ("GET", "/products/search", {"params": {"q": "descripción", "sort": "id", "limit": 5}}, set()),
+    ("GET", "/products/export", {"params": {"format": "csv"}}, FULL_LIST),
+    ("GET", "/products/7/owner", {}, set()),
+    ("POST", "/products/create", {"data": {"name": "Nuevo", "price": 5000, "quantity": 500}}, set()),
+    ("PUT", "/products/8", {"data": {"price": 1.5, "quantity": 3}}, set()),
+    ("DELETE", "/products/9", {}, set()),
+    ("POST", "/products/import", {"params": {"format": "ndjson"}, "content": b'{"name": "i", "price": 1}\n'}, set()),
+    ("GET", "/users/", {}, {"user"}),
+    ("POST", "/users/", {"json": {"username": "nuevo", "hashed_password": "pw", "role": "client"}}, set()),
+    ("PUT", "/users/4", {"json": {"username": "editado", "hashed_password": "", "role": "admin"}}, set()),
+    ("GET", "/users/5/products", {}, set()),
+    ("DELETE", "/users/6", {}, set()),
+    ("GET", "/audit/history", {}, set()),
+    ("GET", "/audit/history", {"params": {"limit": 20}}, set()),
+    ("GET", "/audit/history", {"params": {"limit": 20, "performed_by": "usuario0"}}, set()),
+    ("GET", "/audit/history", {"params": {"limit": 20, "target_id": 9, "action": "DELETE_PRODUCT"}}, set()),
+    ("GET", "/audit/history", {"params": {"limit": 20, "since": "2020-01-01T00:00:00"}}, set()),
+    ("GET", "/stats/general", {}, set()),
+    ("GET", "/stats/user-products", {"params": {"limit": 10, "products_per_user": 5}}, PER_USER),
+    ("POST", "/auth/login", {"data": {"username": "nuevo", "password": "pw"}}, set()),
+]
+
+EXPLAINABLE = re.compile(r"^\s*(SELECT|UPDATE|DELETE|WITH)\b", re.IGNORECASE)
+FULL_SCAN = re.compile(r"^SCAN (\w+)$")
+LIMITED = re.compile(r"\bLIMIT\b", re.IGNORECASE)
+
+
+class StatementRecorder:
+    """Guarda las sentencias que pasan por cualquier engine mientras está activo"""
+
+    def __init__(self):
+        self.statements: List[Tuple[str, tuple]] = []
+        self.active = False
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        if self.active and not executemany and EXPLAINABLE.match(statement):
+            self.statements.append((statement, tuple(parameters or ())))
+
+    def take(self) -> List[Tuple[str, tuple]]:
+        taken, self.statements = self.statements, []
+        return taken
+
+
+def full_scans(conn: sqlite3.Connection, tables: Set[str], statement: str, parameters: tuple):
+    """Devuelve (plan, tablas recorridas completas) de una sentencia"""
+    plan = [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {statement}", parameters)]
+    if LIMITED.search(statement) and not any("TEMP B-TREE" in detail for detail in plan):
+        return plan, set()
+    scanned = set()
+    for detail in plan:
+        match = FULL_SCAN.match(detail)
+        # Las subconsultas y CTE aparecen con su alias: sólo cuentan las tablas reales
+        if match and match.group(1) in tables:
+            scanned.add(match.group(1))
+    return plan, scanned
+
+
+def check(verbose: bool = False) -> List[str]:
+    recorder = StatementRecorder()
+    event.listen(Engine, "before_cursor_execute", recorder)
+    problems: List[str] = []
+    try:
+        with bench_client(as_admin=True) as (client, path):
+            seed_users(path, USERS)
+            seed_products(path, PRODUCTS, owners=USERS)
+            seeded = create_engine(f"sqlite:///{path}")
+            search.ensure_index(seeded)
+            with Session(seeded) as session:
+                # Como al arrancar la app: los contadores ya existen antes de las peticiones
+                counters.rebuild(session)
+                session.commit()
+            with seeded.begin() as conn:
+                conn.exec_driver_sql("ANALYZE")
+            seeded.dispose()
+
+            explain = sqlite3.connect(path)
+            tables = {row[0] for row in explain.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+            for method, url, kwargs, allowed in SCENARIOS:
+                recorder.active = True
+                response = client.request(method, url, **kwargs)
+                recorder.active = False
+                if response.status_code >= 400:
+                    problems.append(f"{method} {url}: respondió {response.status_code} {response.text[:200]}")
+                    continue
+
+                for statement, parameters in recorder.take():
+                    plan, scanned = full_scans(explain, tables, statement, parameters)
+                    unexpected = scanned - allowed
+                    if verbose or unexpected:
+                        print(f"{method} {url}\n  {' '.join(statement.split())}")
+                        for detail in plan:
+                            print(f"    {detail}")
+                    if unexpected:
+                        problems.append(f"{method} {url}: recorre completa(s) {', '.join(sorted(unexpected))}")
+            explain.close()
+    finally:
+        event.remove(Engine, "before_cursor_execute", recorder)
+    return problems
+
+
+def run_modes(verbose: bool) -> int:
+    """Un proceso por DB_MODE; falla si falla alguno"""
+    failed = 0
+    for mode in MODES:
+        command = [sys.executable, "-m", "benchmarks.check_query_plans", "--mode", mode]
+        if verbose:
+            command.append("--verbose")
+        failed |= subprocess.run(command, env={**os.environ, "DB_MODE": mode}).returncode
+    return 1 if failed else 0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--verbose", action="store_true")
+    parser.add_argument("--mode", choices=MODES, help="sólo este modo (debe coincidir con DB_MODE)")
+    args = parser.parse_args(argv)
+
+    if args.mode is None:
+        return run_modes(args.verbose)
+    if args.mode != config.DB_MODE:
+        parser.error(f"--mode {args.mode} requiere DB_MODE={args.mode} (la app ya se importó con {config.DB_MODE})")
+
+    problems = check(args.verbose)
+    if problems:
+        print(f"\n[{args.mode}] {len(problems)} consulta(s) con recorrido completo o error:")
+        for problem in problems:
+            print(f"  - {problem}")
+        return 1
+    print(f"[{args.mode}] Planes correctos en {len(SCENARIOS)} escenarios.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,159 @@
+"""Utilidades compartidas por los benchmarks: base temporal, datos sintéticos y cliente."""
+import asyncio
+import contextlib
+import os
+import random
+import sqlite3
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import httpx
+from fastapi.testclient import TestClient
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlmodel import Session, SQLModel, create_engine
+
+from app import config
+from app.database import get_async_session, get_session
+from app.main import app
+from app.models import User
+from app.routers.auth_router import get_current_user, get_current_user_async
+
+
+def seed_users(path: str, total: int, admins: int = 1, hashed_password: str = "x"):
+    """Inserta usuarios (los primeros `admins` con rol admin)"""
+    conn = sqlite3.connect(path)
+    created = datetime(2025, 1, 1).isoformat(sep=" ")
+    conn.executemany(
+        "INSERT INTO user (username, hashed_password, is_superuser, created_at, role) VALUES (?, ?, 0, ?, ?)",
+        [(f"usuario{i}", hashed_password, created, "admin" if i < admins else "client") for i in range(total)],
+    )
+    conn.commit()
+    conn.close()
+
+
+def seed_products(path: str, total: int, owners: int = 0, batch: int = 50_000):
+    """Llena la tabla product con executemany (mucho más rápido que el ORM)"""
+    conn = sqlite3.connect(path)
+    base = datetime(2025, 1, 1)
+    rng = random.Random(42)
+    for start in range(0, total, batch):
+        rows = [
+            (
+                f"Producto {i}",
+                f"Descripción del producto {i}",
+                round(rng.uniform(1, 1000), 2),
+                rng.randint(0, 100),
+                (base + timedelta(seconds=i)).isoformat(sep=" "),
+                rng.randint(1, owners) if owners else None,
+            )
+            for i in range(start, min(start + batch, total))
+        ]
+        conn.executemany(
+            "INSERT INTO product (name, description, price, quantity, created_at, owner_id) VALUES (?, ?, ?, ?, ?, ?)",
+            rows,
+        )
+        conn.commit()
+    conn.close()
+
+
+AUDIT_ACTIONS = ("CREATE_PRODUCT", "UPDATE_PRODUCT", "DELETE_PRODUCT", "UPDATE_USER", "DELETE_USER")
+
+
+def seed_audit_logs(path: str, total: int, users: int = 1, days: int = 365, batch: int = 50_000):
+    """Historial sintético repartido en los últimos `days` días (performed_by = usuarioN)"""
+    conn = sqlite3.connect(path)
+    end = datetime.utcnow()
+    span = days * 86400
+    rng = random.Random(7)
+    for start in range(0, total, batch):
+        rows = []
+        for i in range(start, min(start + batch, total)):
+            action = AUDIT_ACTIONS[i % len(AUDIT_ACTIONS)]
+            at = end - timedelta(seconds=span * (total - i) / total)
+            rows.append((
+                action,
+                rng.randint(1, 1_000_000),
+                f"Objeto {i}",
+                f"usuario{rng.randrange(max(users, 1))}",
+                at.isoformat(sep=" "),
+                f"{action} sintético {i}",
+            ))
+        conn.executemany(
+            "INSERT INTO auditlog (action, target_id, target_name, performed_by, performed_at, details) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            rows,
+        )
+        conn.commit()
+    conn.close()
+
+
+@contextlib.contextmanager
+def bench_database(as_admin: bool = False):
+    """Base SQLite temporal con get_session (y opcionalmente un admin) apuntando a ella.
+    Con DB_MODE=async también get_async_session, sobre el mismo archivo"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        engine = create_engine(f"sqlite:///{path}")
+        SQLModel.metadata.create_all(engine)
+
+        def bench_session():
+            with Session(engine) as session:
+                yield session
+
+        app.dependency_overrides[get_session] = bench_session
+        async_engine = None
+        if config.DB_MODE == "async":
+            # Como get_async_engine: sin aiosqlite instalado el modo síncrono sigue andando
+            async_engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+            factory = async_sessionmaker(async_engine, expire_on_commit=False)
+
+            async def bench_async_session():
+                async with factory() as session:
+                    yield session
+
+            app.dependency_overrides[get_async_session] = bench_async_session
+        if as_admin:
+            admin = User(id=1, username="usuario0", hashed_password="x", role="admin")
+            app.dependency_overrides[get_current_user] = lambda: admin
+            app.dependency_overrides[get_current_user_async] = lambda: admin
+        try:
+            yield path
+        finally:
+            for dependency in (get_session, get_async_session, get_current_user, get_current_user_async):
+                app.dependency_overrides.pop(dependency, None)
+            engine.dispose()
+            if async_engine is not None:
+                asyncio.run(async_engine.dispose())
+
+
+@contextlib.contextmanager
+def bench_client(as_admin: bool = False):
+    """TestClient síncrono sobre una base temporal"""
+    with bench_database(as_admin) as path:
+        yield TestClient(app), path
+
+
+def async_client() -> httpx.AsyncClient:
+    """Cliente httpx que llama a la app en el mismo proceso (transporte ASGI)"""
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench")
+
+
+def percentile(samples, pct: float) -> float:
+    ordered = sorted(samples)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def time_request(client: TestClient, url: str, params: dict, repeat: int) -> float:
+    """Mediana en milisegundos de `repeat` peticiones GET"""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        response = client.get(url, params=params)
+        samples.append((time.perf_counter() - start) * 1000)
+        assert response.status_code == 200, response.text
+    return statistics.median(samples)
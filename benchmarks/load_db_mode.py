@@ -0,0 +1,138 @@
+"""
+Prueba de carga: modo síncrono (Session + threadpool) vs asíncrono (AsyncSession).
+
+Levanta un servidor uvicorn por modo (DB_MODE=sync / DB_MODE=async) sobre la misma
+base temporal y lo ataca con N clientes concurrentes durante unos segundos, con una
+mezcla de lectura de catálogo, dueño de producto y estadísticas.
+
+Uso:
+    python -m benchmarks.load_db_mode --clients 500 --duration 15
+"""
+import argparse
+import asyncio
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import httpx
+from sqlmodel import SQLModel, create_engine
+
+from app.auth import pwd_context
+
+from .common import percentile, seed_products, seed_users
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+PASSWORD = "benchmark"
+
+
+def start_server(mode: str, db_path: str, port: int) -> subprocess.Popen:
+    env = dict(
+        os.environ,
+        DATABASE_URL=f"sqlite:///{db_path}",
+        DB_MODE=mode,
+        DB_PROFILE=os.environ.get("DB_PROFILE", "production"),
+        SECRET_KEY="load-test",
+    )
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=REPO_ROOT,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+
+
+async def wait_ready(base_url: str, timeout: float = 30):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient(base_url=base_url) as client:
+        while time.monotonic() < deadline:
+            try:
+                await client.get("/")
+                return
+            except httpx.TransportError:
+                await asyncio.sleep(0.2)
+    raise RuntimeError("El servidor no arrancó a tiempo")
+
+
+async def run_load(base_url: str, clients: int, duration: float, products: int):
+    limits = httpx.Limits(max_connections=clients, max_keepalive_connections=clients)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        login = await client.post("/auth/login", data={"username": "usuario0", "password": PASSWORD})
+        cookies = dict(login.cookies) or dict(client.cookies)
+
+        latencies, errors = [], 0
+        deadline = time.monotonic() + duration
+
+        async def one_client(seed: int):
+            nonlocal errors
+            rng = random.Random(seed)
+            while time.monotonic() < deadline:
+                roll = rng.random()
+                if roll < 0.6:
+                    request = client.get("/products/list", params={"limit": 20, "min_price": rng.uniform(1, 900)})
+                elif roll < 0.9:
+                    request = client.get(f"/products/{rng.randint(1, products)}/owner")
+                else:
+                    request = client.get("/stats/general", cookies=cookies)
+                start = time.perf_counter()
+                try:
+                    response = await request
+                    if response.status_code >= 400:
+                        errors += 1
+                except httpx.HTTPError:
+                    errors += 1
+                latencies.append((time.perf_counter() - start) * 1000)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one_client(i) for i in range(clients)))
+        elapsed = time.perf_counter() - start
+
+    return {
+        "rps": len(latencies) / elapsed,
+        "requests": len(latencies),
+        "errors": errors,
+        "p50": percentile(latencies, 50),
+        "p99": percentile(latencies, 99),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=500)
+    parser.add_argument("--duration", type=float, default=15)
+    parser.add_argument("--products", type=int, default=10_000)
+    parser.add_argument("--modes", nargs="+", default=["sync", "async"], choices=["sync", "async"])
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "load.db")
+        engine = create_engine(f"sqlite:///{db_path}")
+        SQLModel.metadata.create_all(engine)
+        engine.dispose()
+        seed_users(db_path, 100, hashed_password=pwd_context.hash(PASSWORD))
+        seed_products(db_path, args.products, owners=100)
+
+        print(f"{args.clients} clientes, {args.duration:.0f} s, {args.products} productos")
+        print(f"{'modo':>6} | {'req/s':>8} | {'peticiones':>10} | {'errores':>7} | {'p50 ms':>8} | {'p99 ms':>8}")
+        for mode in args.modes:
+            server = start_server(mode, db_path, args.port)
+            try:
+                base_url = f"http://127.0.0.1:{args.port}"
+                asyncio.run(wait_ready(base_url))
+                r = asyncio.run(run_load(base_url, args.clients, args.duration, args.products))
+            finally:
+                server.terminate()
+                server.wait()
+            print(
+                f"{mode:>6} | {r['rps']:>8.1f} | {r['requests']:>10} | {r['errors']:>7} | "
+                f"{r['p50']:>8.1f} | {r['p99']:>8.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
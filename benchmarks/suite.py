@@ -0,0 +1,318 @@
+"""
+Suite de carga reproducible para toda la API.
+
+`run` genera una base sintética temporal (ver benchmarks/generate.py), levanta la app
+en el mismo proceso (httpx + transporte ASGI, con startup/shutdown) y ejecuta cada
+escenario con N clientes concurrentes durante unos segundos:
+
+- login:    POST /auth/login con usuarios al azar (bcrypt con BCRYPT_ROUNDS; los 503
+            del pool de bcrypt cuentan como errores, ver "statuses")
+- browse:   páginas del catálogo (filtros y cursor), búsqueda y dueño de producto
+- crud:     crear, actualizar y borrar un producto (admin)
+- delete:   borrados de productos existentes (cada uno escribe el historial) y
+            consultas de /audit/history
+- stats:    /stats/general y /stats/user-products
+
+Reporta throughput, p50/p95/p99 por escenario y operación, memoria (RSS) y guarda
+todo en JSON. `compare` marca regresiones entre dos corridas.
+
+Uso:
+    python -m benchmarks.suite run --products 100000 --audit 100000 --out base.json
+    DB_MODE=async python -m benchmarks.suite run --out async.json
+    python -m benchmarks.suite compare base.json async.json --threshold 0.10
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+SCENARIOS = ("login", "browse", "crud", "delete", "stats")
+
+
+# ======================================================
+# ⏱️ Registro de latencias
+# ======================================================
+class Recorder:
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = {}
+        self.statuses: Dict[str, int] = {}
+        self.errors = 0
+
+    async def call(self, op: str, request, ok=(200,)):
+        start = time.perf_counter()
+        response = await request
+        self.latencies.setdefault(op, []).append((time.perf_counter() - start) * 1000)
+        status = str(response.status_code)
+        self.statuses[status] = self.statuses.get(status, 0) + 1
+        if response.status_code not in ok:
+            self.errors += 1
+        return response
+
+
+class Context:
+    """Clientes y datos compartidos por los escenarios"""
+
+    def __init__(self, admin, anonymous, users: int, products: int, password: str):
+        self.admin = admin
+        self.anonymous = anonymous
+        self.users = users
+        self.products = products
+        self.password = password
+        self.next_delete = 1  # ids sembrados 1..products, se borran en orden
+        self.cursors: List[Tuple[str, str]] = []  # (sort, cursor) de páginas ya vistas
+
+
+# ======================================================
+# 🎬 Escenarios (una iteración cada uno)
+# ======================================================
+async def scenario_login(ctx: Context, rec: Recorder, rng: random.Random):
+    data = {"username": f"usuario{rng.randrange(ctx.users)}", "password": ctx.password}
+    await rec.call("login", ctx.anonymous.post("/auth/login", data=data), ok=(303,))
+
+
+async def scenario_browse(ctx: Context, rec: Recorder, rng: random.Random):
+    roll = rng.random()
+    if roll < 0.35:
+        params = {"limit": 20, "min_price": round(rng.uniform(1, 900), 2), "sort": rng.choice(["id", "-price"])}
+        response = await rec.call("list", ctx.anonymous.get("/products/list", params=params))
+        cursor = response.json().get("next_cursor") if response.status_code == 200 else None
+        if cursor:
+            ctx.cursors = (ctx.cursors + [(params["sort"], cursor)])[-100:]
+    elif roll < 0.55 and ctx.cursors:
+        sort, cursor = rng.choice(ctx.cursors)
+        params = {"limit": 20, "sort": sort, "cursor": cursor}
+        await rec.call("list_next", ctx.anonymous.get("/products/list", params=params))
+    elif roll < 0.75:
+        params = {"q": str(rng.randrange(ctx.products)), "limit": 20}
+        await rec.call("search", ctx.anonymous.get("/products/search", params=params))
+    else:
+        product_id = rng.randint(1, ctx.products)
+        await rec.call("owner", ctx.anonymous.get(f"/products/{product_id}/owner"), ok=(200, 404))
+
+
+async def scenario_crud(ctx: Context, rec: Recorder, rng: random.Random):
+    data = {
+        "name": f"Carga {rng.random():.6f}",
+        "price": round(rng.uniform(1, 500), 2),
+        "quantity": rng.randint(0, 50),
+    }
+    created = await rec.call("create", ctx.admin.post("/products/create", data=data))
+    if created.status_code != 200:
+        return
+    product_id = created.json()["product"]["id"]
+    await rec.call("update", ctx.admin.put(f"/products/{product_id}", data={"price": data["price"] + 1}))
+    await rec.call("delete", ctx.admin.delete(f"/products/{product_id}"))
+
+
+async def scenario_delete(ctx: Context, rec: Recorder, rng: random.Random):
+    if rng.random() < 0.1:
+        await rec.call("history", ctx.admin.get("/audit/history", params={"limit": 50}))
+        return
+    product_id, ctx.next_delete = ctx.next_delete, ctx.next_delete + 1
+    await rec.call("delete", ctx.admin.delete(f"/products/{product_id}"), ok=(200, 404))
+
+
+async def scenario_stats(ctx: Context, rec: Recorder, rng: random.Random):
+    if rng.random() < 0.5:
+        await rec.call("general", ctx.admin.get("/stats/general"))
+    else:
+        params = {"limit": 20, "products_per_user": 5}
+        await rec.call("user_products", ctx.admin.get("/stats/user-products", params=params))
+
+
+SCENARIO_FUNCTIONS = {
+    "login": scenario_login,
+    "browse": scenario_browse,
+    "crud": scenario_crud,
+    "delete": scenario_delete,
+    "stats": scenario_stats,
+}
+
+
+async def run_scenario(name: str, ctx: Context, concurrency: int, duration: float, seed: int) -> dict:
+    from .common import percentile
+
+    rec = Recorder()
+    fn = SCENARIO_FUNCTIONS[name]
+    deadline = time.monotonic() + duration
+
+    async def worker(worker_id: int):
+        rng = random.Random(seed * 1000 + worker_id)
+        while time.monotonic() < deadline:
+            await fn(ctx, rec, rng)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(i) for i in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    samples = [value for values in rec.latencies.values() for value in values]
+    summary = lambda values: {
+        "requests": len(values),
+        "rps": round(len(values) / elapsed, 2),
+        "p50": round(percentile(values, 50), 3),
+        "p95": round(percentile(values, 95), 3),
+        "p99": round(percentile(values, 99), 3),
+    }
+    return {
+        **summary(samples),
+        "errors": rec.errors,
+        "statuses": dict(sorted(rec.statuses.items())),
+        "seconds": round(elapsed, 3),
+        "rss_mb": _rss_mb(),
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "operations": {op: summary(values) for op, values in sorted(rec.latencies.items())},
+    }
+
+
+def _rss_mb() -> float:
+    try:
+        with open("/proc/self/statm") as statm:
+            return round(int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20, 1)
+    except OSError:  # fuera de Linux: el pico es lo único disponible
+        return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+# ======================================================
+# ▶️ run
+# ======================================================
+def run(args) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "suite.db")
+        # La app lee la configuración al importarse: la base se define antes
+        os.environ["DATABASE_URL"] = f"sqlite:///{path}"
+        os.environ.setdefault("SECRET_KEY", "benchmark-suite")
+        from .generate import PASSWORD, generate
+
+        print(f"Generando datos: {args.users} usuarios, {args.products} productos, {args.audit} eventos")
+        timings = generate(path, args.users, args.products, args.audit)
+        return asyncio.run(_run_app(args, PASSWORD, timings))
+
+
+async def _run_app(args, password: str, timings: dict) -> dict:
+    from app import config
+    from app.database import engine
+    from app.main import app
+    from .common import async_client
+
+    engine.echo = False
+    results = {"meta": _meta(args, config, timings), "scenarios": {}}
+    async with app.router.lifespan_context(app):
+        async with async_client() as admin, async_client() as anonymous:
+            login = await admin.post("/auth/login", data={"username": "usuario0", "password": password})
+            if login.status_code != 303:
+                raise RuntimeError(f"No se pudo iniciar sesión como admin: {login.status_code}")
+            ctx = Context(admin, anonymous, args.users, args.products, password)
+
+            print(f"{'escenario':<10} | {'req/s':>8} | {'p50 ms':>8} | {'p95 ms':>8} | {'p99 ms':>8} | errores | RSS MB")
+            for index, name in enumerate(args.scenarios):
+                r = await run_scenario(name, ctx, args.concurrency, args.duration, args.seed + index)
+                results["scenarios"][name] = r
+                print(
+                    f"{name:<10} | {r['rps']:>8.1f} | {r['p50']:>8.2f} | {r['p95']:>8.2f} | {r['p99']:>8.2f} | "
+                    f"{r['errors']:>7} | {r['rss_mb']:>6.1f}"
+                )
+    return results
+
+
+def _meta(args, config, timings: dict) -> dict:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT, capture_output=True, text=True, timeout=10
+        ).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        commit = ""
+    return {
+        "started_at": datetime.utcnow().isoformat(timespec="seconds"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "cpus": os.cpu_count(),
+        "scale": {"users": args.users, "products": args.products, "audit": args.audit},
+        "concurrency": args.concurrency,
+        "duration": args.duration,
+        "seed": args.seed,
+        "config": {
+            name: getattr(config, name)
+            for name in (
+                "DB_MODE", "DB_PROFILE", "BCRYPT_ROUNDS", "HASH_EXECUTOR", "AUDIT_MODE",
+                "RESPONSE_CACHE_BACKEND", "RESPONSE_SERIALIZER",
+            )
+        },
+        "generate_seconds": timings,
+    }
+
+
+# ======================================================
+# 🔍 compare
+# ======================================================
+def compare(base: dict, new: dict, threshold: float, min_ms: float) -> List[str]:
+    """Regresiones: caída de req/s o subida de p95/p99 mayores que `threshold`"""
+    regressions = []
+    print(f"{'escenario':<10} | {'req/s':>18} | {'p95 ms':>18} | {'p99 ms':>18} |")
+    for name, old in base["scenarios"].items():
+        cur = new["scenarios"].get(name)
+        if cur is None:
+            continue
+        flags = []
+        if cur["rps"] < old["rps"] * (1 - threshold):
+            flags.append("req/s")
+        for key in ("p95", "p99"):
+            if cur[key] > old[key] * (1 + threshold) and cur[key] - old[key] >= min_ms:
+                flags.append(key)
+        if cur["errors"] > old["errors"]:
+            flags.append("errores")
+        cells = [f"{old[key]:>7.1f} → {cur[key]:>7.1f}" for key in ("rps", "p95", "p99")]
+        mark = "REGRESIÓN: " + ", ".join(flags) if flags else "ok"
+        print(f"{name:<10} | " + " | ".join(f"{cell:>18}" for cell in cells) + f" | {mark}")
+        if flags:
+            regressions.append(f"{name}: {', '.join(flags)}")
+    return regressions
+
+
+def main(argv: List[str]) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks.suite", description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    sub = parser.add_subparsers(dest="command", required=True)
+    runner = sub.add_parser("run", help="genera datos y ejecuta los escenarios")
+    runner.add_argument("--users", type=int, default=1000)
+    runner.add_argument("--products", type=int, default=100_000)
+    runner.add_argument("--audit", type=int, default=100_000)
+    runner.add_argument("--concurrency", type=int, default=8)
+    runner.add_argument("--duration", type=float, default=10, help="segundos por escenario")
+    runner.add_argument("--scenarios", nargs="+", default=list(SCENARIOS), choices=SCENARIOS)
+    runner.add_argument("--seed", type=int, default=1)
+    runner.add_argument("--out", help="archivo JSON de resultados")
+    comparer = sub.add_parser("compare", help="compara dos corridas y marca regresiones")
+    comparer.add_argument("base")
+    comparer.add_argument("new")
+    comparer.add_argument("--threshold", type=float, default=0.10, help="variación relativa tolerada")
+    comparer.add_argument("--min-ms", type=float, default=1.0, help="ignora subidas de latencia menores")
+    args = parser.parse_args(argv)
+
+    if args.command == "compare":
+        with open(args.base) as base, open(args.new) as new:
+            regressions = compare(json.load(base), json.load(new), args.threshold, args.min_ms)
+        print(f"\n{len(regressions)} regresiones" if regressions else "\nSin regresiones")
+        return 1 if regressions else 0
+
+    results = run(args)
+    if args.out:
+        with open(args.out, "w") as out:
+            json.dump(results, out, indent=2)
+        print(f"\nResultados en {args.out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))